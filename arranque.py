@@ -0,0 +1,108 @@
+# arranque.py
+# Medición del tiempo de arranque: marcas por etapa y, opcionalmente, cuánto
+# tarda cada import (al estilo de python -X importtime, pero desde la app).
+# Se activa con `python main.py --arranque` o FARMACIA_ARRANQUE=1.
+from __future__ import annotations
+import importlib.abc
+import sys
+import time
+
+# Imports más lentos que se listan en el reporte
+TOP_IMPORTS = 15
+
+
+class _LoaderCronometrado(importlib.abc.Loader):
+    def __init__(self, loader, tiempos: dict[str, float]):
+        self._loader = loader
+        self._tiempos = tiempos
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        t0 = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._tiempos[module.__name__] = time.perf_counter() - t0
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _FinderCronometrado(importlib.abc.MetaPathFinder):
+    """Envuelve a los demás finders para medir exec_module de cada módulo."""
+
+    def __init__(self, tiempos: dict[str, float]):
+        self._tiempos = tiempos
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _LoaderCronometrado(spec.loader, self._tiempos)
+                return spec
+        return None
+
+
+class Cronometro:
+    """Marcas de tiempo desde `inicio` (por omisión, la creación del objeto)."""
+
+    def __init__(self, inicio: float | None = None):
+        self.inicio = time.perf_counter() if inicio is None else inicio
+        self.marcas: list[tuple[str, float]] = []
+        self.imports: dict[str, float] = {}
+        self._finder = None
+
+    def marca(self, nombre: str):
+        self.marcas.append((nombre, time.perf_counter() - self.inicio))
+
+    def medir_imports(self):
+        """
+        Mide de aquí en adelante el tiempo de cada import (acumulado: incluye
+        lo que ese módulo importe a su vez).
+        """
+        if self._finder is None:
+            self._finder = _FinderCronometrado(self.imports)
+            sys.meta_path.insert(0, self._finder)
+
+    def detener(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def reporte(self, out=None):
+        out = out or sys.stderr
+        print("Arranque (ms desde el inicio):", file=out)
+        anterior = 0.0
+        for nombre, t in self.marcas:
+            print(f"  {t * 1000:9.1f}  (+{(t - anterior) * 1000:7.1f})  {nombre}", file=out)
+            anterior = t
+        if self.imports:
+            print("Imports más lentos (ms, acumulado):", file=out)
+            lentos = sorted(self.imports.items(), key=lambda kv: kv[1], reverse=True)
+            for nombre, t in lentos[:TOP_IMPORTS]:
+                print(f"  {t * 1000:9.1f}  {nombre}", file=out)
+
+
+class _Nulo:
+    """Cronómetro que no hace nada, para cuando no se pidió el reporte."""
+
+    def marca(self, nombre):
+        pass
+
+    def medir_imports(self):
+        pass
+
+    def detener(self):
+        pass
+
+    def reporte(self, out=None):
+        pass
+
+
+def cronometro(activo: bool, inicio: float | None = None):
+    return Cronometro(inicio) if activo else _Nulo()
@@ -0,0 +1,98 @@
+# auth.py
+# Servicio de autenticación: una conexión persistente, búsqueda por correo y
+# verificación con PBKDF2. Sin Qt; LoginDialog lo llama desde un hilo de
+# trabajo porque verificar tarda a propósito.
+from __future__ import annotations
+import sqlite3
+import threading
+import time
+import database
+from database import LOGIN_SQL, hash_password, necesita_rehash, verificar_password
+
+
+class Sesion:
+    """Quién está usando la caja y desde cuándo."""
+
+    __slots__ = ("usuario_id", "nombre", "correo", "rol", "inicio")
+
+    def __init__(self, usuario_id: int, nombre: str, correo: str, rol: str):
+        self.usuario_id = usuario_id
+        self.nombre = nombre
+        self.correo = correo
+        self.rol = rol
+        self.inicio = time.time()
+
+
+class ServicioAuth:
+    """
+    Autentica usuarios contra la tabla Usuarios. Conserva su conexión (y con
+    ella la sentencia preparada) entre intentos. Si el hash guardado es del
+    formato viejo o tiene menos iteraciones, lo reemplaza al entrar bien.
+    Seguro entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._db_file = None
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Llamar con _lock tomado
+        if self._conn is None or self._db_file != database.DB_FILE:
+            self.close()
+            self._conn = database.open_conn("login")
+            self._db_file = database.DB_FILE
+        return self._conn
+
+    def autenticar(self, correo: str, password: str) -> int | None:
+        """usuario_id si correo y contraseña coinciden, None si no."""
+        with self._lock:
+            row = self._conexion().execute(LOGIN_SQL, (correo,)).fetchone()
+        if row is None:
+            # Mismo costo que con un correo real: no delata cuáles existen
+            verificar_password(password, _hash_senuelo())
+            return None
+        usuario_id, guardado = row
+        # pbkdf2_hmac suelta el GIL: no detiene a la interfaz ni a otros hilos
+        if not verificar_password(password, guardado):
+            return None
+        if necesita_rehash(guardado):
+            nuevo = hash_password(password)
+            with self._lock:
+                conn = self._conexion()
+                with conn:
+                    # Solo si nadie lo cambió mientras tanto
+                    conn.execute(
+                        "UPDATE Usuarios SET password_hash = ? "
+                        "WHERE usuario_id = ? AND password_hash = ?",
+                        (nuevo, usuario_id, guardado),
+                    )
+        return usuario_id
+
+    def sesion(self, usuario_id: int) -> Sesion | None:
+        """Datos de sesión del usuario que acaba de autenticarse."""
+        with self._lock:
+            row = self._conexion().execute(
+                "SELECT usuario_id, nombre, correo, rol FROM Usuarios WHERE usuario_id = ?",
+                (usuario_id,),
+            ).fetchone()
+        return Sesion(*row) if row else None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+
+_senuelo: str | None = None
+
+
+def _hash_senuelo() -> str:
+    # Se calcula al primer correo inexistente, no al importar
+    global _senuelo
+    if _senuelo is None:
+        _senuelo = hash_password("")
+    return _senuelo
+
+
+auth = ServicioAuth()
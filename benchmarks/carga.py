@@ -0,0 +1,192 @@
+# Prueba de carga del servidor HTTP local (servidor.py): varias cajas
+# simuladas, cada una con su conexión keep-alive, mezclando consultas de
+# catálogo, búsquedas, existencias, ventas y reportes durante un tiempo fijo.
+# Sin --url levanta su propia instancia en localhost sobre una BD temporal.
+# Con --url el servidor ya corre sobre --db (ahí se prepara el catálogo).
+# Ejecuta: python -m benchmarks.carga [--cajas 20] [--segundos 10] [--db ruta]
+#          python -m benchmarks.carga --url 127.0.0.1:8765 --db farmacia.db
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import database
+from benchmarks.checkout import _preparar
+
+# (operación, peso): lo que hace una caja típica
+MEZCLA = (
+    ("articulo", 50),
+    ("busqueda", 15),
+    ("existencia", 15),
+    ("venta", 15),
+    ("reporte", 5),
+)
+BUSQUEDAS = ("artículo", "bench 1", "bench 25", "art ben")
+
+
+class Cliente:
+    """HTTP/1.1 mínimo sobre una conexión keep-alive."""
+
+    def __init__(self, host: str, puerto: int):
+        self.host, self.puerto = host, puerto
+        self.token = None
+        self._reader = self._writer = None
+
+    async def abrir(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.puerto)
+
+    async def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    async def pedir(self, metodo: str, ruta: str, datos: dict | None = None) -> tuple[int, dict]:
+        cuerpo = json.dumps(datos).encode() if datos is not None else b""
+        cabeza = f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(cuerpo)}\r\n"
+        if self.token:
+            cabeza += f"Authorization: Bearer {self.token}\r\n"
+        self._writer.write(cabeza.encode() + b"\r\n" + cuerpo)
+        await self._writer.drain()
+        respuesta = await self._reader.readuntil(b"\r\n\r\n")
+        linea, *encabezados = respuesta.decode("latin-1").split("\r\n")
+        largo = 0
+        for e in encabezados:
+            nombre, _, valor = e.partition(":")
+            if nombre.lower() == "content-length":
+                largo = int(valor)
+        cuerpo = await self._reader.readexactly(largo)
+        return int(linea.split(" ", 2)[1]), json.loads(cuerpo)
+
+
+async def _caja(
+    n: int, host: str, puerto: int, correo: str, password: str,
+    fin: float, codigos: list[str], cliente_id: int, tiempos: dict, errores: dict,
+):
+    rnd = random.Random(n)
+    cliente = Cliente(host, puerto)
+    await cliente.abrir()
+    try:
+        status, datos = await cliente.pedir("POST", "/sesion", {"correo": correo, "password": password})
+        if status != 200:
+            raise RuntimeError(f"No se pudo iniciar sesión: {datos}")
+        cliente.token = datos["token"]
+        ops, pesos = zip(*MEZCLA)
+        while time.perf_counter() < fin:
+            op = rnd.choices(ops, pesos)[0]
+            if op == "articulo":
+                args = ("GET", f"/articulos/{rnd.choice(codigos)}")
+            elif op == "busqueda":
+                args = ("GET", f"/articulos?q={rnd.choice(BUSQUEDAS).replace(' ', '+')}&limite=20")
+            elif op == "existencia":
+                args = ("GET", f"/existencias/{rnd.choice(codigos)}")
+            elif op == "venta":
+                lineas = [[rnd.choice(codigos), rnd.randint(1, 3)] for _ in range(rnd.randint(1, 8))]
+                args = ("POST", "/ventas", {"cliente_id": cliente_id, "lineas": lineas})
+            else:
+                args = ("GET", "/reportes/top-articulos?n=10")
+            t0 = time.perf_counter()
+            status, datos = await cliente.pedir(*args)
+            tiempos.setdefault(op, []).append((time.perf_counter() - t0) * 1000)
+            if status != 200:
+                errores[op] = errores.get(op, 0) + 1
+                errores.setdefault("ejemplos", set()).add(f"{status} {datos.get('error')}")
+    finally:
+        await cliente.cerrar()
+
+
+async def correr(
+    host: str, puerto: int, cajas: int, segundos: float,
+    correo: str, password: str, codigos: list[str], cliente_id: int,
+) -> tuple[dict, dict, float]:
+    tiempos: dict[str, list[float]] = {}
+    errores: dict = {}
+    t0 = time.perf_counter()
+    fin = t0 + segundos
+    await asyncio.gather(
+        *(
+            _caja(n, host, puerto, correo, password, fin, codigos, cliente_id, tiempos, errores)
+            for n in range(cajas)
+        )
+    )
+    return tiempos, errores, time.perf_counter() - t0
+
+
+def _reporte(tiempos: dict, errores: dict, segundos: float):
+    total = sum(len(t) for t in tiempos.values())
+    print(f"{total:,} peticiones en {segundos:.1f} s: {total / segundos:,.0f}/s")
+    print(f"{'operación':<12} {'n':>8} {'por s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    for op, _peso in MEZCLA:
+        t = sorted(tiempos.get(op, []))
+        if not t:
+            continue
+
+        def pct(p: float) -> float:
+            return t[min(len(t) - 1, int(p * len(t)))]
+
+        print(
+            f"{op:<12} {len(t):>8,} {len(t) / segundos:>8,.0f} {pct(0.5):>8.2f} "
+            f"{pct(0.95):>8.2f} {pct(0.99):>8.2f} {errores.get(op, 0):>8}"
+        )
+    for ejemplo in sorted(errores.get("ejemplos", ()))[:5]:
+        print(f"  error: {ejemplo}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del servidor HTTP local")
+    parser.add_argument("--cajas", type=int, default=20, help="clientes concurrentes")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--lectores", type=int, default=4, help="hilos de lectura del servidor")
+    parser.add_argument("--db", help="BD para la instancia local (por omisión una temporal)")
+    parser.add_argument("--url", help="host:puerto de un servidor ya levantado")
+    parser.add_argument("--correo", default="admin@farmacia.cucei.udg.mx")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--cliente", type=int, help="cliente_id de las ventas")
+    parser.add_argument("--articulos", type=int, default=1000)
+    args = parser.parse_args()
+    if args.url and not args.db:
+        parser.error("--url requiere --db: la BD que usa ese servidor")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = args.db or os.path.join(tmp, "carga.db")
+        # Catálogo B000000... con stock de sobra (ver benchmarks.checkout)
+        cliente_id, _usuario = _preparar(args.articulos)
+        database.pool.close_all()
+        codigos = [f"B{i:06d}" for i in range(args.articulos)]
+
+        proceso = None
+        if args.url:
+            host, _, puerto = args.url.rpartition(":")
+            puerto = int(puerto)
+        else:
+            proceso = subprocess.Popen(
+                [sys.executable, "servidor.py", "--db", database.DB_FILE,
+                 "--puerto", "0", "--lectores", str(args.lectores)],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            linea = proceso.stdout.readline()  # "Escuchando en http://host:puerto"
+            if not linea:
+                raise SystemExit("El servidor no arrancó.")
+            host, _, puerto = linea.strip().rpartition("//")[2].rpartition(":")
+            puerto = int(puerto)
+        try:
+            tiempos, errores, segundos = asyncio.run(
+                correr(
+                    host, puerto, args.cajas, args.segundos, args.correo,
+                    args.password, codigos, args.cliente or cliente_id,
+                )
+            )
+        finally:
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait()
+    _reporte(tiempos, errores, segundos)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Benchmark del cobro: ventas por segundo con registrar_venta y, con
+# --productores, varias cajas a la vez: un commit por venta contra la cola
+# de commit agrupado (escritura.ColaEscritura).
+# Ejecuta: python -m benchmarks.checkout [--ventas 500] [--productores 8] [--db ruta]
+from __future__ import annotations
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import database
+from escritura import ColaEscritura
+
+TICKET_SIZES = (1, 10, 50)
+
+
+def _preparar(n_articulos: int) -> tuple[int, int]:
+    """Crea el esquema y un catálogo con stock de sobra; devuelve (cliente_id, usuario_id)."""
+    database.init_sqlite_file()
+    with database.sqlite_conn() as conn:
+        usuario_id = conn.execute("SELECT MIN(usuario_id) FROM Usuarios").fetchone()[0]
+        cliente_id = conn.execute("SELECT MIN(cliente_id) FROM Clientes").fetchone()[0]
+        conn.executemany(
+            "INSERT OR IGNORE INTO Articulos(codigo, descripcion, precio) VALUES (?,?,?)",
+            [(f"B{i:06d}", f"Artículo bench {i}", 10 + i % 90) for i in range(n_articulos)],
+        )
+        conn.execute("UPDATE Almacen SET existencia = 1000000000")
+    return cliente_id, usuario_id
+
+
+def correr(ventas: int, n_articulos: int = 1000, seed: int = 1) -> dict[int, dict]:
+    cliente_id, usuario_id = _preparar(n_articulos)
+    rnd = random.Random(seed)
+    codigos = [f"B{i:06d}" for i in range(n_articulos)]
+    resultados = {}
+    for size in TICKET_SIZES:
+        tickets = [
+            [(rnd.choice(codigos), rnd.randint(1, 3)) for _ in range(size)]
+            for _ in range(ventas)
+        ]
+        t0 = time.perf_counter()
+        for lineas in tickets:
+            database.registrar_venta(cliente_id, usuario_id, lineas)
+        dt = time.perf_counter() - t0
+        resultados[size] = {
+            "ventas": ventas,
+            "segundos": dt,
+            "ventas_por_s": ventas / dt,
+            "renglones_por_s": ventas * size / dt,
+        }
+    return resultados
+
+
+def correr_concurrente(
+    ventas: int, productores: int, n_articulos: int = 1000, seed: int = 1
+) -> dict[str, dict]:
+    """
+    `productores` hilos registran `ventas` tickets de 5 renglones cada uno,
+    primero con registrar_venta (un commit por venta) y luego por la cola.
+    """
+    cliente_id, usuario_id = _preparar(n_articulos)
+    rnd = random.Random(seed)
+    codigos = [f"B{i:06d}" for i in range(n_articulos)]
+    tickets = [
+        [[(rnd.choice(codigos), rnd.randint(1, 3)) for _ in range(5)] for _ in range(ventas)]
+        for _ in range(productores)
+    ]
+    cola = ColaEscritura()
+    modos = {
+        "directo": lambda lineas: database.registrar_venta(cliente_id, usuario_id, lineas),
+        "agrupado": lambda lineas: cola.vender(cliente_id, usuario_id, lineas),
+    }
+    resultados = {}
+    for nombre, vender in modos.items():
+        errores = []
+
+        def caja(mios):
+            for lineas in mios:
+                try:
+                    vender(lineas)
+                except Exception as e:  # "database is locked" y similares
+                    errores.append(e)
+
+        hilos = [threading.Thread(target=caja, args=(t,)) for t in tickets]
+        t0 = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        dt = time.perf_counter() - t0
+        total = ventas * productores
+        resultados[nombre] = {
+            "ventas": total,
+            "segundos": dt,
+            "ventas_por_s": (total - len(errores)) / dt,
+            "errores": len(errores),
+        }
+    resultados["agrupado"]["por_commit"] = cola.trabajos / max(cola.grupos, 1)
+    cola.close()
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ventas por segundo con registrar_venta")
+    parser.add_argument("--ventas", type=int, default=500, help="ventas por tamaño de ticket")
+    parser.add_argument("--articulos", type=int, default=1000)
+    parser.add_argument("--productores", type=int, help="cajas concurrentes (compara con la cola)")
+    parser.add_argument("--db", help="archivo SQLite (por omisión uno temporal)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = args.db or os.path.join(tmp, "bench.db")
+        try:
+            if args.productores:
+                resultados = correr_concurrente(args.ventas, args.productores, args.articulos)
+            else:
+                resultados = correr(args.ventas, args.articulos)
+        finally:
+            database.pool.close_all()
+
+    if args.productores:
+        print(f"{'modo':>10} {'ventas/s':>10} {'errores':>8} {'por commit':>11}")
+        for modo, r in resultados.items():
+            print(
+                f"{modo:>10} {r['ventas_por_s']:>10.1f} {r['errores']:>8} "
+                f"{r.get('por_commit', 1):>11.1f}"
+            )
+        return
+
+    print(f"{'renglones':>10} {'ventas/s':>10} {'renglones/s':>12}")
+    for size, r in resultados.items():
+        print(f"{size:>10} {r['ventas_por_s']:>10.1f} {r['renglones_por_s']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+# Arnés de benchmarks: mide las operaciones calientes y guarda el resultado en JSON.
+# Ejecuta: python -m benchmarks.run --db bench.db [--generar chica] [--out r.json] [--comparar base.json]
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+import database
+from benchmarks import synthetic
+
+# Una operación es más lenta que la base si su p50 crece más que esto
+UMBRAL_REGRESION = 0.20
+# ...y además en más de esto; debajo de unos microsegundos domina el ruido
+UMBRAL_ABSOLUTO_MS = 0.05
+
+
+def _commit_actual() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def medir(fn: Callable[[], object], repeticiones: int, calentamiento: int = 3) -> dict:
+    """Latencias de `fn` en milisegundos: n, media, p50, p95, p99, min, max."""
+    for _ in range(calentamiento):
+        fn()
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+
+    def pct(p: float) -> float:
+        return tiempos[min(len(tiempos) - 1, int(p * len(tiempos)))]
+
+    return {
+        "n": len(tiempos),
+        "media_ms": statistics.fmean(tiempos),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": tiempos[0],
+        "max_ms": tiempos[-1],
+    }
+
+
+def operaciones(conn: sqlite3.Connection, rnd: random.Random) -> dict[str, tuple[Callable, int]]:
+    """Operaciones calientes -> (función sin argumentos, repeticiones)."""
+    codigos = [r[0] for r in conn.execute("SELECT codigo FROM Articulos LIMIT 5000")]
+    correos = [r[0] for r in conn.execute("SELECT correo FROM Usuarios")]
+    usuario_id = conn.execute("SELECT MIN(usuario_id) FROM Usuarios").fetchone()[0]
+    cliente_id = conn.execute("SELECT MIN(cliente_id) FROM Clientes").fetchone()[0]
+    dias = [r[0] for r in conn.execute("SELECT DISTINCT dia FROM Resumen_Ventas_Diario")]
+    hash_demo = database.hash_password("cajero")
+    max_folio = conn.execute("SELECT COALESCE(MAX(folio), 0) FROM Ventas").fetchone()[0]
+
+    def login():
+        conn.execute(database.LOGIN_SQL, (rnd.choice(correos),)).fetchone()
+
+    def login_pbkdf2():
+        database.verificar_password("cajero", hash_demo)
+
+    def filtro(table: str, textos: list[str], columnas: list[str]):
+        def run():
+            sql, params = database.search_query(table, rnd.choice(textos), columnas)
+            conn.execute(sql, params).fetchall()
+        return run
+
+    def pagina_keyset():
+        # Lo que hace KeysetTableModel.fetchMore al hacer scroll en Ventas
+        conn.execute(
+            "SELECT rowid, * FROM Ventas WHERE rowid > ? ORDER BY rowid LIMIT 256",
+            (rnd.randint(0, max_folio),),
+        ).fetchall()
+
+    def venta():
+        database.registrar_venta(
+            cliente_id, usuario_id, [(rnd.choice(codigos), 1) for _ in range(5)]
+        )
+
+    def existencia():
+        conn.execute(
+            "SELECT existencia FROM Almacen WHERE codigo_articulo = ?",
+            (rnd.choice(codigos),),
+        ).fetchone()
+
+    def precio_cache():
+        database.catalogo.precio(rnd.choice(codigos))
+
+    def existencia_historica():
+        database.existencia_al(conn, rnd.choice(codigos), rnd.choice(dias) if dias else "2025-06-30")
+
+    def reporte_diario():
+        database.ventas_diarias(conn, "2025-01-01", "2025-12-31")
+
+    def reporte_articulo():
+        sql, _ = database.HOT_QUERIES["ventas_por_articulo"]
+        conn.execute(sql, (rnd.choice(codigos),)).fetchall()
+
+    ops = {
+        "login": (login, 500),
+        "login_pbkdf2": (login_pbkdf2, 10),
+        "filtro_articulos": (filtro("Articulos", ["para", "ibu", "vit", "jar", "crema ge"], []), 200),
+        "filtro_clientes": (filtro("Clientes", ["ana", "lopez", "maria garc", "xaxx0000"], []), 200),
+        "filtro_ventas_like": (filtro("Ventas", ["2025-03", "1500"], ["folio", "fecha", "total"]), 20),
+        "pagina_keyset": (pagina_keyset, 200),
+        "venta_5_renglones": (venta, 200),
+        "existencia": (existencia, 1000),
+        "precio_cache": (precio_cache, 1000),
+        "existencia_historica": (existencia_historica, 200),
+        "reporte_ventas_diarias": (reporte_diario, 50),
+        "reporte_por_articulo": (reporte_articulo, 200),
+    }
+    try:
+        import reportes
+    except ImportError:  # sin numpy se omite el reporte vectorizado
+        return ops
+
+    def reporte_top():
+        reportes.top_vendidos(reportes.por_articulo(reportes.renglones_venta(conn, "2025-01-01", "2025-02-01")))
+
+    ops["reporte_top_mes"] = (reporte_top, 5)
+    return ops
+
+
+def comparar(actual: dict, base: dict) -> list[str]:
+    """Operaciones cuyo p50 empeoró más que UMBRAL_REGRESION respecto a `base`."""
+    regresiones = []
+    for nombre, r in actual["resultados"].items():
+        b = base.get("resultados", {}).get(nombre)
+        if not b:
+            continue
+        cambio = r["p50_ms"] / b["p50_ms"] - 1 if b["p50_ms"] else 0.0
+        peor = cambio > UMBRAL_REGRESION and r["p50_ms"] - b["p50_ms"] > UMBRAL_ABSOLUTO_MS
+        marca = "  <-- REGRESIÓN" if peor else ""
+        print(f"{nombre:<26} {b['p50_ms']:>9.3f} -> {r['p50_ms']:>9.3f} ms ({cambio:+.0%}){marca}")
+        if marca:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de operaciones calientes")
+    parser.add_argument("--db", required=True, help="archivo SQLite a medir")
+    parser.add_argument("--generar", choices=synthetic.ESCALAS, help="crea la BD con esa escala si no existe")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--solo", nargs="*", help="nombres de operaciones a correr")
+    parser.add_argument("--out", help="archivo JSON de salida")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    database.DB_FILE = args.db
+    if args.generar and not os.path.exists(args.db):
+        articulos, clientes, renglones = synthetic.ESCALAS[args.generar]
+        with database.sqlite_conn() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            database.migrate(conn)
+            synthetic.generar(conn, articulos, clientes, renglones, args.semilla)
+
+    resultados = {}
+    conn = database.open_conn()
+    try:
+        database.migrate(conn)
+        rnd = random.Random(args.semilla)
+        for nombre, (fn, reps) in operaciones(conn, rnd).items():
+            if args.solo and nombre not in args.solo:
+                continue
+            resultados[nombre] = medir(fn, reps)
+            r = resultados[nombre]
+            print(f"{nombre:<26} p50 {r['p50_ms']:>9.3f} ms   p95 {r['p95_ms']:>9.3f} ms")
+        filas = {
+            t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0]
+            for t in ("Articulos", "Clientes", "Ventas", "Detalle_Venta")
+        }
+    finally:
+        conn.close()
+        database.catalogo.close()
+        database.pool.close_all()
+
+    salida = {
+        "meta": {
+            "commit": _commit_actual(),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "maquina": platform.platform(),
+            "filas": filas,
+        },
+        "resultados": resultados,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(salida, base):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
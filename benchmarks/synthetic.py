@@ -0,0 +1,204 @@
+# Generador determinista de datos sintéticos para el esquema de la farmacia.
+# Ejecuta: python -m benchmarks.synthetic --db bench.db --escala mediana [--semilla 1]
+from __future__ import annotations
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+import database
+
+# Escalas predefinidas: (artículos, clientes, renglones de venta)
+ESCALAS = {
+    "chica": (1_000, 5_000, 50_000),
+    "mediana": (10_000, 100_000, 1_000_000),
+    "grande": (100_000, 1_000_000, 10_000_000),
+}
+# Renglones por commit: acota el tamaño del WAL sin pagar un fsync por venta
+LOTE = 50_000
+INICIO = datetime(2025, 1, 1)
+PALABRAS = (
+    "Paracetamol Ibuprofeno Naproxeno Omeprazol Loratadina Amoxicilina Metformina "
+    "Losartán Vitamina Jarabe Crema Gotas Tabletas Cápsulas Suspensión Gel"
+).split()
+NOMBRES = "Ana Luis María José Carmen Jorge Sofía Pedro Lucía Miguel Elena Juan".split()
+APELLIDOS = "García López Pérez Sánchez Ramírez Torres Flores Rivera Gómez Díaz".split()
+
+
+def _lotes(it, n: int):
+    lote = []
+    for x in it:
+        lote.append(x)
+        if len(lote) >= n:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def generar(
+    conn,
+    articulos: int,
+    clientes: int,
+    renglones: int,
+    semilla: int = 1,
+    dias: int = 365,
+    progreso=print,
+) -> dict[str, int]:
+    """
+    Llena una BD vacía (ya migrada) con datos reproducibles: misma semilla,
+    mismos datos. Las ventas pasan por los triggers como en producción
+    (stock, kardex, resumen y puntos). Devuelve cuántas filas se crearon.
+    """
+    rnd = random.Random(semilla)
+    cur = conn.cursor()
+    cur.execute("PRAGMA synchronous = OFF")  # datos desechables: velocidad ante todo
+
+    hash_cajero = database._hash_password("cajero")
+    cur.executemany(
+        "INSERT INTO Usuarios(nombre, correo, password_hash, rol) VALUES (?,?,?,?)",
+        [
+            (f"Cajero {i}", f"cajero{i}@farmacia.test", hash_cajero, "cajero")
+            for i in range(1, 21)
+        ],
+    )
+    usuarios = [r[0] for r in cur.execute("SELECT usuario_id FROM Usuarios")]
+    conn.commit()
+
+    codigos = [f"S{i:07d}" for i in range(articulos)]
+    precios = [round(rnd.uniform(5, 900), 2) for _ in codigos]
+    for lote in _lotes(
+        (
+            (c, f"{rnd.choice(PALABRAS)} {rnd.choice(PALABRAS)} {i}", p, rnd.random() < 0.1)
+            for i, (c, p) in enumerate(zip(codigos, precios))
+        ),
+        LOTE,
+    ):
+        cur.executemany(
+            "INSERT INTO Articulos(codigo, descripcion, precio, en_promocion) VALUES (?,?,?,?)",
+            lote,
+        )
+        conn.commit()
+    progreso(f"{articulos} artículos")
+
+    for lote in _lotes(
+        (
+            (
+                rnd.choice(usuarios),
+                f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+                f"XAXX{i:09d}",
+                3300000000 + i,
+            )
+            for i in range(clientes)
+        ),
+        LOTE,
+    ):
+        cur.executemany(
+            "INSERT INTO Clientes(usuario_id, nombre, rfc, telefono) VALUES (?,?,?,?)", lote
+        )
+        conn.commit()
+    cliente_ids = (
+        cur.execute("SELECT MIN(cliente_id), MAX(cliente_id) FROM Clientes").fetchone()
+    )
+    progreso(f"{clientes} clientes")
+
+    # Una compra inicial con stock suficiente para todas las ventas
+    cur.execute("INSERT INTO Compras(fecha) VALUES (?)", (INICIO.strftime("%Y-%m-%d %H:%M:%S"),))
+    compra_id = cur.lastrowid
+    stock = max(10, renglones * 3 // max(articulos, 1) * 4)
+    for lote in _lotes(
+        (
+            (compra_id, i, c, stock, round(p * rnd.uniform(0.4, 0.8), 2))
+            for i, (c, p) in enumerate(zip(codigos, precios), start=1)
+        ),
+        LOTE,
+    ):
+        cur.executemany(
+            "INSERT INTO Detalle_Compra(compra_id, detalle_compra_id, codigo_articulo, "
+            "cantidad, costo_unitario) VALUES (?,?,?,?,?)",
+            lote,
+        )
+        conn.commit()
+
+    # Ventas: 1 a 8 renglones por ticket; popularidad con cola larga (Pareto)
+    hechos = 0
+    ventas = 0
+    t0 = time.perf_counter()
+    segundos = dias * 86400
+    while hechos < renglones:
+        cab, det = [], []
+        en_lote = 0
+        while en_lote < LOTE and hechos + en_lote < renglones:
+            n = min(rnd.randint(1, 8), renglones - hechos - en_lote)
+            en_lote += n
+            instante = INICIO + timedelta(seconds=rnd.randrange(segundos))
+            instante = instante.replace(hour=rnd.randint(8, 21))
+            lineas = []
+            for j in range(1, n + 1):
+                k = min(int(rnd.paretovariate(1.16)) - 1, articulos - 1)
+                k = (k * 7919) % articulos  # dispersa los populares por el catálogo
+                lineas.append((j, codigos[k], rnd.randint(1, 3), precios[k]))
+            total = round(sum(q * p for _, _, q, p in lineas), 2)
+            folio = len(cab)
+            cab.append(
+                (
+                    instante.strftime("%Y-%m-%d %H:%M:%S"),
+                    rnd.randint(*cliente_ids),
+                    rnd.choice(usuarios),
+                    total,
+                )
+            )
+            det.append((folio, lineas))
+        # Folios reales: se insertan los encabezados y se toman sus rowid
+        primero = cur.execute("SELECT COALESCE(MAX(folio), 0) FROM Ventas").fetchone()[0] + 1
+        cur.executemany(
+            "INSERT INTO Ventas(folio, fecha, cliente_id, usuario_id, total) VALUES (?,?,?,?,?)",
+            [(primero + i, *c) for i, c in enumerate(cab)],
+        )
+        cur.executemany(
+            "INSERT INTO Detalle_Venta(folio_venta, detalle_venta_id, codigo_articulo, "
+            "cantidad, precio_unitario) VALUES (?,?,?,?,?)",
+            [(primero + f, *ln) for f, lineas in det for ln in lineas],
+        )
+        conn.commit()
+        hechos += en_lote
+        ventas += len(cab)
+        rate = hechos / (time.perf_counter() - t0)
+        progreso(f"{hechos}/{renglones} renglones de venta ({rate:,.0f}/s)")
+
+    return {
+        "usuarios": len(usuarios),
+        "articulos": articulos,
+        "clientes": clientes,
+        "ventas": ventas,
+        "renglones_venta": hechos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos reproducibles")
+    parser.add_argument("--db", required=True, help="archivo SQLite nuevo")
+    parser.add_argument("--escala", choices=ESCALAS, default="chica")
+    parser.add_argument("--articulos", type=int)
+    parser.add_argument("--clientes", type=int)
+    parser.add_argument("--renglones", type=int, help="renglones de venta")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    articulos, clientes, renglones = ESCALAS[args.escala]
+    database.DB_FILE = args.db
+    with database.sqlite_conn() as conn:
+        conn.execute("PRAGMA journal_mode = WAL")
+        database.migrate(conn)
+        filas = generar(
+            conn,
+            args.articulos or articulos,
+            args.clientes or clientes,
+            args.renglones or renglones,
+            args.semilla,
+        )
+    database.pool.close_all()
+    print(filas)
+
+
+if __name__ == "__main__":
+    main()
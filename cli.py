@@ -0,0 +1,291 @@
+# cli.py
+# Tareas de mantenimiento sin interfaz gráfica.
+# Ejecuta: python cli.py <comando> [opciones]
+from __future__ import annotations
+import argparse
+import sys
+import database
+from database import (
+    MIGRATIONS,
+    check_query_plans,
+    existencia_al,
+    migrate,
+    rebuild_resumen_diario,
+    recalcular_puntos,
+    schema_version,
+    seed_demo,
+    sqlite_conn,
+    tomar_snapshot_almacen,
+    vacuum,
+    verificar_almacen,
+    verificar_puntos,
+    verificar_resumen_diario,
+)
+
+
+def cmd_explain(args) -> int:
+    """Muestra el plan de las consultas calientes; falla si alguna recorre una tabla completa."""
+    with sqlite_conn() as conn:
+        plans = check_query_plans(conn)
+    bad = 0
+    for name, (ok, plan) in plans.items():
+        bad += not ok
+        print(f"[{'ok' if ok else 'SCAN'}] {name}")
+        for step in plan:
+            print(f"      {step}")
+    return 1 if bad else 0
+
+
+def cmd_migrate(args) -> int:
+    """Aplica las migraciones pendientes y dice en qué versión quedó la BD."""
+    with sqlite_conn() as conn:
+        applied = migrate(conn)
+        version = schema_version(conn)
+    descs = dict((v, d) for v, d, _fn in MIGRATIONS)
+    for v in applied:
+        print(f"  {v:3d}  {descs[v]}")
+    print(f"Esquema en versión {version}.")
+    return 0
+
+
+def cmd_seed(args) -> int:
+    """Carga los datos de ejemplo (usuarios, catálogo mínimo y una venta)."""
+    with sqlite_conn() as conn:
+        migrate(conn)
+        seed_demo(conn)
+    print("Datos de ejemplo cargados.")
+    return 0
+
+
+def cmd_resumen(args) -> int:
+    """Revisa (o reconstruye con --rebuild) el resumen diario de ventas."""
+    with sqlite_conn() as conn:
+        if args.rebuild:
+            diferencias = rebuild_resumen_diario(conn)
+        else:
+            diferencias = verificar_resumen_diario(conn)
+    for dia, codigo, guardado, calculado in diferencias:
+        print(f"  {dia} {codigo}: resumen={guardado} real={calculado}")
+    if args.rebuild:
+        print(f"Resumen reconstruido ({len(diferencias)} diferencias corregidas).")
+        return 0
+    print(f"{len(diferencias)} diferencias.")
+    return 1 if diferencias else 0
+
+
+def cmd_almacen(args) -> int:
+    """Kardex: corte de existencias, consulta a una fecha o revisión contra Almacen."""
+    with sqlite_conn() as conn:
+        if args.accion == "snapshot":
+            n = tomar_snapshot_almacen(conn, args.fecha)
+            print(f"Corte guardado para {n} artículos.")
+            return 0
+        if args.accion == "existencia":
+            if not args.codigo or not args.fecha:
+                print("existencia requiere --codigo y --fecha", file=sys.stderr)
+                return 2
+            print(existencia_al(conn, args.codigo, args.fecha))
+            return 0
+        diferencias = verificar_almacen(conn)
+    for codigo, almacen, kardex in diferencias:
+        print(f"  {codigo}: almacen={almacen} kardex={kardex}")
+    print(f"{len(diferencias)} diferencias.")
+    return 1 if diferencias else 0
+
+
+def cmd_puntos(args) -> int:
+    """Revisa (o corrige con --recalcular) los puntos de los clientes contra Ventas."""
+    with sqlite_conn() as conn:
+        if args.recalcular:
+            diferencias = recalcular_puntos(conn)
+        else:
+            diferencias = verificar_puntos(conn)
+    for cliente_id, guardados, calculados in diferencias:
+        print(f"  cliente {cliente_id}: guardados={guardados} calculados={calculados}")
+    if args.recalcular:
+        print(f"Puntos recalculados ({len(diferencias)} diferencias corregidas).")
+        return 0
+    print(f"{len(diferencias)} diferencias.")
+    return 1 if diferencias else 0
+
+
+def cmd_integridad(args) -> int:
+    """Existencias y puntos contra compras y ventas; --reparar corrige todo junto."""
+    from integridad import revisar
+
+    informe = revisar(reparar=args.reparar)
+    print("\n".join(informe.lineas(max_detalle=args.detalle)))
+    return 0 if args.reparar or not informe.diferencias else 1
+
+
+def cmd_vacuum(args) -> int:
+    """Compacta la base y reconstruye lo que depende de los rowid (FTS, referencias)."""
+    import os
+    import time
+
+    antes = os.path.getsize(database.DB_FILE)
+    t0 = time.perf_counter()
+    with sqlite_conn() as conn:
+        migrate(conn)
+        conn.commit()
+        vacuum(conn)
+    despues = os.path.getsize(database.DB_FILE)
+    print(
+        f"{antes / 2**20:.1f} MB -> {despues / 2**20:.1f} MB "
+        f"en {time.perf_counter() - t0:.1f} s; índices FTS reconstruidos."
+    )
+    return 0
+
+
+def cmd_importar(args) -> int:
+    """Carga masiva desde CSV: lista de precios o factura de compra."""
+    import time
+    from importacion import importar_articulos, importar_compra
+
+    def progreso(r):
+        print(f"  {r['leidos']:>10,} renglones leídos", end="\r", file=sys.stderr, flush=True)
+
+    t0 = time.perf_counter()
+    with sqlite_conn() as conn:
+        migrate(conn)
+        if args.tipo == "articulos":
+            r = importar_articulos(
+                conn,
+                args.archivo,
+                lote=args.lote,
+                separador=args.separador,
+                diferir=not args.sin_diferir,
+                progreso=progreso,
+            )
+        else:
+            r = importar_compra(
+                conn,
+                args.archivo,
+                fecha=args.fecha,
+                lote=args.lote,
+                separador=args.separador,
+                diferir=not args.sin_diferir,
+                progreso=progreso,
+            )
+    print(file=sys.stderr)
+    for linea, mensaje in r["errores"][:20]:
+        print(f"  línea {linea}: {mensaje}")
+    if len(r["errores"]) > 20:
+        print(f"  ... y {len(r['errores']) - 20} más")
+    if r.get("compra_id") is not None:
+        print(f"Compra {r['compra_id']}: {r['renglones']} renglones.")
+    print(
+        f"{r['leidos']} leídos, {r['articulos']} artículos, "
+        f"{len(r['errores'])} rechazados en {time.perf_counter() - t0:.1f} s."
+    )
+    return 1 if r["errores"] else 0
+
+
+def cmd_exportar(args) -> int:
+    """Exporta una tabla a CSV o JSON Lines sin cargarla completa en memoria."""
+    from exportacion import exportar_tabla
+
+    def progreso(n):
+        print(f"  {n:>10,} filas", end="\r", file=sys.stderr, flush=True)
+
+    columnas = args.columnas.split(",") if args.columnas else None
+    with sqlite_conn() as conn:
+        try:
+            n = exportar_tabla(
+                conn,
+                args.tabla,
+                args.archivo,
+                formato=args.formato,
+                filtro=args.filtro,
+                columnas=columnas,
+                desde=args.desde,
+                hasta=args.hasta,
+                progreso=progreso,
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+    print(file=sys.stderr)
+    print(f"{n} filas exportadas a {args.archivo}.")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Farmacia - mantenimiento")
+    parser.add_argument("--db", help=f"archivo SQLite (por omisión {database.DB_FILE})")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("migrate", help="aplica las migraciones pendientes")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("seed", help="carga los datos de ejemplo")
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("resumen", help="compara el resumen diario de ventas con los datos")
+    p.add_argument("--rebuild", action="store_true", help="recalcula el resumen desde cero")
+    p.set_defaults(func=cmd_resumen)
+
+    p = sub.add_parser("almacen", help="kardex de almacén")
+    p.add_argument("accion", choices=("check", "snapshot", "existencia"))
+    p.add_argument("--fecha", help="YYYY-MM-DD (al cierre del día) o fecha y hora")
+    p.add_argument("--codigo", help="codigo_articulo para 'existencia'")
+    p.set_defaults(func=cmd_almacen)
+
+    p = sub.add_parser("puntos", help="compara los puntos de los clientes con sus ventas")
+    p.add_argument(
+        "--recalcular", action="store_true", help="corrige las diferencias con un ajuste en el libro"
+    )
+    p.set_defaults(func=cmd_puntos)
+
+    p = sub.add_parser(
+        "integridad", help="revisa existencias y puntos contra compras y ventas"
+    )
+    p.add_argument(
+        "--reparar", action="store_true", help="corrige las diferencias en una transacción"
+    )
+    p.add_argument("--detalle", type=int, default=20, help="renglones a mostrar por tipo")
+    p.set_defaults(func=cmd_integridad)
+
+    p = sub.add_parser("importar", help="carga masiva desde CSV")
+    p.add_argument("tipo", choices=("articulos", "compra"))
+    p.add_argument("archivo", help="CSV con encabezados")
+    p.add_argument("--fecha", help="fecha de la compra (hoy si se omite)")
+    p.add_argument("--lote", type=int, default=10_000, help="renglones por transacción")
+    p.add_argument("--separador", default=",")
+    p.add_argument(
+        "--sin-diferir",
+        action="store_true",
+        help="deja que los triggers trabajen renglón por renglón en vez de una vez por lote",
+    )
+    p.set_defaults(func=cmd_importar)
+
+    p = sub.add_parser("exportar", help="exporta una tabla a CSV o JSON Lines")
+    p.add_argument("tabla")
+    p.add_argument("archivo", help="destino; .jsonl/.ndjson para JSON Lines")
+    p.add_argument("--formato", choices=("csv", "jsonl"), help="por omisión, según la extensión")
+    p.add_argument("--filtro", default="", help="mismo texto que el filtro rápido")
+    p.add_argument("--columnas", help="lista separada por comas (todas si se omite)")
+    p.add_argument("--desde", help="YYYY-MM-DD, inclusivo")
+    p.add_argument("--hasta", help="YYYY-MM-DD, inclusivo")
+    p.set_defaults(func=cmd_exportar)
+
+    p = sub.add_parser(
+        "vacuum", help="compacta la base (única forma segura: reconstruye los FTS)"
+    )
+    p.set_defaults(func=cmd_vacuum)
+
+    p = sub.add_parser("explain", help="revisa que las consultas calientes usen índices")
+    p.set_defaults(func=cmd_explain)
+
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_FILE = args.db
+    try:
+        return args.func(args)
+    finally:
+        database.catalogo.close()
+        database.pool.close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,279 @@
 # database.py
 import os
-import sys
+import re
 import hashlib
+import hmac
 import sqlite3
+import threading
+from array import array
+from collections.abc import Callable
 from contextlib import contextmanager
-from PySide6.QtSql import QSqlDatabase
-from PySide6.QtWidgets import QMessageBox
+import diagnostico
 
 DB_FILE = "farmacia.db"
 
 
 # ---------- Utilerías ----------
 def _hash_password(text: str) -> str:
+    # Formato viejo (sha256 sin sal); solo se sigue aceptando al verificar
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+# Contraseñas: PBKDF2-HMAC-SHA256 con sal por usuario, guardado como
+# "pbkdf2_sha256$<iteraciones>$<sal hex>$<hash hex>". Subir las iteraciones
+# es seguro: los hashes con menos se actualizan solos al siguiente login.
+PBKDF2_ITERACIONES = 200_000
+_PBKDF2_PREFIJO = "pbkdf2_sha256"
+
+
+def hash_password(text: str, iteraciones: int | None = None) -> str:
+    """Hash salado de una contraseña en el formato actual."""
+    iteraciones = iteraciones or PBKDF2_ITERACIONES
+    sal = os.urandom(16)
+    dk = hashlib.pbkdf2_hmac("sha256", text.encode("utf-8"), sal, iteraciones)
+    return f"{_PBKDF2_PREFIJO}${iteraciones}${sal.hex()}${dk.hex()}"
+
+
+def verificar_password(text: str, guardado: str) -> bool:
+    """Compara en tiempo constante; acepta el formato actual y el sha256 viejo."""
+    if not guardado:
+        return False
+    partes = guardado.split("$")
+    if len(partes) == 4 and partes[0] == _PBKDF2_PREFIJO:
+        try:
+            iteraciones, sal = int(partes[1]), bytes.fromhex(partes[2])
+        except ValueError:
+            return False
+        dk = hashlib.pbkdf2_hmac("sha256", text.encode("utf-8"), sal, iteraciones)
+        return hmac.compare_digest(dk.hex(), partes[3])
+    return hmac.compare_digest(_hash_password(text), guardado)
+
+
+def necesita_rehash(guardado: str) -> bool:
+    """True si el hash es sha256 viejo o tiene menos iteraciones que las actuales."""
+    partes = guardado.split("$")
+    if len(partes) != 4 or partes[0] != _PBKDF2_PREFIJO:
+        return True
+    return not partes[1].isdigit() or int(partes[1]) < PBKDF2_ITERACIONES
+
+
+# ---------- Conexiones ----------
+# Ajustes que se aplican a TODA conexión (sqlite3 y Qt). journal_mode=WAL
+# queda guardado en el archivo y se fija una vez en init_sqlite_file: con WAL
+# los lectores (reportes, búsquedas) no bloquean al que registra ventas.
+BUSY_TIMEOUT_MS = 5000
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+    "PRAGMA synchronous = NORMAL",  # seguro con WAL; fsync solo en checkpoint
+    "PRAGMA cache_size = -16000",  # ~16 MB de páginas por conexión
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+)
+# Sentencias preparadas que guarda cada conexión sqlite3
+STATEMENT_CACHE_SIZE = 256
+
+
+def open_conn(origen: str | None = "pool") -> sqlite3.Connection:
+    """
+    Conexión nueva con los ajustes de CONNECTION_PRAGMAS (modelos, hilos de
+    trabajo). Sus sentencias se miden en diagnostico.registro bajo `origen`;
+    con None no se miden.
+    """
+    medida = origen is not None and diagnostico.ACTIVO
+    conn = sqlite3.connect(
+        DB_FILE,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,  # la del pool puede tomarla cualquier hilo (una a la vez)
+        factory=diagnostico.ConexionMedida if medida else sqlite3.Connection,
+    )
+    if medida:
+        conn.origen = origen
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Conexiones listas para usar. Se reutilizan en vez de abrir una por
+    consulta, así cada una conserva su caché de páginas y de sentencias
+    preparadas. Seguro entre hilos; cada conexión la usa un hilo a la vez.
+    """
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return open_conn()
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.execute("PRAGMA optimize")
+            conn.close()
+
+
+pool = ConnectionPool()
+
+
 @contextmanager
 def sqlite_conn():
-    """Conexión de conveniencia con foreign_keys activado y commits seguros."""
-    conn = sqlite3.connect(DB_FILE)
+    """Conexión del pool con commit al salir bien y rollback si algo falla."""
+    conn = pool.acquire()
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
         yield conn
         conn.commit()
     finally:
-        conn.close()
+        pool.release(conn)
 
 
-def _ensure_schema(conn: sqlite3.Connection):
-    cur = conn.cursor()
-    cur.executescript("""
-    PRAGMA foreign_keys=ON;
+# ---------- Búsqueda de texto completo (FTS5) ----------
+# Tabla -> columnas indexadas en su tabla espejo "<Tabla>_fts". El FTS de
+# contenido externo apunta a las filas por rowid, y en tablas sin INTEGER
+# PRIMARY KEY (Articulos) VACUUM puede renumerarlos: compactar solo con
+# vacuum(), que reconstruye los índices después.
+FTS_TABLES: dict[str, tuple[str, ...]] = {
+    "Articulos": ("codigo", "descripcion"),
+    "Clientes": ("nombre", "rfc", "telefono"),
+    "Usuarios": ("nombre", "correo"),
+}
+
+# Columnas que, al cambiar, obligan a reindexar además de las de texto
+# (la llave primaria cuando es alias de rowid).
+_FTS_ROWID_COLS = {"Clientes": ("cliente_id",), "Usuarios": ("usuario_id",)}
+
+
+def _fts_schema_sql() -> str:
+    """
+    Tablas FTS5 de contenido externo (no duplican los datos) y triggers que
+    las mantienen al día con su tabla origen.
+    """
+    parts = []
+    for table, cols in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        col_list = ", ".join(cols)
+        new_vals = ", ".join(f"NEW.{c}" for c in cols)
+        old_vals = ", ".join(f"OLD.{c}" for c in cols)
+        watched = ", ".join(cols + _FTS_ROWID_COLS.get(table, ()))
+        low = table.lower()
+        parts.append(f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+      {col_list},
+      content='{table}',
+      tokenize='unicode61 remove_diacritics 2',
+      prefix='2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_fts_ai
+    AFTER INSERT ON {table}
+    BEGIN
+      INSERT INTO {fts}(rowid, {col_list}) VALUES (NEW.rowid, {new_vals});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_fts_ad
+    AFTER DELETE ON {table}
+    BEGIN
+      INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', OLD.rowid, {old_vals});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_fts_au
+    AFTER UPDATE OF {watched} ON {table}
+    BEGIN
+      INSERT INTO {fts}({fts}, rowid, {col_list}) VALUES ('delete', OLD.rowid, {old_vals});
+      INSERT INTO {fts}(rowid, {col_list}) VALUES (NEW.rowid, {new_vals});
+    END;
+""")
+    return "".join(parts)
+
+
+def fts_query(text: str) -> str:
+    """
+    Convierte texto libre en una consulta MATCH de FTS5: cada palabra se busca
+    como prefijo y todas deben aparecer. Devuelve "" si no hay palabras.
+    """
+    tokens = re.findall(r"\w+", text)
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def fts_search_sql(table: str) -> str:
+    """SELECT de rowids que coinciden con un MATCH (parámetro ?), ordenados por relevancia."""
+    fts = f"{table}_fts"
+    return f'SELECT rowid FROM "{fts}" WHERE "{fts}" MATCH ? ORDER BY rank'
+
+
+# Máximo de coincidencias que devuelve una búsqueda del filtro rápido
+SEARCH_LIMIT = 1000
+
+
+def search_query(
+    table: str, text: str, columns: list[str], limit: int | None = SEARCH_LIMIT
+) -> tuple[str, tuple] | None:
+    """
+    (sql, params) que devuelve los rowids de `table` que coinciden con `text`:
+    FTS5 si la tabla tiene índice, LIKE sobre `columns` si no. Con
+    limit=None devuelve todas las coincidencias. None si no hay nada que
+    buscar.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    tail, tail_params = (" LIMIT ?", (limit,)) if limit is not None else ("", ())
+    if table in FTS_TABLES:
+        match = fts_query(text)
+        if not match:
+            return None
+        return fts_search_sql(table) + tail, (match, *tail_params)
+    if not columns:
+        return None
+    likes = " OR ".join(f'CAST("{c}" AS TEXT) LIKE ?' for c in columns)
+    sql = f'SELECT rowid FROM "{table}" WHERE {likes} ORDER BY rowid' + tail
+    return sql, (*[f"%{text}%"] * len(columns), *tail_params)
 
+
+def vacuum(conn: sqlite3.Connection):
+    """
+    Compacta la base. Como VACUUM puede renumerar los rowid de las tablas sin
+    INTEGER PRIMARY KEY, después reconstruye los FTS y anota en
+    Cambios_Referencias que las listas de referencias se relean completas.
+    No debe haber una transacción abierta en `conn`.
+    """
+    conn.execute("VACUUM")
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in FTS_TABLES:
+            fts = f"{table}_fts"
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        conn.executemany(
+            "INSERT INTO Cambios_Referencias(tabla, fila) VALUES (?, NULL)",
+            [(t,) for t in REFERENCIADAS],
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# ---------- Esquema ----------
+# Versión 1: tablas y triggers originales. Se escribe con IF NOT EXISTS para
+# que también aplique sobre bases creadas antes de las migraciones.
+_SCHEMA_V1 = """
     -- Seguridad
     CREATE TABLE IF NOT EXISTS Usuarios (
         usuario_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,9 +396,1634 @@ def _ensure_schema(conn: sqlite3.Connection):
       SET puntos = puntos + ((CAST(NEW.total AS INTEGER) / 100) * 4)
       WHERE cliente_id = NEW.cliente_id;
     END;
-    """)
+"""
+
+
+# Versión 4: resumen diario de ventas por artículo, mantenido por triggers.
+# tickets = ventas de ese día que incluyen el artículo (cuenta una vez por
+# folio aunque el artículo aparezca en varios renglones). Las filas que
+# quedan sin tickets se borran, así el resumen siempre coincide con un
+# recálculo desde cero.
+_DIA_VENTA_NEW = "(SELECT date(fecha) FROM Ventas WHERE folio = NEW.folio_venta)"
+_DIA_VENTA_OLD = "(SELECT date(fecha) FROM Ventas WHERE folio = OLD.folio_venta)"
+_SCHEMA_V4 = f"""
+    CREATE TABLE IF NOT EXISTS Resumen_Ventas_Diario (
+      dia DATE NOT NULL,
+      codigo_articulo VARCHAR(20) NOT NULL,
+      unidades INT NOT NULL,
+      importe DECIMAL(12,2) NOT NULL,
+      tickets INT NOT NULL,
+      PRIMARY KEY (dia, codigo_articulo)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_detventa_ai_resumen
+    AFTER INSERT ON Detalle_Venta
+    BEGIN
+      INSERT INTO Resumen_Ventas_Diario(dia, codigo_articulo, unidades, importe, tickets)
+      VALUES (
+        {_DIA_VENTA_NEW}, NEW.codigo_articulo, NEW.cantidad,
+        NEW.cantidad * NEW.precio_unitario,
+        NOT EXISTS (SELECT 1 FROM Detalle_Venta
+                    WHERE folio_venta = NEW.folio_venta
+                      AND codigo_articulo = NEW.codigo_articulo
+                      AND rowid <> NEW.rowid)
+      )
+      ON CONFLICT(dia, codigo_articulo) DO UPDATE SET
+        unidades = unidades + excluded.unidades,
+        importe = importe + excluded.importe,
+        tickets = tickets + excluded.tickets;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_detventa_au_resumen
+    AFTER UPDATE OF folio_venta, codigo_articulo, cantidad, precio_unitario ON Detalle_Venta
+    BEGIN
+      UPDATE Resumen_Ventas_Diario
+      SET unidades = unidades - OLD.cantidad,
+          importe = importe - OLD.cantidad * OLD.precio_unitario,
+          tickets = tickets - NOT EXISTS (SELECT 1 FROM Detalle_Venta
+                                          WHERE folio_venta = OLD.folio_venta
+                                            AND codigo_articulo = OLD.codigo_articulo)
+      WHERE dia = {_DIA_VENTA_OLD} AND codigo_articulo = OLD.codigo_articulo;
+      DELETE FROM Resumen_Ventas_Diario
+      WHERE dia = {_DIA_VENTA_OLD} AND codigo_articulo = OLD.codigo_articulo AND tickets = 0;
+
+      INSERT INTO Resumen_Ventas_Diario(dia, codigo_articulo, unidades, importe, tickets)
+      VALUES (
+        {_DIA_VENTA_NEW}, NEW.codigo_articulo, NEW.cantidad,
+        NEW.cantidad * NEW.precio_unitario,
+        (OLD.folio_venta IS NOT NEW.folio_venta OR OLD.codigo_articulo IS NOT NEW.codigo_articulo)
+        AND NOT EXISTS (SELECT 1 FROM Detalle_Venta
+                        WHERE folio_venta = NEW.folio_venta
+                          AND codigo_articulo = NEW.codigo_articulo
+                          AND rowid <> NEW.rowid)
+      )
+      ON CONFLICT(dia, codigo_articulo) DO UPDATE SET
+        unidades = unidades + excluded.unidades,
+        importe = importe + excluded.importe,
+        tickets = tickets + excluded.tickets;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_detventa_ad_resumen
+    AFTER DELETE ON Detalle_Venta
+    BEGIN
+      UPDATE Resumen_Ventas_Diario
+      SET unidades = unidades - OLD.cantidad,
+          importe = importe - OLD.cantidad * OLD.precio_unitario,
+          tickets = tickets - NOT EXISTS (SELECT 1 FROM Detalle_Venta
+                                          WHERE folio_venta = OLD.folio_venta
+                                            AND codigo_articulo = OLD.codigo_articulo)
+      WHERE dia = {_DIA_VENTA_OLD} AND codigo_articulo = OLD.codigo_articulo;
+      DELETE FROM Resumen_Ventas_Diario
+      WHERE dia = {_DIA_VENTA_OLD} AND codigo_articulo = OLD.codigo_articulo AND tickets = 0;
+    END;
+
+    -- Borrar una venta borra sus renglones en cascada, pero para entonces la
+    -- venta ya no existe y los triggers de renglón no encuentran el día:
+    -- se descuenta aquí, antes de borrar.
+    CREATE TRIGGER IF NOT EXISTS trg_venta_bd_resumen
+    BEFORE DELETE ON Ventas
+    BEGIN
+      UPDATE Resumen_Ventas_Diario
+      SET unidades = unidades - d.u,
+          importe = importe - d.imp,
+          tickets = tickets - 1
+      FROM (SELECT codigo_articulo AS cod, SUM(cantidad) AS u,
+                   SUM(cantidad * precio_unitario) AS imp
+            FROM Detalle_Venta WHERE folio_venta = OLD.folio
+            GROUP BY codigo_articulo) AS d
+      WHERE dia = date(OLD.fecha) AND codigo_articulo = d.cod;
+      DELETE FROM Resumen_Ventas_Diario WHERE dia = date(OLD.fecha) AND tickets = 0;
+    END;
+
+    -- Cambio de fecha de una venta: sus renglones pasan de un día a otro
+    CREATE TRIGGER IF NOT EXISTS trg_venta_au_resumen
+    AFTER UPDATE OF fecha ON Ventas
+    WHEN date(OLD.fecha) IS NOT date(NEW.fecha)
+    BEGIN
+      UPDATE Resumen_Ventas_Diario
+      SET unidades = unidades - d.u,
+          importe = importe - d.imp,
+          tickets = tickets - 1
+      FROM (SELECT codigo_articulo AS cod, SUM(cantidad) AS u,
+                   SUM(cantidad * precio_unitario) AS imp
+            FROM Detalle_Venta WHERE folio_venta = NEW.folio
+            GROUP BY codigo_articulo) AS d
+      WHERE dia = date(OLD.fecha) AND codigo_articulo = d.cod;
+      DELETE FROM Resumen_Ventas_Diario WHERE dia = date(OLD.fecha) AND tickets = 0;
+
+      INSERT INTO Resumen_Ventas_Diario(dia, codigo_articulo, unidades, importe, tickets)
+      SELECT date(NEW.fecha), codigo_articulo, SUM(cantidad),
+             SUM(cantidad * precio_unitario), 1
+      FROM Detalle_Venta WHERE folio_venta = NEW.folio
+      GROUP BY codigo_articulo
+      ON CONFLICT(dia, codigo_articulo) DO UPDATE SET
+        unidades = unidades + excluded.unidades,
+        importe = importe + excluded.importe,
+        tickets = tickets + excluded.tickets;
+    END;
+"""
+
+# Mismo resumen calculado desde cero sobre Ventas y Detalle_Venta
+_RESUMEN_DESDE_CERO = """
+    SELECT date(v.fecha) AS dia, d.codigo_articulo,
+           SUM(d.cantidad) AS unidades,
+           SUM(d.cantidad * d.precio_unitario) AS importe,
+           COUNT(DISTINCT d.folio_venta) AS tickets
+    FROM Detalle_Venta d JOIN Ventas v ON v.folio = d.folio_venta
+    GROUP BY date(v.fecha), d.codigo_articulo
+"""
+
+
+# Versión 5: kardex de almacén. Los triggers de compras y ventas ya no tocan
+# Almacen: agregan movimientos (solo inserción) y un único trigger sobre el
+# kardex mantiene Almacen.existencia como nivel actual. La fecha de cada
+# movimiento es la del documento, para poder preguntar por el stock a una
+# fecha pasada; Snapshots_Almacen guarda cortes para no sumar desde el inicio.
+_SCHEMA_V5 = """
+    CREATE TABLE IF NOT EXISTS Movimientos_Almacen (
+      mov_id INTEGER PRIMARY KEY,
+      fecha DATETIME NOT NULL,
+      codigo_articulo VARCHAR(20) NOT NULL,
+      cantidad INT NOT NULL,            -- con signo: + entra, - sale
+      origen TEXT NOT NULL,             -- compra | venta | ajuste
+      referencia INTEGER                -- compra_id o folio
+    );
 
+    -- Corte: existencia al cierre de `fecha` contando movimientos hasta mov_id
+    CREATE TABLE IF NOT EXISTS Snapshots_Almacen (
+      codigo_articulo VARCHAR(20) NOT NULL,
+      fecha DATETIME NOT NULL,
+      existencia INT NOT NULL,
+      mov_id INTEGER NOT NULL,
+      PRIMARY KEY (codigo_articulo, fecha)
+    ) WITHOUT ROWID;
+
+    DROP TRIGGER IF EXISTS trg_detcompra_ai;
+    DROP TRIGGER IF EXISTS trg_detcompra_au;
+    DROP TRIGGER IF EXISTS trg_detcompra_ad;
+    DROP TRIGGER IF EXISTS trg_detventa_ai;
+    DROP TRIGGER IF EXISTS trg_detventa_au;
+    DROP TRIGGER IF EXISTS trg_detventa_ad;
 
+    -- Compras: entradas
+    CREATE TRIGGER trg_detcompra_ai
+    AFTER INSERT ON Detalle_Compra
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Compras WHERE compra_id = NEW.compra_id), datetime('now')),
+              NEW.codigo_articulo, NEW.cantidad, 'compra', NEW.compra_id);
+    END;
+
+    CREATE TRIGGER trg_detcompra_au
+    AFTER UPDATE OF cantidad, codigo_articulo ON Detalle_Compra
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Compras WHERE compra_id = OLD.compra_id), datetime('now')),
+              OLD.codigo_articulo, -OLD.cantidad, 'compra', OLD.compra_id);
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Compras WHERE compra_id = NEW.compra_id), datetime('now')),
+              NEW.codigo_articulo, NEW.cantidad, 'compra', NEW.compra_id);
+    END;
+
+    CREATE TRIGGER trg_detcompra_ad
+    AFTER DELETE ON Detalle_Compra
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Compras WHERE compra_id = OLD.compra_id), datetime('now')),
+              OLD.codigo_articulo, -OLD.cantidad, 'compra', OLD.compra_id);
+    END;
+
+    -- Ventas: salidas
+    CREATE TRIGGER trg_detventa_ai
+    AFTER INSERT ON Detalle_Venta
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Ventas WHERE folio = NEW.folio_venta), datetime('now')),
+              NEW.codigo_articulo, -NEW.cantidad, 'venta', NEW.folio_venta);
+    END;
+
+    CREATE TRIGGER trg_detventa_au
+    AFTER UPDATE OF cantidad, codigo_articulo ON Detalle_Venta
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Ventas WHERE folio = OLD.folio_venta), datetime('now')),
+              OLD.codigo_articulo, OLD.cantidad, 'venta', OLD.folio_venta);
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Ventas WHERE folio = NEW.folio_venta), datetime('now')),
+              NEW.codigo_articulo, -NEW.cantidad, 'venta', NEW.folio_venta);
+    END;
+
+    CREATE TRIGGER trg_detventa_ad
+    AFTER DELETE ON Detalle_Venta
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Ventas WHERE folio = OLD.folio_venta), datetime('now')),
+              OLD.codigo_articulo, OLD.cantidad, 'venta', OLD.folio_venta);
+    END;
+"""
+
+# El trigger del kardex se crea después de cargar la historia en la migración
+_TRIGGER_KARDEX = """
+    CREATE TRIGGER IF NOT EXISTS trg_movalmacen_ai
+    AFTER INSERT ON Movimientos_Almacen
+    BEGIN
+      UPDATE Almacen SET existencia = existencia + NEW.cantidad
+      WHERE codigo_articulo = NEW.codigo_articulo;
+    END;
+"""
+
+
+# Versión 6: triggers diferibles para cargas masivas. Mientras
+# Triggers_Diferidos tenga la fila 'carga', las altas de artículos no tocan
+# Almacen ni el FTS y los renglones de compra no pasan por el kardex uno por
+# uno; carga_masiva() hace ese trabajo al final en bloque. La bandera solo
+# vive dentro de la transacción que la pone, así que ninguna otra conexión
+# la ve.
+_SIN_CARGA = "NOT EXISTS (SELECT 1 FROM Triggers_Diferidos WHERE nombre = 'carga')"
+_SCHEMA_V6 = f"""
+    CREATE TABLE IF NOT EXISTS Triggers_Diferidos (
+      nombre TEXT PRIMARY KEY
+    ) WITHOUT ROWID;
+
+    DROP TRIGGER IF EXISTS trg_articulo_ai;
+    DROP TRIGGER IF EXISTS trg_articulos_fts_ai;
+    DROP TRIGGER IF EXISTS trg_detcompra_ai;
+    DROP TRIGGER IF EXISTS trg_movalmacen_ai;
+
+    CREATE TRIGGER trg_articulo_ai
+    AFTER INSERT ON Articulos
+    WHEN {_SIN_CARGA}
+    BEGIN
+      INSERT OR IGNORE INTO Almacen(codigo_articulo, existencia) VALUES (NEW.codigo, 0);
+    END;
+
+    CREATE TRIGGER trg_articulos_fts_ai
+    AFTER INSERT ON Articulos
+    WHEN {_SIN_CARGA}
+    BEGIN
+      INSERT INTO Articulos_fts(rowid, codigo, descripcion)
+      VALUES (NEW.rowid, NEW.codigo, NEW.descripcion);
+    END;
+
+    CREATE TRIGGER trg_detcompra_ai
+    AFTER INSERT ON Detalle_Compra
+    WHEN {_SIN_CARGA}
+    BEGIN
+      INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+      VALUES (COALESCE((SELECT fecha FROM Compras WHERE compra_id = NEW.compra_id), datetime('now')),
+              NEW.codigo_articulo, NEW.cantidad, 'compra', NEW.compra_id);
+    END;
+
+    CREATE TRIGGER trg_movalmacen_ai
+    AFTER INSERT ON Movimientos_Almacen
+    WHEN {_SIN_CARGA}
+    BEGIN
+      UPDATE Almacen SET existencia = existencia + NEW.cantidad
+      WHERE codigo_articulo = NEW.codigo_articulo;
+    END;
+"""
+
+
+# Versión 7: contador de cambios por tabla para invalidar la caché del
+# catálogo. Solo cuentan las columnas que la caché guarda.
+CONTADOS: dict[str, tuple[str, ...]] = {
+    "Articulos": ("codigo", "descripcion", "precio", "en_promocion"),
+    "Almacen": ("codigo_articulo", "existencia"),
+}
+
+
+def _contadores_schema_sql() -> str:
+    bump = "UPDATE Contadores_Cambios SET version = version + 1 WHERE tabla = '{t}';"
+    parts = ["""
+    CREATE TABLE IF NOT EXISTS Contadores_Cambios (
+      tabla TEXT PRIMARY KEY,
+      version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+"""]
+    for table, cols in CONTADOS.items():
+        low = table.lower()
+        parts.append(f"""
+    INSERT OR IGNORE INTO Contadores_Cambios(tabla) VALUES ('{table}');
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_cnt_ai AFTER INSERT ON {table}
+    BEGIN {bump.format(t=table)} END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_cnt_au AFTER UPDATE OF {", ".join(cols)} ON {table}
+    BEGIN {bump.format(t=table)} END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_cnt_ad AFTER DELETE ON {table}
+    BEGIN {bump.format(t=table)} END;
+""")
+    return "".join(parts)
+
+
+# Versión 8: libro de puntos. Cada alta, cambio o baja de una venta agrega
+# movimientos (solo inserción) y un único trigger sobre el libro mantiene
+# Clientes.puntos, igual que el kardex con Almacen. Los canjes también son
+# movimientos (ver canjear_puntos). Orígenes: venta | canje | inicial (saldo
+# que traía cada cliente al crear el libro) | ajuste (correcciones de
+# recalcular_puntos).
+def _puntos_de(total: str) -> str:
+    # 4 puntos por cada $100 ENTEROS del total
+    return f"((CAST({total} AS INTEGER) / 100) * 4)"
+
+
+_SCHEMA_V8 = f"""
+    CREATE TABLE IF NOT EXISTS Movimientos_Puntos (
+      mov_id INTEGER PRIMARY KEY,
+      fecha DATETIME NOT NULL,
+      cliente_id INTEGER NOT NULL,
+      puntos INT NOT NULL,              -- con signo: + gana, - canjea o se revierte
+      origen TEXT NOT NULL,             -- venta | canje | inicial | ajuste
+      referencia INTEGER                -- folio de la venta
+    );
+
+    DROP TRIGGER IF EXISTS trg_venta_ai_points;
+
+    CREATE TRIGGER trg_venta_ai_points
+    AFTER INSERT ON Ventas
+    WHEN {_puntos_de("NEW.total")} > 0
+    BEGIN
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      VALUES (NEW.fecha, NEW.cliente_id, {_puntos_de("NEW.total")}, 'venta', NEW.folio);
+    END;
+
+    CREATE TRIGGER trg_venta_au_points
+    AFTER UPDATE OF total, cliente_id ON Ventas
+    WHEN OLD.cliente_id IS NOT NEW.cliente_id
+      OR {_puntos_de("OLD.total")} <> {_puntos_de("NEW.total")}
+    BEGIN
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      SELECT datetime('now'), OLD.cliente_id, -{_puntos_de("OLD.total")}, 'venta', OLD.folio
+      WHERE {_puntos_de("OLD.total")} > 0;
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      SELECT datetime('now'), NEW.cliente_id, {_puntos_de("NEW.total")}, 'venta', NEW.folio
+      WHERE {_puntos_de("NEW.total")} > 0;
+    END;
+
+    CREATE TRIGGER trg_venta_ad_points
+    AFTER DELETE ON Ventas
+    WHEN {_puntos_de("OLD.total")} > 0
+    BEGIN
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      VALUES (datetime('now'), OLD.cliente_id, -{_puntos_de("OLD.total")}, 'venta', OLD.folio);
+    END;
+"""
+
+# Los del libro se crean después de cargar la historia en la migración
+_TRIGGERS_PUNTOS = """
+    CREATE TRIGGER IF NOT EXISTS trg_movpuntos_bi
+    BEFORE INSERT ON Movimientos_Puntos
+    WHEN NEW.puntos < 0
+     AND COALESCE((SELECT puntos FROM Clientes WHERE cliente_id = NEW.cliente_id), 0)
+         + NEW.puntos < 0
+    BEGIN
+      SELECT RAISE(ABORT, 'El cliente no tiene puntos suficientes');
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_movpuntos_ai
+    AFTER INSERT ON Movimientos_Puntos
+    BEGIN
+      UPDATE Clientes SET puntos = puntos + NEW.puntos
+      WHERE cliente_id = NEW.cliente_id;
+    END;
+"""
+
+# Versión 11: al editar o borrar una venta se revierte el neto en un solo
+# movimiento (antes iban -viejo y +nuevo por separado y el guardia de saldo
+# abortaba en el negativo intermedio). Si el cliente ya canjeó esos puntos y
+# la reversión lo dejaría en negativo, lo que falta se anota como
+# 'condonado': el saldo queda en 0 y el recálculo desde Ventas lo cuenta,
+# así que no aparece como diferencia. El guardia solo aplica a canjes y
+# ajustes.
+def _mover_puntos(cliente: str, delta: str, folio: str) -> str:
+    return f"""
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      SELECT datetime('now'), cliente_id, -(puntos + {delta}), 'condonado', {folio}
+      FROM Clientes WHERE cliente_id = {cliente} AND puntos + {delta} < 0;
+      INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+      SELECT datetime('now'), {cliente}, {delta}, 'venta', {folio}
+      WHERE {delta} <> 0;"""
+
+
+_SCHEMA_V11 = f"""
+    DROP TRIGGER IF EXISTS trg_movpuntos_bi;
+    DROP TRIGGER IF EXISTS trg_venta_au_points;
+    DROP TRIGGER IF EXISTS trg_venta_au_points_cliente;
+    DROP TRIGGER IF EXISTS trg_venta_ad_points;
+
+    CREATE TRIGGER trg_movpuntos_bi
+    BEFORE INSERT ON Movimientos_Puntos
+    WHEN NEW.origen IN ('canje', 'ajuste')
+     AND NEW.puntos < 0
+     AND COALESCE((SELECT puntos FROM Clientes WHERE cliente_id = NEW.cliente_id), 0)
+         + NEW.puntos < 0
+    BEGIN
+      SELECT RAISE(ABORT, 'El cliente no tiene puntos suficientes');
+    END;
+
+    CREATE TRIGGER trg_venta_au_points
+    AFTER UPDATE OF total ON Ventas
+    WHEN OLD.cliente_id IS NEW.cliente_id
+     AND {_puntos_de("OLD.total")} <> {_puntos_de("NEW.total")}
+    BEGIN
+      {_mover_puntos("NEW.cliente_id", f'({_puntos_de("NEW.total")} - {_puntos_de("OLD.total")})', "NEW.folio")}
+    END;
+
+    CREATE TRIGGER trg_venta_au_points_cliente
+    AFTER UPDATE OF cliente_id ON Ventas
+    WHEN OLD.cliente_id IS NOT NEW.cliente_id
+    BEGIN
+      {_mover_puntos("OLD.cliente_id", f'(-{_puntos_de("OLD.total")})', "OLD.folio")}
+      {_mover_puntos("NEW.cliente_id", _puntos_de("NEW.total"), "NEW.folio")}
+    END;
+
+    CREATE TRIGGER trg_venta_ad_points
+    AFTER DELETE ON Ventas
+    BEGIN
+      {_mover_puntos("OLD.cliente_id", f'(-{_puntos_de("OLD.total")})', "OLD.folio")}
+    END;
+"""
+
+# Saldo de cada cliente recalculado desde Ventas en una sola pasada (agregado
+# sobre ix_ventas_cliente_total, sin tocar la tabla), más canjes, saldos
+# iniciales y condonaciones del libro. Los ajustes no cuentan: son justo las
+# correcciones.
+_PUNTOS_DESDE_CERO = f"""
+    SELECT c.cliente_id, c.puntos AS guardados,
+           COALESCE(v.puntos, 0) + COALESCE(m.puntos, 0) AS calculados
+    FROM Clientes c
+    LEFT JOIN (SELECT cliente_id, SUM({_puntos_de("total")}) AS puntos
+               FROM Ventas GROUP BY cliente_id) v
+      ON v.cliente_id = c.cliente_id
+    LEFT JOIN (SELECT cliente_id, SUM(puntos) AS puntos
+               FROM Movimientos_Puntos WHERE origen IN ('canje', 'inicial', 'condonado')
+               GROUP BY cliente_id) m
+      ON m.cliente_id = c.cliente_id
+"""
+
+
+
+# Versión 9: registro de cambios de las tablas que se eligen desde una FK
+# (listas de referencias del CRUD, ver referencias.py). Cada alta, cambio
+# de clave o etiqueta y baja anota (tabla, rowid) para que las listas se
+# pongan al día sin releer la tabla. Las altas de artículos dentro de
+# carga_masiva se anotan al final como una sola fila con rowid NULL (releer
+# todo). Solo se conservan las últimas MAX_CAMBIOS_REFERENCIAS.
+REFERENCIADAS: dict[str, tuple[str, str]] = {
+    # tabla: (clave, etiqueta)
+    "Clientes": ("cliente_id", "nombre"),
+    "Usuarios": ("usuario_id", "nombre"),
+    "Articulos": ("codigo", "descripcion"),
+}
+MAX_CAMBIOS_REFERENCIAS = 100_000
+
+
+def _referencias_schema_sql() -> str:
+    anota = "INSERT INTO Cambios_Referencias(tabla, fila) VALUES ('{t}', {fila});"
+    parts = [f"""
+    CREATE TABLE IF NOT EXISTS Cambios_Referencias (
+      seq INTEGER PRIMARY KEY,
+      tabla TEXT NOT NULL,
+      fila INTEGER                      -- rowid; NULL = cambió toda la tabla
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_cambiosref_ai AFTER INSERT ON Cambios_Referencias
+    BEGIN
+      DELETE FROM Cambios_Referencias WHERE seq <= NEW.seq - {MAX_CAMBIOS_REFERENCIAS};
+    END;
+"""]
+    for table, (clave, etiqueta) in REFERENCIADAS.items():
+        low = table.lower()
+        cuando = f"WHEN {_SIN_CARGA}" if table == "Articulos" else ""
+        parts.append(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_ref_ai AFTER INSERT ON {table} {cuando}
+    BEGIN {anota.format(t=table, fila="NEW.rowid")} END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_ref_au AFTER UPDATE OF {clave}, {etiqueta} ON {table}
+    BEGIN
+      {anota.format(t=table, fila="OLD.rowid")}
+      {anota.format(t=table, fila="NEW.rowid")}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{low}_ref_ad AFTER DELETE ON {table}
+    BEGIN {anota.format(t=table, fila="OLD.rowid")} END;
+""")
+    return "".join(parts)
+
+
+# ---------- Índices secundarios ----------
+# Índices administrados por el esquema (todos con prefijo ix_). Cubren las FK
+# que revisa SQLite al borrar el padre y las consultas de reportes: los de
+# fecha y artículo incluyen las columnas que suman, así no tocan la tabla.
+# Cualquier cambio aquí se publica con una migración nueva que llame a
+# _sync_indexes.
+INDEXES: dict[str, str] = {
+    "ix_clientes_usuario": "Clientes(usuario_id)",
+    "ix_ventas_cliente_total": "Ventas(cliente_id, total)",
+    "ix_ventas_usuario": "Ventas(usuario_id)",
+    "ix_ventas_fecha": "Ventas(fecha, total)",
+    "ix_detventa_articulo": "Detalle_Venta(codigo_articulo, cantidad, precio_unitario)",
+    "ix_detcompra_articulo": "Detalle_Compra(codigo_articulo, cantidad, costo_unitario)",
+    "ix_compras_fecha": "Compras(fecha)",
+    "ix_movalmacen_articulo_fecha": "Movimientos_Almacen(codigo_articulo, fecha, cantidad)",
+    "ix_movalmacen_articulo_origen": "Movimientos_Almacen(codigo_articulo, origen, cantidad)",
+    "ix_movpuntos_cliente": "Movimientos_Puntos(cliente_id, origen, puntos)",
+}
+
+
+def _sync_indexes(conn: sqlite3.Connection):
+    """
+    Deja en la BD exactamente los índices ix_ de INDEXES. Los de tablas que
+    aún no existen los crea la migración que agrega la tabla.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tablas = {r[0] for r in cur.fetchall()}
+    cur.execute(
+        "SELECT name FROM sqlite_master "
+        r"WHERE type='index' AND name LIKE 'ix\_%' ESCAPE '\'"
+    )
+    for (name,) in cur.fetchall():
+        if name not in INDEXES:
+            cur.execute(f'DROP INDEX "{name}"')
+    for name, definition in INDEXES.items():
+        if definition.split("(", 1)[0] in tablas:
+            cur.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON {definition}')
+
+
+# Consultas calientes y parámetros de ejemplo para revisar su plan.
+# Búsqueda del login: por correo solo (UNIQUE, usa su autoíndice); la
+# contraseña se verifica después en Python
+LOGIN_SQL = "SELECT usuario_id, password_hash FROM Usuarios WHERE correo = ?"
+
+HOT_QUERIES: dict[str, tuple[str, tuple]] = {
+    "login_por_correo": (LOGIN_SQL, ("admin@farmacia.cucei.udg.mx",)),
+    "fk_clientes_usuario": ("SELECT 1 FROM Clientes WHERE usuario_id = ?", (1,)),
+    "fk_ventas_cliente": ("SELECT 1 FROM Ventas WHERE cliente_id = ?", (1,)),
+    "fk_ventas_usuario": ("SELECT 1 FROM Ventas WHERE usuario_id = ?", (1,)),
+    "fk_detventa_articulo": (
+        "SELECT 1 FROM Detalle_Venta WHERE codigo_articulo = ?",
+        ("PARA500",),
+    ),
+    "fk_detcompra_articulo": (
+        "SELECT 1 FROM Detalle_Compra WHERE codigo_articulo = ?",
+        ("PARA500",),
+    ),
+    "ventas_por_dia": (
+        "SELECT date(fecha), COUNT(*), SUM(total) FROM Ventas "
+        "WHERE fecha >= ? AND fecha < ? GROUP BY date(fecha)",
+        ("2025-01-01", "2025-02-01"),
+    ),
+    "ventas_por_articulo": (
+        "SELECT SUM(cantidad), SUM(cantidad * precio_unitario) FROM Detalle_Venta "
+        "WHERE codigo_articulo = ?",
+        ("PARA500",),
+    ),
+    "compras_por_articulo": (
+        "SELECT SUM(cantidad), SUM(cantidad * costo_unitario) FROM Detalle_Compra "
+        "WHERE codigo_articulo = ?",
+        ("PARA500",),
+    ),
+    "compras_por_fecha": (
+        "SELECT compra_id FROM Compras WHERE fecha >= ? AND fecha < ?",
+        ("2025-01-01", "2025-02-01"),
+    ),
+}
+
+
+def explain_plan(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> list[str]:
+    """Renglones de EXPLAIN QUERY PLAN (columna detail) para `sql`."""
+    return [r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> dict[str, tuple[bool, list[str]]]:
+    """
+    Revisa HOT_QUERIES: nombre -> (usa_indice, plan). Una consulta no usa
+    índice si algún paso recorre la tabla completa (SCAN sin USING ... INDEX).
+    """
+    result = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = explain_plan(conn, sql, params)
+        full_scan = any(
+            d.startswith("SCAN") and "INDEX" not in d and "PRIMARY KEY" not in d
+            for d in plan
+        )
+        result[name] = (not full_scan, plan)
+    return result
+
+
+# ---------- Migraciones ----------
+def _run_script(conn: sqlite3.Connection, script: str):
+    """
+    Ejecuta un script sentencia por sentencia. A diferencia de executescript,
+    no hace COMMIT implícito, así que respeta la transacción de migrate().
+    """
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            conn.execute(stmt)
+            stmt = ""
+    if stmt.strip():
+        conn.execute(stmt)
+
+
+def _migrate_v1(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V1)
+
+
+def _migrate_v2(conn: sqlite3.Connection):
+    _run_script(conn, _fts_schema_sql())
+    # Se llenan con lo que ya hubiera en las tablas origen
+    for table in FTS_TABLES:
+        fts = f"{table}_fts"
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _migrate_v3(conn: sqlite3.Connection):
+    _sync_indexes(conn)
+
+
+def _migrate_v4(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V4)
+    conn.execute("DELETE FROM Resumen_Ventas_Diario")
+    conn.execute(
+        "INSERT INTO Resumen_Ventas_Diario(dia, codigo_articulo, unidades, importe, tickets) "
+        + _RESUMEN_DESDE_CERO
+    )
+
+
+def _migrate_v5(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V5)
+    # Historia: cada renglón de compra y venta existente con la fecha de su
+    # documento, y un ajuste para lo que Almacen tenga por ediciones a mano
+    conn.execute(
+        """
+        INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+        SELECT c.fecha, d.codigo_articulo, d.cantidad, 'compra', d.compra_id
+        FROM Detalle_Compra d JOIN Compras c ON c.compra_id = d.compra_id
+        UNION ALL
+        SELECT v.fecha, d.codigo_articulo, -d.cantidad, 'venta', d.folio_venta
+        FROM Detalle_Venta d JOIN Ventas v ON v.folio = d.folio_venta
+        ORDER BY 1
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen)
+        SELECT datetime('now'), a.codigo_articulo,
+               a.existencia - COALESCE(m.total, 0), 'ajuste'
+        FROM Almacen a
+        LEFT JOIN (SELECT codigo_articulo, SUM(cantidad) AS total
+                   FROM Movimientos_Almacen GROUP BY codigo_articulo) m
+          ON m.codigo_articulo = a.codigo_articulo
+        WHERE a.existencia <> COALESCE(m.total, 0)
+        """
+    )
+    _run_script(conn, _TRIGGER_KARDEX)
+    _sync_indexes(conn)
+
+
+def _migrate_v6(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V6)
+
+
+def _migrate_v7(conn: sqlite3.Connection):
+    _run_script(conn, _contadores_schema_sql())
+
+
+def _migrate_v8(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V8)
+    # Historia: los puntos de cada venta existente y, por cliente, lo que
+    # falte para llegar a su saldo actual (canjes y ediciones previas)
+    conn.execute(
+        f"""
+        INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+        SELECT fecha, cliente_id, {_puntos_de("total")}, 'venta', folio
+        FROM Ventas WHERE {_puntos_de("total")} > 0
+        ORDER BY fecha
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen)
+        SELECT datetime('now'), c.cliente_id, c.puntos - COALESCE(m.total, 0), 'inicial'
+        FROM Clientes c
+        LEFT JOIN (SELECT cliente_id, SUM(puntos) AS total
+                   FROM Movimientos_Puntos GROUP BY cliente_id) m
+          ON m.cliente_id = c.cliente_id
+        WHERE c.puntos <> COALESCE(m.total, 0)
+        """
+    )
+    _run_script(conn, _TRIGGERS_PUNTOS)
+    _sync_indexes(conn)
+
+
+def _migrate_v9(conn: sqlite3.Connection):
+    _run_script(conn, _referencias_schema_sql())
+
+
+def _migrate_v10(conn: sqlite3.Connection):
+    _sync_indexes(conn)
+
+
+def _migrate_v11(conn: sqlite3.Connection):
+    _run_script(conn, _SCHEMA_V11)
+
+
+# (versión, descripción, función). Solo se agregan al final, nunca se editan
+# las ya publicadas.
+MIGRATIONS: list[tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "Tablas y triggers de stock y puntos", _migrate_v1),
+    (2, "Búsqueda de texto completo (FTS5)", _migrate_v2),
+    (3, "Índices secundarios", _migrate_v3),
+    (4, "Resumen diario de ventas por artículo", _migrate_v4),
+    (5, "Kardex de almacén con cortes", _migrate_v5),
+    (6, "Triggers diferibles para cargas masivas", _migrate_v6),
+    (7, "Contadores de cambios para la caché del catálogo", _migrate_v7),
+    (8, "Libro de puntos de clientes", _migrate_v8),
+    (9, "Registro de cambios para las listas de referencias", _migrate_v9),
+    (10, "Índice del kardex por origen para revisar existencias", _migrate_v10),
+    (11, "Puntos: reversión neta al editar o borrar ventas", _migrate_v11),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> list[int]:
+    """
+    Aplica las migraciones pendientes según PRAGMA user_version, todas en una
+    sola transacción: o quedan todas o ninguna. Con la BD al día solo cuesta
+    leer ese PRAGMA. Devuelve las versiones aplicadas.
+    """
+    current = schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return []
+
+    pending = [(v, fn) for v, _desc, fn in MIGRATIONS if v > current]
+    conn.commit()
+    isolation = conn.isolation_level
+    conn.isolation_level = None  # BEGIN/COMMIT explícitos
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for _version, fn in pending:
+                fn(conn)
+            conn.execute(f"PRAGMA user_version = {pending[-1][0]}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = isolation
+    return [v for v, _fn in pending]
+
+
+# ---------- Caché del catálogo ----------
+class CatalogoCache:
+    """
+    Copia en memoria de Articulos (descripción, precio, promoción) y de
+    Almacen.existencia, indexada por código. Los valores viven en arreglos
+    compactos y un dict da la posición de cada código.
+
+    Antes de cada consulta revisa PRAGMA data_version en su propia conexión
+    (cambia cuando otra conexión confirma algo); solo entonces lee
+    Contadores_Cambios para saber si tocaron Articulos o Almacen y recarga
+    lo necesario; las existencias, que cambian con cada venta, se releen
+    hasta que alguien las pide. Así nunca responde con datos viejos y, sin
+    cambios, no cuesta más que ese PRAGMA. Seguro entre hilos.
+    """
+
+    __slots__ = (
+        "_lock",
+        "_conn",
+        "_db_file",
+        "_data_version",
+        "_versiones",
+        "_indice",
+        "_descripciones",
+        "_precios",
+        "_promocion",
+        "_existencias",
+        "_existencias_viejas",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._db_file = None
+        self._data_version = None
+        self._versiones: dict[str, int] = {}
+        self._indice: dict[str, int] = {}
+        self._descripciones: list[str] = []
+        self._precios = array("d")
+        self._promocion = array("b")
+        self._existencias = array("q")
+        self._existencias_viejas = False
+
+    def _vigente(self):
+        # Llamar con _lock tomado
+        if self._conn is None or self._db_file != DB_FILE:
+            self.close()
+            # Sin medir: cada consulta del catálogo hace un PRAGMA data_version
+            # que llenaría el búfer de diagnóstico
+            self._conn = open_conn(origen=None)
+            self._conn.isolation_level = None  # solo lee; BEGIN explícito
+            self._db_file = DB_FILE
+        conn = self._conn
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        conn.execute("BEGIN")  # contadores y datos de la misma instantánea
+        try:
+            versiones = dict(conn.execute("SELECT tabla, version FROM Contadores_Cambios"))
+            if versiones.get("Articulos") != self._versiones.get("Articulos"):
+                self._cargar_catalogo(conn)
+            elif versiones.get("Almacen") != self._versiones.get("Almacen"):
+                # Cambia con cada venta: se relee hasta que alguien la pida
+                self._existencias_viejas = True
+        finally:
+            conn.execute("COMMIT")
+        self._versiones = versiones
+        self._data_version = version
+
+    def _cargar_catalogo(self, conn: sqlite3.Connection):
+        indice, descripciones = {}, []
+        precios, promocion, existencias = array("d"), array("b"), array("q")
+        for codigo, descripcion, precio, promo, existencia in conn.execute(
+            """
+            SELECT a.codigo, a.descripcion, a.precio, a.en_promocion,
+                   COALESCE(s.existencia, 0)
+            FROM Articulos a LEFT JOIN Almacen s ON s.codigo_articulo = a.codigo
+            """
+        ):
+            indice[codigo] = len(descripciones)
+            descripciones.append(descripcion)
+            precios.append(precio)
+            promocion.append(1 if promo else 0)
+            existencias.append(existencia)
+        self._indice, self._descripciones = indice, descripciones
+        self._precios, self._promocion, self._existencias = precios, promocion, existencias
+        self._existencias_viejas = False
+
+    def _existencias_al_dia(self):
+        # Llamar con _lock tomado y después de _vigente()
+        if self._existencias_viejas:
+            self._cargar_existencias(self._conn)
+
+    def _cargar_existencias(self, conn: sqlite3.Connection):
+        existencias = array("q", bytes(8 * len(self._descripciones)))
+        indice = self._indice
+        for codigo, existencia in conn.execute(
+            "SELECT codigo_articulo, existencia FROM Almacen"
+        ):
+            i = indice.get(codigo)
+            if i is not None:
+                existencias[i] = existencia
+        self._existencias = existencias
+        self._existencias_viejas = False
+
+    def articulo(self, codigo: str) -> tuple[str, float, bool, int] | None:
+        """(descripcion, precio, en_promocion, existencia) o None si no existe."""
+        with self._lock:
+            self._vigente()
+            self._existencias_al_dia()
+            i = self._indice.get(codigo)
+            if i is None:
+                return None
+            return (
+                self._descripciones[i],
+                self._precios[i],
+                bool(self._promocion[i]),
+                self._existencias[i],
+            )
+
+    def precio(self, codigo: str) -> float | None:
+        with self._lock:
+            self._vigente()
+            i = self._indice.get(codigo)
+            return None if i is None else self._precios[i]
+
+    def existencia(self, codigo: str) -> int | None:
+        with self._lock:
+            self._vigente()
+            self._existencias_al_dia()
+            i = self._indice.get(codigo)
+            return None if i is None else self._existencias[i]
+
+    def precios(self, codigos) -> dict[str, float]:
+        """Precio de cada código que exista; los que no, no aparecen."""
+        with self._lock:
+            self._vigente()
+            indice, precios = self._indice, self._precios
+            return {c: precios[indice[c]] for c in codigos if c in indice}
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._data_version = None
+        self._versiones = {}
+
+
+catalogo = CatalogoCache()
+
+
+# ---------- Metadatos del esquema ----------
+# Límites que el esquema no declara con CHECK pero la app sí exige
+_LIMITES_APP = {("Articulos", "precio"): (0, None)}
+
+_TIPO_PARAMS = re.compile(r"\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\)")
+_CHECK_SIMPLE = re.compile(
+    r"CHECK\s*\(\s*\"?(\w+)\"?\s*(>=|>|<=|<)\s*(-?\d+(?:\.\d+)?)\s*\)", re.IGNORECASE
+)
+
+
+class Columna:
+    """
+    Lo que el esquema dice de una columna: tipo declarado y su clase para
+    editar (fecha, fechahora, booleano, entero, decimal o texto), NOT NULL,
+    largo de VARCHAR(n), decimales de DECIMAL(p,s), límites de los CHECK
+    simples (`col >= n`, `col > n`...) y la llave foránea (tabla, columna).
+    """
+
+    __slots__ = (
+        "nombre", "posicion", "tipo", "clase", "not_null", "defecto", "pk",
+        "largo", "decimales", "minimo", "maximo", "min_excluido", "max_excluido",
+        "referencia", "autoincremental",
+    )
+
+    def __init__(self, posicion: int, nombre: str, tipo: str, not_null: bool, defecto, pk: int):
+        self.posicion = posicion
+        self.nombre = nombre
+        self.tipo = tipo.upper()
+        self.not_null = not_null
+        self.defecto = defecto
+        self.pk = pk
+        self.clase = _clase_de(self.tipo)
+        self.largo = self.decimales = None
+        m = _TIPO_PARAMS.search(self.tipo)
+        if m and self.clase == "texto":
+            self.largo = int(m.group(1))
+        elif m and self.clase == "decimal" and m.group(2):
+            self.decimales = int(m.group(2))
+        self.minimo = self.maximo = None
+        self.min_excluido = self.max_excluido = False
+        self.referencia: tuple[str, str] | None = None
+        # INTEGER PRIMARY KEY (alias de rowid): vacío = SQLite lo genera
+        self.autoincremental = False
+
+    def _acotar(self, op: str, valor: float):
+        if self.clase == "entero":
+            # En enteros "> n" es ">= n + 1": un solo caso al validar
+            valor = int(valor) + (op == ">") - (op == "<")
+            op = op[0] + "=" if len(op) == 1 else op
+        if op[0] == ">":
+            self.minimo, self.min_excluido = valor, op == ">"
+        else:
+            self.maximo, self.max_excluido = valor, op == "<"
+
+    def convertir(self, texto: str):
+        """
+        Valor listo para el modelo a partir de lo que se escribió (None si
+        queda vacío y se permite). Lanza ValueError con el motivo si no vale.
+        """
+        texto = texto.strip()
+        if texto == "":
+            if (self.not_null or self.pk) and not self.autoincremental:
+                raise ValueError(f"{self.nombre} no puede estar vacío.")
+            return None
+        if self.clase == "entero":
+            try:
+                valor = int(texto)
+            except ValueError:
+                raise ValueError(f"{self.nombre} debe ser un número entero.") from None
+        elif self.clase == "decimal":
+            try:
+                valor = float(texto)
+            except ValueError:
+                raise ValueError(f"{self.nombre} debe ser un número.") from None
+            if self.decimales is not None and round(valor, self.decimales) != valor:
+                raise ValueError(f"{self.nombre} admite {self.decimales} decimales.")
+        else:
+            if self.largo is not None and len(texto) > self.largo:
+                raise ValueError(f"{self.nombre} admite {self.largo} caracteres.")
+            return texto
+        if self.minimo is not None and (
+            valor < self.minimo or (self.min_excluido and valor == self.minimo)
+        ):
+            signo = ">" if self.min_excluido else "≥"
+            raise ValueError(f"{self.nombre} debe ser {signo} {self.minimo:g}.")
+        if self.maximo is not None and (
+            valor > self.maximo or (self.max_excluido and valor == self.maximo)
+        ):
+            signo = "<" if self.max_excluido else "≤"
+            raise ValueError(f"{self.nombre} debe ser {signo} {self.maximo:g}.")
+        return valor
+
+
+def _clase_de(tipo: str) -> str:
+    # Reglas de afinidad de SQLite, con fechas y booleanos aparte
+    if "DATE" in tipo or "TIME" in tipo:
+        return "fecha" if tipo == "DATE" else "fechahora"
+    if "BOOL" in tipo:
+        return "booleano"
+    if "INT" in tipo:
+        return "entero"
+    if any(t in tipo for t in ("CHAR", "CLOB", "TEXT")) or not tipo:
+        return "texto"
+    return "decimal"  # REAL, DOUBLE, DECIMAL, NUMERIC
+
+
+class Tabla:
+    """Columnas de una tabla por nombre (dict) y en orden."""
+
+    __slots__ = ("nombre", "columnas", "nombres", "pk")
+
+    def __init__(self, nombre: str, columnas: list[Columna]):
+        self.nombre = nombre
+        self.nombres = tuple(c.nombre for c in columnas)
+        self.columnas = {c.nombre: c for c in columnas}
+        self.pk = tuple(c.nombre for c in sorted(columnas, key=lambda c: c.pk) if c.pk)
+        if len(self.pk) == 1 and self.columnas[self.pk[0]].tipo == "INTEGER":
+            self.columnas[self.pk[0]].autoincremental = True
+
+    def columna(self, nombre: str) -> Columna | None:
+        return self.columnas.get(nombre)
+
+
+def leer_esquema(conn: sqlite3.Connection) -> dict[str, Tabla]:
+    """Tablas de la base con PRAGMA table_info, foreign_key_list y sus CHECK."""
+    tablas = {}
+    filas = conn.execute(
+        """
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        """
+    ).fetchall()
+    for nombre, sql in filas:
+        columnas = [
+            Columna(cid, col, tipo or "", bool(notnull), defecto, pk)
+            for cid, col, tipo, notnull, defecto, pk in conn.execute(
+                f'PRAGMA table_info("{nombre}")'
+            )
+        ]
+        tablas[nombre] = Tabla(nombre, columnas)
+        for col, op, valor in _CHECK_SIMPLE.findall(sql or ""):
+            c = tablas[nombre].columna(col)
+            if c is not None:
+                c._acotar(op, float(valor))
+    for (nombre, col), (minimo, maximo) in _LIMITES_APP.items():
+        c = tablas[nombre].columna(col) if nombre in tablas else None
+        if c is not None:
+            if minimo is not None:
+                c._acotar(">=", minimo)
+            if maximo is not None:
+                c._acotar("<=", maximo)
+    for nombre, tabla in tablas.items():
+        for fk in conn.execute(f'PRAGMA foreign_key_list("{nombre}")'):
+            destino, desde, hacia = fk[2], fk[3], fk[4]
+            c = tabla.columna(desde)
+            if c is None:
+                continue
+            if hacia is None:
+                # REFERENCES T sin columna: la llave primaria de T
+                pk = tablas[destino].pk if destino in tablas else ()
+                hacia = pk[0] if len(pk) == 1 else None
+            c.referencia = (destino, hacia)
+    return tablas
+
+
+class EsquemaCache:
+    """
+    Metadatos de todas las tablas, leídos una vez por base. Se releen solo
+    si cambia PRAGMA schema_version (una migración); pedir una tabla cuesta
+    ese PRAGMA, y lo que se consulte después sobre ella son lecturas de dict.
+    Seguro entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._db_file = None
+        self._version = None
+        self._tablas: dict[str, Tabla] = {}
+
+    def tabla(self, nombre: str) -> Tabla | None:
+        with self._lock:
+            with sqlite_conn() as conn:
+                version = conn.execute("PRAGMA schema_version").fetchone()[0]
+                if self._db_file != DB_FILE or version != self._version:
+                    self._tablas = leer_esquema(conn)
+                    self._db_file, self._version = DB_FILE, version
+            return self._tablas.get(nombre)
+
+
+esquema = EsquemaCache()
+
+
+# ---------- Punto de venta ----------
+def _insertar_venta(
+    conn: sqlite3.Connection,
+    cliente_id: int,
+    usuario_id: int,
+    lineas: list[tuple[str, int]],
+) -> int:
+    """
+    Inserta encabezado y renglones de una venta dentro de la transacción que
+    ya tenga abierta `conn` (BEGIN IMMEDIATE, sin cambios previos a
+    Articulos). Los precios salen de la caché del catálogo; stock y puntos
+    los ajustan los triggers. Devuelve el folio.
+    """
+    if not lineas:
+        raise ValueError("La venta no tiene artículos.")
+    for codigo, cantidad in lineas:
+        if cantidad <= 0:
+            raise ValueError(f"Cantidad inválida para {codigo}: {cantidad}.")
+
+    # La caché vale aquí: con la transacción de escritura abierta nadie más
+    # puede cambiar precios hasta que termine
+    codigos = list({codigo for codigo, _ in lineas})
+    precios = catalogo.precios(codigos)
+    faltan = [c for c in codigos if c not in precios]
+    if faltan:
+        raise ValueError(f"Artículos inexistentes: {', '.join(sorted(faltan))}.")
+
+    total = round(sum(precios[c] * q for c, q in lineas), 2)
+    cur = conn.execute(
+        """
+        INSERT INTO Ventas(fecha, cliente_id, usuario_id, total)
+        VALUES (datetime('now'), ?, ?, ?)
+        """,
+        (cliente_id, usuario_id, total),
+    )
+    folio = cur.lastrowid
+    conn.executemany(
+        """
+        INSERT INTO Detalle_Venta(
+          folio_venta, detalle_venta_id, codigo_articulo, cantidad, precio_unitario
+        ) VALUES (?,?,?,?,?)
+        """,
+        [(folio, i, c, q, precios[c]) for i, (c, q) in enumerate(lineas, start=1)],
+    )
+    return folio
+
+
+def registrar_venta(
+    cliente_id: int, usuario_id: int, lineas: list[tuple[str, int]]
+) -> int:
+    """
+    Registra una venta completa en una transacción BEGIN IMMEDIATE: o queda
+    el ticket entero (encabezado, renglones, stock y puntos) o nada.
+    `lineas` son pares (codigo_articulo, cantidad). Devuelve el folio.
+    Lanza ValueError si la venta no es válida y sqlite3.IntegrityError si
+    cliente o usuario no existen.
+    """
+    lineas = [(str(c), int(q)) for c, q in lineas]
+    with sqlite_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _insertar_venta(conn, cliente_id, usuario_id, lineas)
+
+
+def _insertar_compra(
+    conn: sqlite3.Connection,
+    lineas: list[tuple[str, int, float]],
+    fecha: str | None = None,
+) -> int:
+    """
+    Inserta una compra (encabezado y renglones) de artículos ya existentes
+    dentro de la transacción que tenga abierta `conn`. `lineas` son
+    (codigo_articulo, cantidad, costo_unitario); kardex y Almacen los
+    ajustan los triggers. Devuelve compra_id.
+    """
+    if not lineas:
+        raise ValueError("La compra no tiene artículos.")
+    for codigo, cantidad, costo in lineas:
+        if cantidad <= 0:
+            raise ValueError(f"Cantidad inválida para {codigo}: {cantidad}.")
+        if costo < 0:
+            raise ValueError(f"Costo inválido para {codigo}: {costo}.")
+    codigos = list({codigo for codigo, _, _ in lineas})
+    existentes = catalogo.precios(codigos)
+    faltan = [c for c in codigos if c not in existentes]
+    if faltan:
+        raise ValueError(f"Artículos inexistentes: {', '.join(sorted(faltan))}.")
+
+    cur = conn.execute(
+        "INSERT INTO Compras(fecha) VALUES (COALESCE(?, datetime('now')))", (fecha,)
+    )
+    compra_id = cur.lastrowid
+    conn.executemany(
+        """
+        INSERT INTO Detalle_Compra(
+          compra_id, detalle_compra_id, codigo_articulo, cantidad, costo_unitario
+        ) VALUES (?,?,?,?,?)
+        """,
+        [(compra_id, i, c, q, k) for i, (c, q, k) in enumerate(lineas, start=1)],
+    )
+    return compra_id
+
+
+def registrar_compra(
+    lineas: list[tuple[str, int, float]], fecha: str | None = None
+) -> int:
+    """Registra una compra completa en su propia transacción (ver _insertar_compra)."""
+    lineas = [(str(c), int(q), round(float(k), 2)) for c, q, k in lineas]
+    with sqlite_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return _insertar_compra(conn, lineas, fecha)
+
+
+# ---------- Resumen diario de ventas ----------
+def verificar_resumen_diario(conn: sqlite3.Connection) -> list[tuple]:
+    """
+    Compara Resumen_Ventas_Diario con un recálculo desde cero. Devuelve las
+    diferencias como (dia, codigo_articulo, guardado, calculado), donde cada
+    lado es (unidades, importe, tickets) o None si la fila no existe.
+    """
+    rows = conn.execute(
+        f"""
+        WITH calc AS ({_RESUMEN_DESDE_CERO})
+        SELECT r.dia, r.codigo_articulo, r.unidades, r.importe, r.tickets,
+               c.unidades, c.importe, c.tickets
+        FROM Resumen_Ventas_Diario r
+        LEFT JOIN calc c ON c.dia = r.dia AND c.codigo_articulo = r.codigo_articulo
+        WHERE c.dia IS NULL OR r.unidades <> c.unidades OR r.tickets <> c.tickets
+           OR ROUND(r.importe, 2) <> ROUND(c.importe, 2)
+        UNION ALL
+        SELECT c.dia, c.codigo_articulo, NULL, NULL, NULL,
+               c.unidades, c.importe, c.tickets
+        FROM calc c
+        LEFT JOIN Resumen_Ventas_Diario r
+          ON r.dia = c.dia AND r.codigo_articulo = c.codigo_articulo
+        WHERE r.dia IS NULL
+        ORDER BY 1, 2
+        """
+    ).fetchall()
+    return [
+        (
+            dia,
+            codigo,
+            None if r_u is None else (r_u, r_i, r_t),
+            None if c_u is None else (c_u, c_i, c_t),
+        )
+        for dia, codigo, r_u, r_i, r_t, c_u, c_i, c_t in rows
+    ]
+
+
+def rebuild_resumen_diario(conn: sqlite3.Connection) -> list[tuple]:
+    """
+    Recalcula Resumen_Ventas_Diario desde cero en una transacción. Devuelve
+    las diferencias que había antes (ver verificar_resumen_diario).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    diferencias = verificar_resumen_diario(conn)
+    conn.execute("DELETE FROM Resumen_Ventas_Diario")
+    conn.execute(
+        "INSERT INTO Resumen_Ventas_Diario(dia, codigo_articulo, unidades, importe, tickets) "
+        + _RESUMEN_DESDE_CERO
+    )
+    conn.commit()
+    return diferencias
+
+
+def ventas_diarias(conn: sqlite3.Connection, desde: str, hasta: str) -> list[tuple]:
+    """(dia, unidades, importe) por día en [desde, hasta], leyendo solo el resumen."""
+    return conn.execute(
+        """
+        SELECT dia, SUM(unidades), ROUND(SUM(importe), 2)
+        FROM Resumen_Ventas_Diario
+        WHERE dia BETWEEN ? AND ?
+        GROUP BY dia ORDER BY dia
+        """,
+        (desde, hasta),
+    ).fetchall()
+
+
+def top_articulos(
+    conn: sqlite3.Connection, desde: str, hasta: str, n: int = 10
+) -> list[tuple]:
+    """(codigo_articulo, unidades, importe, tickets) más vendidos en [desde, hasta], del resumen."""
+    return conn.execute(
+        """
+        SELECT codigo_articulo, SUM(unidades), ROUND(SUM(importe), 2), SUM(tickets)
+        FROM Resumen_Ventas_Diario
+        WHERE dia BETWEEN ? AND ?
+        GROUP BY codigo_articulo ORDER BY 2 DESC, 1
+        LIMIT ?
+        """,
+        (desde, hasta, n),
+    ).fetchall()
+
+
+# ---------- Kardex de almacén ----------
+def _fin_del_dia(fecha: str) -> str:
+    # "2025-01-31" significa al cierre de ese día
+    return f"{fecha} 23:59:59" if len(fecha) == 10 else fecha
+
+
+# Existencia de a.codigo_articulo al cierre de :fecha contando movimientos
+# hasta :hasta_mov = último corte anterior + movimientos posteriores al corte
+# (por fecha) + los capturados después del corte con fecha anterior.
+_EXISTENCIA_AL_SQL = """(
+    WITH s AS (
+      SELECT fecha, existencia, mov_id FROM Snapshots_Almacen
+      WHERE codigo_articulo = a.codigo_articulo AND fecha <= :fecha
+      ORDER BY fecha DESC LIMIT 1
+    )
+    SELECT COALESCE((SELECT existencia FROM s), 0)
+      + COALESCE((SELECT SUM(m.cantidad) FROM Movimientos_Almacen m
+                  WHERE m.codigo_articulo = a.codigo_articulo
+                    AND m.fecha > COALESCE((SELECT fecha FROM s), '')
+                    AND m.fecha <= :fecha AND m.mov_id <= :hasta_mov), 0)
+      + COALESCE((SELECT SUM(m.cantidad) FROM Movimientos_Almacen m
+                  WHERE m.codigo_articulo = a.codigo_articulo
+                    AND m.mov_id > (SELECT mov_id FROM s)
+                    AND m.fecha <= (SELECT fecha FROM s)
+                    AND m.mov_id <= :hasta_mov), 0)
+)"""
+
+
+def tomar_snapshot_almacen(conn: sqlite3.Connection, fecha: str | None = None) -> int:
+    """
+    Guarda un corte de existencias al cierre de `fecha` (ahora si es None)
+    para cada artículo con movimientos. Parte del corte anterior y solo suma
+    lo que se movió desde entonces. Devuelve cuántos artículos se cortaron.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    fecha = _fin_del_dia(fecha) if fecha else conn.execute(
+        "SELECT datetime('now')"
+    ).fetchone()[0]
+    hasta_mov = conn.execute("SELECT MAX(mov_id) FROM Movimientos_Almacen").fetchone()[0]
+    if hasta_mov is None:
+        conn.commit()
+        return 0
+    cur = conn.execute(
+        f"""
+        INSERT OR REPLACE INTO Snapshots_Almacen(codigo_articulo, fecha, existencia, mov_id)
+        SELECT a.codigo_articulo, :fecha, {_EXISTENCIA_AL_SQL}, :hasta_mov
+        FROM (SELECT DISTINCT codigo_articulo FROM Movimientos_Almacen) a
+        """,
+        {"fecha": fecha, "hasta_mov": hasta_mov},
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def existencia_al(conn: sqlite3.Connection, codigo_articulo: str, fecha: str) -> int:
+    """Existencia de un artículo al cierre de `fecha` según el kardex."""
+    return conn.execute(
+        f"SELECT {_EXISTENCIA_AL_SQL} FROM (SELECT :codigo AS codigo_articulo) a",
+        {"codigo": codigo_articulo, "fecha": _fin_del_dia(fecha), "hasta_mov": 2**63 - 1},
+    ).fetchone()[0]
+
+
+@contextmanager
+def carga_masiva(conn: sqlite3.Connection):
+    """
+    Dentro del bloque, las altas de artículos y los renglones de compra no
+    disparan trabajo renglón por renglón (fila en Almacen, FTS, kardex). Al
+    salir se hace todo en bloque: un INSERT ... SELECT por tabla y un solo
+    UPDATE agregado de Almacen. Debe usarse dentro de una transacción ya
+    abierta en `conn`.
+    """
+    def ultimo(sql):
+        return conn.execute(sql).fetchone()[0]
+
+    desde_articulo = ultimo("SELECT COALESCE(MAX(rowid), 0) FROM Articulos")
+    desde_renglon = ultimo("SELECT COALESCE(MAX(rowid), 0) FROM Detalle_Compra")
+    desde_mov = ultimo("SELECT COALESCE(MAX(mov_id), 0) FROM Movimientos_Almacen")
+    conn.execute("INSERT INTO Triggers_Diferidos(nombre) VALUES ('carga')")
+    try:
+        yield
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO Almacen(codigo_articulo, existencia)
+            SELECT codigo, 0 FROM Articulos WHERE rowid > ?
+            """,
+            (desde_articulo,),
+        )
+        conn.execute(
+            """
+            INSERT INTO Articulos_fts(rowid, codigo, descripcion)
+            SELECT rowid, codigo, descripcion FROM Articulos WHERE rowid > ?
+            """,
+            (desde_articulo,),
+        )
+        conn.execute(
+            """
+            INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen, referencia)
+            SELECT c.fecha, d.codigo_articulo, d.cantidad, 'compra', d.compra_id
+            FROM Detalle_Compra d JOIN Compras c ON c.compra_id = d.compra_id
+            WHERE d.rowid > ?
+            ORDER BY d.rowid
+            """,
+            (desde_renglon,),
+        )
+        # Incluye cualquier otro movimiento que haya entrado durante el bloque
+        conn.execute(
+            """
+            UPDATE Almacen SET existencia = existencia + m.total
+            FROM (SELECT codigo_articulo, SUM(cantidad) AS total
+                  FROM Movimientos_Almacen WHERE mov_id > ?
+                  GROUP BY codigo_articulo) m
+            WHERE Almacen.codigo_articulo = m.codigo_articulo
+            """,
+            (desde_mov,),
+        )
+        if ultimo("SELECT COALESCE(MAX(rowid), 0) FROM Articulos") > desde_articulo:
+            conn.execute(
+                "INSERT INTO Cambios_Referencias(tabla, fila) VALUES ('Articulos', NULL)"
+            )
+    finally:
+        conn.execute("DELETE FROM Triggers_Diferidos WHERE nombre = 'carga'")
+
+
+def verificar_almacen(conn: sqlite3.Connection) -> list[tuple[str, int, int]]:
+    """
+    Artículos cuyo Almacen.existencia no coincide con la suma del kardex:
+    (codigo_articulo, existencia_en_almacen, existencia_segun_kardex).
+    """
+    return conn.execute(
+        """
+        SELECT a.codigo_articulo, a.existencia, COALESCE(m.total, 0)
+        FROM Almacen a
+        LEFT JOIN (SELECT codigo_articulo, SUM(cantidad) AS total
+                   FROM Movimientos_Almacen GROUP BY codigo_articulo) m
+          ON m.codigo_articulo = a.codigo_articulo
+        WHERE a.existencia <> COALESCE(m.total, 0)
+        ORDER BY a.codigo_articulo
+        """
+    ).fetchall()
+
+
+# Existencia recalculada desde los documentos: compras menos ventas más los
+# ajustes del kardex (saldo previo al kardex y correcciones hechas a mano).
+# Los movimientos 'correccion' (recalcular_existencias) no cuentan aquí: son
+# justo lo que se agregó para que el kardex llegara a este valor. Cada
+# agregado recorre un índice que lo cubre (ver INDEXES), sin tocar las tablas.
+_EXISTENCIA_DESDE_CERO = """
+    SELECT a.codigo_articulo, a.existencia AS guardada,
+           COALESCE(k.total, 0) AS kardex,
+           COALESCE(c.total, 0) - COALESCE(v.total, 0) + COALESCE(k.ajustes, 0) AS calculada
+    FROM Almacen a
+    LEFT JOIN (SELECT codigo_articulo, SUM(cantidad) AS total
+               FROM Detalle_Compra GROUP BY codigo_articulo) c
+      ON c.codigo_articulo = a.codigo_articulo
+    LEFT JOIN (SELECT codigo_articulo, SUM(cantidad) AS total
+               FROM Detalle_Venta GROUP BY codigo_articulo) v
+      ON v.codigo_articulo = a.codigo_articulo
+    LEFT JOIN (SELECT codigo_articulo, SUM(cantidad) AS total,
+                      SUM(CASE WHEN origen = 'ajuste' THEN cantidad ELSE 0 END) AS ajustes
+               FROM Movimientos_Almacen GROUP BY codigo_articulo) k
+      ON k.codigo_articulo = a.codigo_articulo
+"""
+
+
+def verificar_existencias(conn: sqlite3.Connection) -> list[tuple[str, int, int, int]]:
+    """
+    Artículos cuya existencia en Almacen o en el kardex no coincide con la
+    recalculada desde compras y ventas:
+    (codigo_articulo, almacen, kardex, calculada).
+    """
+    return conn.execute(
+        f"""
+        SELECT codigo_articulo, guardada, kardex, calculada FROM ({_EXISTENCIA_DESDE_CERO})
+        WHERE guardada <> calculada OR kardex <> calculada
+        ORDER BY codigo_articulo
+        """
+    ).fetchall()
+
+
+def existencias_negativas(conn: sqlite3.Connection) -> list[tuple[str, int]]:
+    """Artículos vendidos de más: (codigo_articulo, existencia) con existencia < 0."""
+    return conn.execute(
+        "SELECT codigo_articulo, existencia FROM Almacen WHERE existencia < 0 "
+        "ORDER BY codigo_articulo"
+    ).fetchall()
+
+
+def recalcular_existencias(conn: sqlite3.Connection) -> list[tuple[str, int, int, int]]:
+    """
+    Lleva kardex y Almacen a la existencia recalculada, en una transacción:
+    un movimiento 'correccion' por la diferencia del kardex (su trigger
+    mueve Almacen igual) y, si además Almacen no seguía al kardex, se fija
+    directo. Devuelve las diferencias que había antes (ver
+    verificar_existencias).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        diferencias = _corregir_existencias(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return diferencias
+
+
+def _corregir_existencias(conn: sqlite3.Connection) -> list[tuple[str, int, int, int]]:
+    # recalcular_existencias dentro de la transacción que ya tenga `conn`
+    diferencias = verificar_existencias(conn)
+    conn.executemany(
+        """
+        INSERT INTO Movimientos_Almacen(fecha, codigo_articulo, cantidad, origen)
+        VALUES (datetime('now'), ?, ?, 'correccion')
+        """,
+        [(codigo, calculada - kardex) for codigo, _a, kardex, calculada in diferencias
+         if kardex != calculada],
+    )
+    conn.executemany(
+        "UPDATE Almacen SET existencia = ? WHERE codigo_articulo = ? AND existencia <> ?",
+        [(calculada, codigo, calculada) for codigo, _a, _k, calculada in diferencias],
+    )
+    return diferencias
+
+
+# ---------- Puntos ----------
+def canjear_puntos(
+    conn: sqlite3.Connection, cliente_id: int, puntos: int, referencia: int | None = None
+):
+    """
+    Descuenta `puntos` del cliente como movimiento 'canje' del libro, dentro
+    de la transacción que tenga `conn`. Lanza sqlite3.IntegrityError si no
+    le alcanzan.
+    """
+    if puntos <= 0:
+        raise ValueError(f"Puntos a canjear inválidos: {puntos}.")
+    conn.execute(
+        """
+        INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+        VALUES (datetime('now'), ?, ?, 'canje', ?)
+        """,
+        (cliente_id, -puntos, referencia),
+    )
+
+
+def verificar_puntos(conn: sqlite3.Connection) -> list[tuple[int, int, int]]:
+    """
+    Clientes cuyo Clientes.puntos no coincide con el recálculo desde Ventas
+    (más canjes y saldo inicial): (cliente_id, guardados, calculados).
+    """
+    return conn.execute(
+        f"""
+        SELECT cliente_id, guardados, calculados FROM ({_PUNTOS_DESDE_CERO})
+        WHERE guardados <> calculados
+        ORDER BY cliente_id
+        """
+    ).fetchall()
+
+
+def recalcular_puntos(conn: sqlite3.Connection) -> list[tuple[int, int, int]]:
+    """
+    Lleva a cada cliente a su saldo recalculado con un movimiento 'ajuste'
+    por diferencia, todo en una transacción (el libro conserva qué se
+    corrigió). Un saldo calculado negativo queda en 0 y lo que faltaba se
+    condona. Devuelve las diferencias que había antes (ver verificar_puntos).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        diferencias = _corregir_puntos(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return diferencias
+
+
+def _corregir_puntos(conn: sqlite3.Connection) -> list[tuple[int, int, int]]:
+    # recalcular_puntos dentro de la transacción que ya tenga `conn`
+    diferencias = verificar_puntos(conn)
+    movimiento = """
+        INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen)
+        VALUES (datetime('now'), ?, ?, ?)
+    """
+    # Un saldo calculado negativo se lleva a 0 con 'condonado', que el
+    # recálculo sí cuenta (como en los triggers de Ventas): así
+    # verificar_puntos ya no lo marca después de corregir. Va antes que el
+    # ajuste para que el saldo nunca pase por negativo.
+    conn.executemany(
+        movimiento,
+        [
+            (cliente_id, -calculados, "condonado")
+            for cliente_id, _guardados, calculados in diferencias
+            if calculados < 0
+        ],
+    )
+    conn.executemany(
+        movimiento,
+        [
+            (cliente_id, calculados - guardados, "ajuste")
+            for cliente_id, guardados, calculados in diferencias
+            if calculados != guardados
+        ],
+    )
+    return diferencias
+
+
+# ---------- Datos de ejemplo ----------
 def seed_user(
     conn: sqlite3.Connection,
     correo: str = "admin@farmacia.cucei.udg.mx",
@@ -179,10 +2046,10 @@ def seed_user(
     # Busca si existe
     cur.execute("SELECT usuario_id FROM Usuarios WHERE correo = ?", (correo,))
     row = cur.fetchone()
-    pwd_hash = _hash_password(password_plano)
 
     if row is None:
-        # Inserta
+        # Inserta (el hash es caro a propósito: solo se calcula si hace falta)
+        pwd_hash = hash_password(password_plano)
         cur.execute(
             """
             INSERT INTO Usuarios (nombre, correo, password_hash, rol)
@@ -191,6 +2058,8 @@ def seed_user(
             (nombre, correo, pwd_hash, rol),
         )
         user_id = cur.lastrowid
+    else:
+        user_id = row[0]
 
     conn.commit()
     return user_id
@@ -329,46 +2198,79 @@ def seed_venta_demo(conn: sqlite3.Connection, cliente_id: int) -> None:
         # Si quieres “canjear 50 puntos”
         cur.execute(
             """
-            UPDATE Clientes
-            SET puntos = CASE WHEN puntos >= 50 THEN puntos - 50 ELSE puntos END
-            WHERE cliente_id = 2
+            INSERT INTO Movimientos_Puntos(fecha, cliente_id, puntos, origen, referencia)
+            SELECT datetime('now'), cliente_id, -50, 'canje', 1001
+            FROM Clientes WHERE cliente_id = 2 AND puntos >= 50
             """
         )
 
     conn.commit()
 
 
-def init_sqlite_file():
+def seed_demo(conn: sqlite3.Connection) -> None:
+    """Usuarios admin/cajero, catálogo mínimo y una venta de ejemplo. Idempotente."""
+    seed_user(conn)  # crea admin si falta y COMMIT
+    cajero_id = seed_user(conn, "luis@farmacia.cucei.udg.mx", "luis", "Luis Perez", "cajero")  # crea cajero si falta y COMMIT
+    cliente_id = seed_minima(conn, cajero_id)  # usa cajero_id para Clientes.usuario_id
+    seed_venta_demo(conn, cliente_id)  # crea venta y detalles si faltan
+
+
+def init_sqlite_file(seed: bool = False):
     """
-    Crea el archivo SQLite y tablas si no existen; mete admin/admin si usuarios está vacío.
-    De paso activa foreign_keys en cada conexión y aplica triggers.
+    Crea el archivo SQLite si no existe y aplica las migraciones pendientes.
+    Los datos de ejemplo (admin/admin incluido) solo se cargan si se piden con
+    `seed` o si el archivo es nuevo, para que haya con quién iniciar sesión.
     """
     first_time = not os.path.exists(DB_FILE)
     with sqlite_conn() as conn:
-        _ensure_schema(conn)
-        seed_user(conn)  # crea/actualiza admin y COMMIT
-        cajero_id = seed_user(conn, "luis@farmacia.cucei.udg.mx", "luis", "Luis Perez", "cajero")  # crea/actualiza cajero y COMMIT
-        cliente_id = seed_minima(conn, cajero_id)  # usa admin_id para Clientes.usuario_id
-        seed_venta_demo(conn, cliente_id)  # crea venta y detalles si faltan
+        conn.execute("PRAGMA journal_mode = WAL")
+        migrate(conn)
+        if seed or first_time:
+            seed_demo(conn)
 
     return first_time
 
 
-def open_qt_db_or_die():
+# Preparación en segundo plano: la ventana de login aparece mientras se
+# revisa el esquema. Quien vaya a consultar la BD llama esperar_bd() antes.
+_bd_lista = threading.Event()
+_bd_lista.set()
+_bd_error: BaseException | None = None
+
+
+def preparar_bd(
+    seed: bool = False, al_terminar: Callable[[], None] | None = None
+) -> threading.Thread:
     """
-    Abre la conexión Qt a SQLite y asegura foreign_keys activado.
-    Nota: hay que ejecutar también el PRAGMA en la conexión de Qt.
+    Corre init_sqlite_file(seed) en un hilo; esperar_bd() avisa cuando
+    termina. `al_terminar` se llama desde ese hilo si todo salió bien.
     """
-    db = QSqlDatabase.addDatabase("QSQLITE")
-    db.setDatabaseName(DB_FILE)
-    if not db.open():
-        QMessageBox.critical(None, "Error BD", "No se pudo abrir la base de datos.")
-        sys.exit(1)
+    global _bd_error
+    _bd_lista.clear()
+    _bd_error = None
 
-    # Asegurar foreign_keys en la conexión Qt
-    # Usamos un QSqlQuery implícito a través de db.exec si está disponible.
-    try:
-        db.exec("PRAGMA foreign_keys = ON;")
-    except Exception:
-        pass
-    return db
+    def trabajo():
+        global _bd_error
+        try:
+            init_sqlite_file(seed)
+            if al_terminar:
+                al_terminar()
+        except BaseException as e:
+            _bd_error = e
+        finally:
+            _bd_lista.set()
+
+    hilo = threading.Thread(target=trabajo, name="preparar_bd", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def esperar_bd(timeout: float | None = None) -> None:
+    """
+    Bloquea hasta que termine preparar_bd() (regresa de inmediato si no se
+    llamó). Relanza el error que haya tenido la preparación.
+    """
+    if not _bd_lista.wait(timeout):
+        raise TimeoutError("La base de datos sigue preparándose.")
+    if _bd_error is not None:
+        raise _bd_error
@@ -0,0 +1,243 @@
+# diagnostico.py
+# Instrumentación de consultas: cada conexión de open_conn (pool, login,
+# modelos, búsquedas) mide sus sentencias y las anota en un búfer circular
+# en memoria: texto, forma de los parámetros (los valores no se muestran ni
+# van al log), filas y latencia. Las que pasan de UMBRAL_LENTA_MS van además
+# a un log de consultas lentas. La ventana "Diagnóstico" (MainWindow) lee el resumen.
+# Se apaga con FARMACIA_SQL_DIAG=0.
+from __future__ import annotations
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+ACTIVO = os.environ.get("FARMACIA_SQL_DIAG", "1") != "0"
+# Mediciones que se conservan (las más viejas se descartan)
+CAPACIDAD = 20_000
+CAPACIDAD_EDICIONES = 2_000
+UMBRAL_LENTA_MS = float(os.environ.get("FARMACIA_SQL_LENTA_MS", "100"))
+LOG_LENTAS = os.environ.get("FARMACIA_SQL_LOG", "consultas_lentas.log")
+
+_ESPACIOS = re.compile(r"\s+")
+# "IN (?, ?, ?)" cuenta como la misma sentencia sin importar cuántos haya
+_LISTA_PARAMS = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def normalizar(sql: str) -> str:
+    return _LISTA_PARAMS.sub("?, …", _ESPACIOS.sub(" ", sql).strip())
+
+
+def forma_parametros(params) -> str:
+    """Cuántos parámetros y de qué tipo, sin los valores (hay contraseñas)."""
+    if not params:
+        return ""
+    if isinstance(params, dict):
+        return "{" + ", ".join(sorted(params)) + "}"
+    try:
+        return "(" + ", ".join(type(p).__name__ for p in params) + ")"
+    except TypeError:
+        return type(params).__name__
+
+
+# Una medición es una lista (más barata que un objeto en la ruta caliente):
+# [inicio perf_counter, origen, sql, parámetros, filas, segundos, lenta].
+# Los parámetros se guardan tal cual y su forma se calcula al leer el resumen;
+# los de executemany llegan ya como forma para no retener lotes enteros.
+INICIO, ORIGEN, SQL, PARAMETROS, FILAS, SEGUNDOS, LENTA = range(7)
+
+
+class Registro:
+    """
+    Búfer circular de mediciones. append/popleft de deque son atómicos. Sin
+    umbral (None) nada va al log de consultas lentas.
+    """
+
+    def __init__(self, capacidad: int = CAPACIDAD, umbral_ms: float | None = UMBRAL_LENTA_MS):
+        self.mediciones: deque[list] = deque(maxlen=capacidad)
+        self.umbral = float("inf") if umbral_ms is None else umbral_ms / 1000
+        self._log: logging.Logger | None = None
+        self._lock = threading.Lock()
+
+    def evento(self, origen: str, nombre: str, segundos: float, filas: int = 0):
+        """Mediciones que no son SQL (p. ej. cuánto duró una edición)."""
+        m = [time.perf_counter() - segundos, origen, nombre, (), filas, segundos, False]
+        self.mediciones.append(m)
+        if segundos >= self.umbral:
+            self.lenta(m)
+
+    def lenta(self, m: list):
+        m[LENTA] = True
+        if self._log is None:
+            with self._lock:
+                if self._log is None:
+                    log = logging.getLogger("farmacia.sql_lento")
+                    if not log.handlers:
+                        handler = logging.FileHandler(LOG_LENTAS, encoding="utf-8", delay=True)
+                        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                        log.addHandler(handler)
+                        log.setLevel(logging.INFO)
+                        log.propagate = False
+                    self._log = log
+        self._log.info(
+            "%.1f ms [%s] filas=%d params=%s %s",
+            m[SEGUNDOS] * 1000, m[ORIGEN], m[FILAS], _forma(m[PARAMETROS]) or "-",
+            normalizar(m[SQL]),
+        )
+
+    def limpiar(self):
+        self.mediciones.clear()
+
+    def resumen(self) -> list[dict]:
+        """
+        Por (origen, sentencia): n, p50, p95, p99, max y total en ms, filas
+        promedio, cuántas pasaron el umbral y las formas de parámetros vistas.
+        Ordenado por tiempo total.
+        """
+        grupos: dict[tuple[str, str], list[list]] = {}
+        normalizadas: dict[str, str] = {}
+        for m in list(self.mediciones):
+            sql = normalizadas.get(m[SQL])
+            if sql is None:
+                sql = normalizadas[m[SQL]] = normalizar(m[SQL])
+            grupos.setdefault((m[ORIGEN], sql), []).append(m)
+
+        filas = []
+        for (origen, sql), ms in grupos.items():
+            tiempos = sorted(m[SEGUNDOS] * 1000 for m in ms)
+            n = len(tiempos)
+
+            def pct(p: float) -> float:
+                return tiempos[min(n - 1, int(p * n))]
+
+            filas.append(
+                {
+                    "origen": origen,
+                    "sql": sql,
+                    "parametros": ", ".join(sorted({_forma(m[PARAMETROS]) for m in ms})),
+                    "n": n,
+                    "p50": pct(0.50),
+                    "p95": pct(0.95),
+                    "p99": pct(0.99),
+                    "max": tiempos[-1],
+                    "total": sum(tiempos),
+                    "filas": sum(m[FILAS] for m in ms) / n,
+                    "lentas": sum(m[LENTA] for m in ms),
+                }
+            )
+        filas.sort(key=lambda f: f["total"], reverse=True)
+        return filas
+
+
+class _Forma(str):
+    """Forma ya calculada (executemany)."""
+
+
+def _forma(params) -> str:
+    return params if isinstance(params, _Forma) else forma_parametros(params)
+
+
+registro = Registro()
+# Tiempos de personas, no de SQLite (cuánto tuvo alguien abierto un editor):
+# aparte para que no caigan en el log de lentas ni en los percentiles de SQL
+ediciones = Registro(CAPACIDAD_EDICIONES, umbral_ms=None)
+
+
+# ---------- Conexión y cursor medidos ----------
+# Filas por fetchmany al iterar un cursor medido
+LOTE_ITERACION = 256
+
+
+class CursorMedido(sqlite3.Cursor):
+    """
+    El tiempo de execute más el de leer las filas (fetch* o iterar) se suma
+    a la misma medición; las filas son las leídas o, en DML, rowcount.
+    Iterar lee por fetchmany: no mezclar un for interrumpido con fetchone.
+    """
+
+    __slots__ = ("_medicion",)
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self._medicion = None
+
+    def _medir(self, metodo, sql, params):
+        t0 = time.perf_counter()
+        m = self._medicion = [t0, self.connection.origen, sql, params, 0, 0.0, False]
+        registro.mediciones.append(m)
+        try:
+            return metodo(sql, params)
+        finally:
+            m[SEGUNDOS] = time.perf_counter() - t0
+            if self.rowcount > 0:
+                m[FILAS] = self.rowcount
+            if m[SEGUNDOS] >= registro.umbral:
+                registro.lenta(m)
+
+    def _leido(self, t0, filas):
+        m = self._medicion
+        if m is not None:
+            m[FILAS] += filas
+            m[SEGUNDOS] += time.perf_counter() - t0
+            if not m[LENTA] and m[SEGUNDOS] >= registro.umbral:
+                registro.lenta(m)
+
+    def execute(self, sql, parameters=()):
+        return self._medir(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if isinstance(seq_of_parameters, (list, tuple)):
+            primera = seq_of_parameters[0] if seq_of_parameters else ()
+            forma = f"{len(seq_of_parameters)}× {forma_parametros(primera)}"
+        else:
+            forma = "lote"
+        t0 = time.perf_counter()
+        m = self._medicion = [t0, self.connection.origen, sql, _Forma(forma), 0, 0.0, False]
+        registro.mediciones.append(m)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            m[SEGUNDOS] = time.perf_counter() - t0
+            m[FILAS] = max(self.rowcount, 0)
+            if m[SEGUNDOS] >= registro.umbral:
+                registro.lenta(m)
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        fila = super().fetchone()
+        self._leido(t0, fila is not None)
+        return fila
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        filas = super().fetchmany(self.arraysize if size is None else size)
+        self._leido(t0, len(filas))
+        return filas
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        filas = super().fetchall()
+        self._leido(t0, len(filas))
+        return filas
+
+    def __iter__(self):
+        # Un __next__ en Python por fila cuadruplica el costo de iterar
+        while filas := self.fetchmany(LOTE_ITERACION):
+            yield from filas
+
+
+class ConexionMedida(sqlite3.Connection):
+    """Conexión cuyos execute/executemany/cursor pasan por CursorMedido."""
+
+    origen = "sqlite"
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
@@ -0,0 +1,143 @@
+# escritura.py
+# Escritor único con commit agrupado. Varios productores (hilos de la app,
+# el servidor HTTP) encolan ventas y compras; un solo hilo dueño de la
+# conexión de escritura las toma en grupos pequeños y las confirma con UN
+# commit por grupo. Cada trabajo va en su SAVEPOINT: si uno falla solo se
+# deshace el suyo y su productor recibe la excepción; los demás reciben su
+# folio cuando el commit del grupo ya quedó (nunca antes).
+# Sin Qt.
+from __future__ import annotations
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+import database
+
+# Trabajos por commit como máximo
+MAX_GRUPO = 64
+# Cuánto espera el escritor a que lleguen más trabajos después del primero.
+# Con 0 solo agrupa lo que ya estaba en cola (lo que llegó mientras se
+# confirmaba el grupo anterior): con productores que esperan su folio antes
+# de mandar la siguiente venta, esperar más solo deja al escritor ocioso.
+VENTANA_MS = 0.0
+
+_FIN = object()
+
+
+class ColaEscritura:
+    """
+    Cola de escrituras con commit agrupado. enviar() devuelve un Future con
+    el resultado de fn(conn, *args); ejecutar() espera ese resultado. El
+    hilo escritor arranca con el primer envío. Segura entre hilos.
+    """
+
+    def __init__(self, max_grupo: int = MAX_GRUPO, ventana_ms: float = VENTANA_MS):
+        self.max_grupo = max_grupo
+        self.ventana = ventana_ms / 1000
+        self._cola: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._hilo: threading.Thread | None = None
+        # Estadística: grupos confirmados y trabajos en ellos
+        self.grupos = 0
+        self.trabajos = 0
+
+    def enviar(self, fn: Callable, *args) -> Future:
+        futuro = Future()
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(
+                    target=self._ciclo, name="escritor", daemon=True
+                )
+                self._hilo.start()
+            self._cola.put((fn, args, futuro))
+        return futuro
+
+    def ejecutar(self, fn: Callable, *args):
+        return self.enviar(fn, *args).result()
+
+    def vender(self, cliente_id: int, usuario_id: int, lineas: list[tuple[str, int]]) -> int:
+        """Como database.registrar_venta, pero por la cola. Devuelve el folio."""
+        lineas = [(str(c), int(q)) for c, q in lineas]
+        return self.ejecutar(database._insertar_venta, cliente_id, usuario_id, lineas)
+
+    def comprar(self, lineas: list[tuple[str, int, float]], fecha: str | None = None) -> int:
+        """Como database.registrar_compra, pero por la cola. Devuelve compra_id."""
+        lineas = [(str(c), int(q), round(float(k), 2)) for c, q, k in lineas]
+        return self.ejecutar(database._insertar_compra, lineas, fecha)
+
+    def close(self):
+        """Confirma lo que ya estaba en cola y detiene el hilo."""
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+            if hilo is not None:
+                self._cola.put(_FIN)
+        if hilo is not None:
+            hilo.join()
+
+    # -------- hilo escritor --------
+    def _tomar_grupo(self) -> tuple[list, bool]:
+        primero = self._cola.get()
+        if primero is _FIN:
+            return [], True
+        grupo = [primero]
+        limite = time.perf_counter() + self.ventana
+        while len(grupo) < self.max_grupo:
+            espera = limite - time.perf_counter()
+            try:
+                if espera > 0:
+                    trabajo = self._cola.get(timeout=espera)
+                else:
+                    trabajo = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if trabajo is _FIN:
+                return grupo, True
+            grupo.append(trabajo)
+        return grupo, False
+
+    def _ciclo(self):
+        conn = database.open_conn("escritor")
+        try:
+            terminar = False
+            while not terminar:
+                grupo, terminar = self._tomar_grupo()
+                if grupo:
+                    self._confirmar(conn, grupo)
+        finally:
+            conn.close()
+
+    def _confirmar(self, conn: sqlite3.Connection, grupo: list):
+        resultados = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, futuro in grupo:
+                if not futuro.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT trabajo")
+                try:
+                    resultados.append((futuro, fn(conn, *args), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO trabajo")
+                    resultados.append((futuro, None, e))
+                conn.execute("RELEASE trabajo")
+            conn.commit()
+        except Exception as e:
+            # Falló el grupo entero (BEGIN, COMMIT, disco): nadie quedó guardado
+            if conn.in_transaction:
+                conn.rollback()
+            for _fn, _args, futuro in grupo:
+                if futuro.running() or futuro.set_running_or_notify_cancel():
+                    futuro.set_exception(e)
+            return
+        self.grupos += 1
+        self.trabajos += len(resultados)
+        for futuro, resultado, error in resultados:
+            if error is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(error)
+
+
+escritor = ColaEscritura()
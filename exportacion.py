@@ -0,0 +1,150 @@
+# exportacion.py
+# Exporta una tabla completa (o filtrada) a CSV o JSON Lines recorriendo un
+# cursor con fetchmany: la memoria no crece con el tamaño de la tabla.
+from __future__ import annotations
+import csv
+import json
+import os
+import sqlite3
+from collections.abc import Callable
+from database import _fin_del_dia, search_query
+
+# Filas por fetchmany
+LOTE = 5_000
+
+FORMATOS = ("csv", "jsonl")
+
+# Cómo se filtra cada tabla por rango de fechas (:desde / :hasta). Los
+# renglones de venta y compra toman la fecha de su documento.
+FILTRO_FECHAS: dict[str, str] = {
+    "Ventas": "fecha >= :desde AND fecha <= :hasta",
+    "Detalle_Venta": (
+        "folio_venta IN (SELECT folio FROM Ventas WHERE fecha >= :desde AND fecha <= :hasta)"
+    ),
+    "Compras": "fecha >= :desde AND fecha <= :hasta",
+    "Detalle_Compra": (
+        "compra_id IN (SELECT compra_id FROM Compras WHERE fecha >= :desde AND fecha <= :hasta)"
+    ),
+    "Resumen_Ventas_Diario": "dia >= date(:desde) AND dia <= date(:hasta)",
+    "Movimientos_Almacen": "fecha >= :desde AND fecha <= :hasta",
+}
+
+
+def formato_por_extension(archivo: str) -> str:
+    return "jsonl" if archivo.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _tiene_rowid(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"No existe la tabla {table}.")
+    return "WITHOUT ROWID" not in (row[0] or "").upper()
+
+
+def consulta_exportacion(
+    conn: sqlite3.Connection,
+    table: str,
+    filtro: str = "",
+    columnas: list[str] | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+) -> tuple[str, dict]:
+    """
+    (sql, params) con las filas de `table` a exportar. `filtro` es el mismo
+    texto del filtro rápido del CrudDialog (FTS o LIKE sobre `columnas`),
+    sin el tope de coincidencias; `desde`/`hasta` (YYYY-MM-DD, inclusivos)
+    solo aplican a las tablas de FILTRO_FECHAS.
+    """
+    con_rowid = _tiene_rowid(conn, table)
+    cols = columnas or [
+        r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')
+    ]
+    where, params = [], {}
+
+    if filtro.strip():
+        if not con_rowid:
+            raise ValueError(f"{table} no admite filtro de texto.")
+        query = search_query(table, filtro, cols, limit=None)
+        if query is not None:
+            sql, qparams = query
+            # Los ? de search_query pasan a parámetros con nombre
+            for i, value in enumerate(qparams):
+                sql = sql.replace("?", f":f{i}", 1)
+                params[f"f{i}"] = value
+            where.append(f"rowid IN ({sql})")
+
+    if desde or hasta:
+        if table not in FILTRO_FECHAS:
+            raise ValueError(f"{table} no tiene filtro por fechas.")
+        where.append(FILTRO_FECHAS[table])
+        params["desde"] = desde or "0000-01-01"
+        params["hasta"] = _fin_del_dia(hasta) if hasta else "9999-12-31 23:59:59"
+
+    select = ", ".join(f'"{c}"' for c in cols)
+    sql = f'SELECT {select} FROM "{table}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if con_rowid:
+        sql += " ORDER BY rowid"
+    return sql, params
+
+
+def exportar_cursor(
+    cur: sqlite3.Cursor,
+    archivo: str,
+    formato: str | None = None,
+    progreso: Callable[[int], bool | None] | None = None,
+) -> int:
+    """
+    Escribe las filas de `cur` en `archivo` de LOTE en LOTE. Se escribe en
+    un archivo temporal que se renombra al terminar, así nunca queda uno a
+    medias. `progreso(filas)` se llama por lote; si devuelve True se cancela
+    (y se lanza InterruptedError). Devuelve cuántas filas se escribieron.
+    """
+    formato = formato or formato_por_extension(archivo)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    nombres = [d[0] for d in cur.description]
+    temporal = archivo + ".parcial"
+    total = 0
+    try:
+        with open(temporal, "w", encoding="utf-8", newline="") as f:
+            if formato == "csv":
+                writer = csv.writer(f)
+                writer.writerow(nombres)
+                escribir = writer.writerows
+            else:
+                def escribir(filas):
+                    f.writelines(
+                        json.dumps(dict(zip(nombres, fila)), ensure_ascii=False) + "\n"
+                        for fila in filas
+                    )
+            while filas := cur.fetchmany(LOTE):
+                escribir(filas)
+                total += len(filas)
+                if progreso and progreso(total):
+                    raise InterruptedError("Exportación cancelada.")
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return total
+
+
+def exportar_tabla(
+    conn: sqlite3.Connection,
+    table: str,
+    archivo: str,
+    formato: str | None = None,
+    filtro: str = "",
+    columnas: list[str] | None = None,
+    desde: str | None = None,
+    hasta: str | None = None,
+    progreso: Callable[[int], bool | None] | None = None,
+) -> int:
+    """Exporta `table` (ver consulta_exportacion) a `archivo`. Devuelve las filas escritas."""
+    sql, params = consulta_exportacion(conn, table, filtro, columnas, desde, hasta)
+    return exportar_cursor(conn.execute(sql, params), archivo, formato, progreso)
@@ -0,0 +1,257 @@
+# importacion.py
+# Carga masiva desde CSV: listas de precios (Articulos) y facturas de compra
+# (Compras + Detalle_Compra). Lee el archivo en lotes sin cargarlo completo,
+# valida cada renglón con las mismas reglas que SmartDelegate y confirma
+# una transacción por lote.
+from __future__ import annotations
+import csv
+import json
+import sqlite3
+from collections.abc import Callable, Iterator
+from contextlib import nullcontext
+from database import carga_masiva
+
+# Renglones por transacción
+LOTE = 10_000
+
+COLUMNAS_ARTICULOS = ("codigo", "descripcion", "precio")
+COLUMNAS_COMPRA = ("codigo", "cantidad", "costo_unitario")
+
+_VERDADERO = {"1", "true", "t", "si", "sí", "s", "x"}
+_FALSO = {"", "0", "false", "f", "no", "n"}
+
+# El DO UPDATE solo toca filas que cambian: así no se reindexa el FTS de
+# artículos que llegan iguales en cada lista de precios.
+_UPSERT_ARTICULO = """
+    INSERT INTO Articulos(codigo, descripcion, precio, en_promocion)
+    VALUES (?, ?, ?, COALESCE(?, 0))
+    ON CONFLICT(codigo) DO UPDATE SET
+      descripcion = excluded.descripcion,
+      precio = excluded.precio,
+      en_promocion = COALESCE(?, en_promocion)
+    WHERE descripcion IS NOT excluded.descripcion
+       OR precio IS NOT excluded.precio
+       OR en_promocion IS NOT COALESCE(?, en_promocion)
+"""
+
+
+class ErrorImportacion(ValueError):
+    """El archivo no se puede importar (encabezados faltantes, etc.)."""
+
+
+# ---------- Validación (mismas reglas que SmartDelegate) ----------
+def _requerido(fila: dict, campo: str) -> str:
+    valor = (fila.get(campo) or "").strip()
+    if not valor:
+        raise ValueError(f"{campo} no puede estar vacío")
+    return valor
+
+
+def _entero_no_negativo(fila: dict, campo: str) -> int:
+    txt = _requerido(fila, campo)
+    try:
+        valor = int(txt)
+    except ValueError:
+        raise ValueError(f"{campo} debe ser entero: {txt!r}") from None
+    if valor < 0:
+        raise ValueError(f"{campo} no puede ser negativo: {valor}")
+    return valor
+
+
+def _real_no_negativo(fila: dict, campo: str) -> float:
+    txt = _requerido(fila, campo).replace("$", "").replace(" ", "")
+    try:
+        valor = float(txt)
+    except ValueError:
+        raise ValueError(f"{campo} debe ser numérico: {txt!r}") from None
+    if not 0 <= valor <= 1e12:
+        raise ValueError(f"{campo} fuera de rango: {valor}")
+    return round(valor, 2)
+
+
+def _booleano(fila: dict, campo: str) -> int | None:
+    # None = la columna no viene en el archivo y se respeta el valor actual
+    if campo not in fila:
+        return None
+    txt = (fila[campo] or "").strip().lower()
+    if txt in _VERDADERO:
+        return 1
+    if txt in _FALSO:
+        return 0
+    raise ValueError(f"{campo} debe ser sí/no o 1/0: {txt!r}")
+
+
+def _articulo(fila: dict) -> tuple:
+    codigo = _requerido(fila, "codigo")
+    if len(codigo) > 20:
+        raise ValueError(f"codigo demasiado largo: {codigo!r}")
+    promo = _booleano(fila, "en_promocion")
+    return (
+        codigo,
+        _requerido(fila, "descripcion"),
+        _real_no_negativo(fila, "precio"),
+        promo,
+        promo,
+        promo,
+    )
+
+
+# ---------- Lectura ----------
+def _leer_lotes(
+    archivo: str, requeridas: tuple[str, ...], lote: int, separador: str
+) -> Iterator[list[tuple[int, dict]]]:
+    """Lotes de (número de línea, fila) con encabezados en minúsculas."""
+    with open(archivo, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=separador)
+        encabezado = [c.strip().lower() for c in next(reader, [])]
+        faltan = [c for c in requeridas if c not in encabezado]
+        if faltan:
+            raise ErrorImportacion(
+                f"{archivo}: faltan columnas {', '.join(faltan)}"
+            )
+        filas = []
+        for valores in reader:
+            if not any(valores):
+                continue
+            filas.append((reader.line_num, dict(zip(encabezado, valores))))
+            if len(filas) >= lote:
+                yield filas
+                filas = []
+        if filas:
+            yield filas
+
+
+def _en_transaccion(conn: sqlite3.Connection, trabajo: Callable[[], None]):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        trabajo()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# ---------- Importaciones ----------
+def importar_articulos(
+    conn: sqlite3.Connection,
+    archivo: str,
+    lote: int = LOTE,
+    separador: str = ",",
+    diferir: bool = True,
+    progreso: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Da de alta o actualiza artículos desde un CSV con columnas codigo,
+    descripcion, precio y opcionalmente en_promocion. Los renglones inválidos
+    se saltan y se reportan en "errores" como (línea, mensaje). Con
+    `diferir` el Almacen y el FTS de las altas se llenan una vez por lote.
+    Devuelve {"leidos", "articulos", "errores"}.
+    """
+    resultado = {"leidos": 0, "articulos": 0, "errores": []}
+    for filas in _leer_lotes(archivo, COLUMNAS_ARTICULOS, lote, separador):
+        validos = []
+        for linea, fila in filas:
+            try:
+                validos.append(_articulo(fila))
+            except ValueError as e:
+                resultado["errores"].append((linea, str(e)))
+
+        def trabajo():
+            with carga_masiva(conn) if diferir else nullcontext():
+                conn.executemany(_UPSERT_ARTICULO, validos)
+
+        _en_transaccion(conn, trabajo)
+        resultado["leidos"] += len(filas)
+        resultado["articulos"] += len(validos)
+        if progreso:
+            progreso(resultado)
+    return resultado
+
+
+def importar_compra(
+    conn: sqlite3.Connection,
+    archivo: str,
+    fecha: str | None = None,
+    lote: int = LOTE,
+    separador: str = ",",
+    diferir: bool = True,
+    progreso: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Registra una factura de compra desde un CSV con columnas codigo,
+    cantidad y costo_unitario. Si además trae descripcion y precio, los
+    artículos nuevos se dan de alta (y los existentes se actualizan).
+    Todo el archivo queda en una sola compra con fecha `fecha` (hoy si es
+    None). Con `diferir` el kardex y Almacen se ajustan una vez por lote en
+    vez de una por renglón. Devuelve {"compra_id", "leidos",
+    "renglones", "articulos", "errores"}.
+    """
+    resultado = {"compra_id": None, "leidos": 0, "renglones": 0, "articulos": 0, "errores": []}
+    siguiente_id = 1
+
+    for filas in _leer_lotes(archivo, COLUMNAS_COMPRA, lote, separador):
+        renglones, articulos, sin_alta = [], [], set()
+        for linea, fila in filas:
+            try:
+                codigo = _requerido(fila, "codigo")
+                renglon = (
+                    linea,
+                    codigo,
+                    _entero_no_negativo(fila, "cantidad"),
+                    _real_no_negativo(fila, "costo_unitario"),
+                )
+                if (fila.get("descripcion") or "").strip():
+                    articulos.append(_articulo(fila))
+                else:
+                    sin_alta.add(codigo)
+            except ValueError as e:
+                resultado["errores"].append((linea, str(e)))
+                continue
+            renglones.append(renglon)
+
+        def trabajo():
+            nonlocal siguiente_id
+            with carga_masiva(conn) if diferir else nullcontext():
+                conn.executemany(_UPSERT_ARTICULO, articulos)
+                # Códigos sin alta en el archivo que tampoco existen en el catálogo
+                existentes = {
+                    r[0]
+                    for r in conn.execute(
+                        "SELECT codigo FROM Articulos "
+                        "WHERE codigo IN (SELECT value FROM json_each(?))",
+                        (json.dumps(list(sin_alta)),),
+                    )
+                }
+                validos = []
+                for linea, codigo, cantidad, costo in renglones:
+                    if codigo in sin_alta and codigo not in existentes:
+                        resultado["errores"].append((linea, f"artículo inexistente: {codigo}"))
+                        continue
+                    validos.append((siguiente_id, codigo, cantidad, costo))
+                    siguiente_id += 1
+                if not validos:
+                    return
+                # El encabezado hasta que haya un renglón válido: un archivo
+                # rechazado completo no deja una compra vacía
+                if resultado["compra_id"] is None:
+                    cur = conn.execute(
+                        "INSERT INTO Compras(fecha) VALUES (COALESCE(?, datetime('now')))",
+                        (fecha,),
+                    )
+                    resultado["compra_id"] = cur.lastrowid
+                conn.executemany(
+                    """
+                    INSERT INTO Detalle_Compra(
+                      compra_id, detalle_compra_id, codigo_articulo, cantidad, costo_unitario
+                    ) VALUES (?,?,?,?,?)
+                    """,
+                    [(resultado["compra_id"], *v) for v in validos],
+                )
+            resultado["renglones"] += len(validos)
+
+        _en_transaccion(conn, trabajo)
+        resultado["leidos"] += len(filas)
+        resultado["articulos"] += len(articulos)
+        if progreso:
+            progreso(resultado)
+    return resultado
@@ -0,0 +1,94 @@
+# integridad.py
+# Revisión de los contadores que mantienen los triggers: Almacen.existencia
+# (y el kardex) contra compras menos ventas, y Clientes.puntos contra Ventas
+# y el libro de puntos. Todo son agregados en SQL sobre una sola instantánea
+# de lectura; a Python solo llegan los renglones que no cuadran. Con
+# reparar=True corrige existencias y puntos en una sola transacción. Corre
+# en un hilo aparte (en_segundo_plano) con su propia conexión. Sin Qt.
+from __future__ import annotations
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import database
+
+# Renglones de cada diferencia que se muestran en el reporte
+MAX_DETALLE = 20
+
+
+class Informe:
+    """Diferencias que encontró una revisión (las de antes, si se reparó)."""
+
+    __slots__ = ("existencias", "negativas", "puntos", "reparado", "segundos")
+
+    def __init__(self, existencias, negativas, puntos, reparado: bool, segundos: float):
+        self.existencias: list[tuple[str, int, int, int]] = existencias
+        self.negativas: list[tuple[str, int]] = negativas
+        self.puntos: list[tuple[int, int, int]] = puntos
+        self.reparado = reparado
+        self.segundos = segundos
+
+    @property
+    def diferencias(self) -> int:
+        return len(self.existencias) + len(self.puntos)
+
+    def lineas(self, max_detalle: int = MAX_DETALLE) -> list[str]:
+        """Reporte en texto (CLI y ventana de MainWindow)."""
+        lineas = [
+            f"Existencias: {len(self.existencias)} diferencias.",
+            *(
+                f"  {codigo}: almacen={almacen} kardex={kardex} calculada={calculada}"
+                for codigo, almacen, kardex, calculada in self.existencias[:max_detalle]
+            ),
+        ]
+        if len(self.existencias) > max_detalle:
+            lineas.append(f"  ... y {len(self.existencias) - max_detalle} más")
+        lineas.append(f"Puntos: {len(self.puntos)} diferencias.")
+        lineas.extend(
+            f"  cliente {cliente_id}: guardados={guardados} calculados={calculados}"
+            for cliente_id, guardados, calculados in self.puntos[:max_detalle]
+        )
+        if len(self.puntos) > max_detalle:
+            lineas.append(f"  ... y {len(self.puntos) - max_detalle} más")
+        if self.negativas:
+            lineas.append(f"Existencia negativa (vendido de más): {len(self.negativas)} artículos.")
+            lineas.extend(f"  {c}: {e}" for c, e in self.negativas[:max_detalle])
+        if self.reparado and self.diferencias:
+            lineas.append("Diferencias corregidas.")
+        lineas.append(f"Revisión en {self.segundos:.1f} s.")
+        return lineas
+
+
+def revisar(reparar: bool = False) -> Informe:
+    """
+    Revisa existencias y puntos. Sin reparar es una transacción de solo
+    lectura (no detiene a las cajas: WAL); con reparar toma el candado de
+    escritura desde el principio para que lo revisado sea lo que se corrige.
+    """
+    t0 = time.perf_counter()
+    conn = database.open_conn("integridad")
+    conn.isolation_level = None  # BEGIN/COMMIT explícitos
+    try:
+        conn.execute("BEGIN IMMEDIATE" if reparar else "BEGIN")
+        try:
+            if reparar:
+                existencias = database._corregir_existencias(conn)
+                puntos = database._corregir_puntos(conn)
+            else:
+                existencias = database.verificar_existencias(conn)
+                puntos = database.verificar_puntos(conn)
+            negativas = database.existencias_negativas(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return Informe(existencias, negativas, puntos, reparar, time.perf_counter() - t0)
+
+
+# Una revisión a la vez; las que se pidan mientras tanto esperan su turno
+_hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="integridad")
+
+
+def en_segundo_plano(reparar: bool = False) -> Future:
+    """revisar() en el hilo de integridad. El Future da el Informe."""
+    return _hilo.submit(revisar, reparar)
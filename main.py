@@ -1,42 +1,68 @@
 # main.py
 # Requisitos: pip install PySide6
-# Ejecuta: python main.py
+# Ejecuta: python main.py [--seed] [--arranque]
+#   --seed      carga los datos de ejemplo
+#   --arranque  imprime en stderr cuánto tarda cada etapa del arranque
 from __future__ import annotations
+import time
+
+_INICIO = time.perf_counter()
+
+import os
 import sys
-from database import init_sqlite_file, open_qt_db_or_die
-from views.LoginDialog import LoginDialog
-from views.MainWindow import MainWindow
-from PySide6.QtWidgets import (
-    QApplication,
-    QDialog,
-)
+from arranque import cronometro
+
 
+def _precargar(reloj):
+    # Con el login ya en pantalla: lo que hará falta después de entrar
+    import views.MainWindow  # noqa: F401
+    import views.CrudDialog  # noqa: F401
 
-# ---------- Bucle de app con ciclo de login ----------
+    reloj.marca("MainWindow y CrudDialog precargados")
+    reloj.detener()
+    reloj.reporte()
+
+
+# ---------- App: un solo QApplication y ciclo de sesiones ----------
 def main():
-    init_sqlite_file()
+    args = sys.argv[1:]
+    reloj = cronometro(
+        "--arranque" in args or os.environ.get("FARMACIA_ARRANQUE") == "1", _INICIO
+    )
+    reloj.medir_imports()
+    # Los módulos de la app se importan ya con el cronómetro puesto, para que
+    # su costo aparezca en el reporte
+    from auth import auth
+    from database import catalogo, pool, preparar_bd
+    from referencias import referencias
+
+    reloj.marca("módulos de la app importados")
+
+    # Esquema y datos de ejemplo en otro hilo mientras arranca Qt; el login
+    # espera a que termine antes de consultar (database.esperar_bd)
+    preparar_bd(seed="--seed" in args, al_terminar=lambda: reloj.marca("esquema listo"))
+
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+
+    reloj.marca("PySide6 importado")
     app = QApplication(sys.argv)
-    open_qt_db_or_die()
-
-    while True:
-        login = LoginDialog()
-        if login.exec() == QDialog.Accepted:
-            mainw = MainWindow()
-            # Si el usuario cierra sesión, volvemos al login
-            # Conectamos la señal por si quieres reaccionar a logout desde el main.
-            mainw.logout_requested.connect(lambda: None)
-            mainw.show()
-
-            # Ejecuta el bucle hasta que cierre la ventana principal
-            app.exec()
-
-            # Si cerró la app completa con Alt+F4 o menú Salir, rompemos ciclo
-            # Si fue "Cerrar sesión", simplemente reitera y muestra el login de nuevo.
-            # Detección simple: si no hay ventanas, salir.
-            if not QApplication.topLevelWidgets():
-                break
-        else:
-            break
+    # La ventana principal se oculta al cerrar sesión; salir es explícito
+    app.setQuitOnLastWindowClosed(False)
+    from views.SessionManager import SessionManager
+
+    reloj.marca("QApplication creada")
+
+    sessions = SessionManager()
+    QTimer.singleShot(0, lambda: reloj.marca("login visible"))
+    QTimer.singleShot(0, lambda: _precargar(reloj))
+    if sessions.start():
+        app.exec()
+    sessions.shutdown()
+    auth.close()
+    catalogo.close()
+    referencias.close()
+    pool.close_all()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,363 @@
+# referencias.py
+# Listas de referencias para editar llaves foráneas: de cada tabla referida
+# (database.REFERENCIADAS) se guarda en memoria clave y etiqueta (nombre del
+# cliente, descripción del artículo) con un índice ordenado de palabras, así
+# que buscar por prefijo cuesta una bisección aunque la tabla tenga millones
+# de filas. Cada tabla se carga en un hilo aparte la primera vez que se pide
+# y después se pone al día leyendo solo las filas anotadas en
+# Cambios_Referencias. Sin Qt.
+from __future__ import annotations
+import gc
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+import database
+
+# Sugerencias por búsqueda como máximo
+MAX_SUGERENCIAS = 50
+# rowids por consulta al releer filas cambiadas
+LOTE_FILAS = 500
+# Segundos entre revisiones de PRAGMA data_version (displayText pregunta por
+# cada celda que se pinta)
+REVISAR_CADA = 1.0
+
+_PALABRAS = re.compile(r"\w+")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin acentos: "Pérez" y "perez" son lo mismo."""
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def palabras(texto: str) -> list[str]:
+    return _PALABRAS.findall(normalizar(texto))
+
+
+class ListaReferencia:
+    """
+    Clave y etiqueta de cada fila de una tabla, por posición. Se buscan por
+    clave exacta (dict) o por prefijos de palabras de la etiqueta (y de la
+    clave si es texto, como el código del artículo) en `_indice`: pares
+    (palabra, posición) ordenados. Las posiciones de filas borradas quedan
+    vacías. No es segura entre hilos por sí sola (ver Referencias).
+    """
+
+    __slots__ = (
+        "tabla", "clave", "etiqueta", "ultimo",
+        "_claves", "_etiquetas", "_por_fila", "_por_clave", "_indice", "_normales",
+    )
+
+    def __init__(self, tabla: str, clave: str, etiqueta: str):
+        self.tabla, self.clave, self.etiqueta = tabla, clave, etiqueta
+        self.ultimo = 0  # último seq de Cambios_Referencias aplicado
+        self._normales: dict[str, str] = {}
+
+    def _palabras_de(self, clave, etiqueta) -> set[str]:
+        # Las palabras se repiten mucho (nombres, apellidos): se normaliza
+        # cada una una sola vez
+        normales = self._normales
+        ps = set()
+        for texto in (etiqueta or "", clave if isinstance(clave, str) else ""):
+            for p in _PALABRAS.findall(texto):
+                n = normales.get(p)
+                if n is None:
+                    n = normales[p] = normalizar(p)
+                ps.add(n)
+        return ps
+
+    def cargar(self, conn: sqlite3.Connection):
+        """Lee la tabla completa. Llamar dentro de una transacción de lectura."""
+        self.ultimo = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM Cambios_Referencias"
+        ).fetchone()[0]
+        claves, etiquetas, por_fila, indice = [], [], {}, []
+        # Millones de tuplas nuevas disparan el recolector de ciclos una y
+        # otra vez sin que haya ciclos que juntar
+        recolector = gc.isenabled()
+        gc.disable()
+        try:
+            for rowid, clave, etiqueta in conn.execute(
+                f'SELECT rowid, "{self.clave}", "{self.etiqueta}" FROM "{self.tabla}"'
+            ):
+                pos = len(claves)
+                por_fila[rowid] = pos
+                claves.append(clave)
+                etiquetas.append(etiqueta)
+                indice.extend((p, pos) for p in self._palabras_de(clave, etiqueta))
+            indice.sort()
+        finally:
+            if recolector:
+                gc.enable()
+        self._claves, self._etiquetas, self._por_fila = claves, etiquetas, por_fila
+        self._por_clave = {c: i for i, c in enumerate(claves)}
+        self._indice = indice
+
+    def ponerse_al_dia(self, conn: sqlite3.Connection) -> bool:
+        """
+        Aplica lo anotado en Cambios_Referencias después de `ultimo`. Devuelve
+        False, sin tocar nada, si el registro ya se recortó más allá o pide
+        releer todo: hay que cargar de nuevo. Llamar dentro de una transacción
+        de lectura.
+        """
+        minimo, maximo = conn.execute(
+            "SELECT MIN(seq), MAX(seq) FROM Cambios_Referencias"
+        ).fetchone()
+        if maximo is None or maximo <= self.ultimo:
+            return True
+        if minimo > self.ultimo + 1:
+            return False
+        filas = set()
+        for (fila,) in conn.execute(
+            "SELECT fila FROM Cambios_Referencias WHERE seq > ? AND tabla = ?",
+            (self.ultimo, self.tabla),
+        ):
+            if fila is None:
+                return False
+            filas.add(fila)
+        filas = list(filas)
+        for i in range(0, len(filas), LOTE_FILAS):
+            lote = filas[i : i + LOTE_FILAS]
+            leidas = {
+                rowid: (clave, etiqueta)
+                for rowid, clave, etiqueta in conn.execute(
+                    f'SELECT rowid, "{self.clave}", "{self.etiqueta}" FROM "{self.tabla}" '
+                    f"WHERE rowid IN ({', '.join('?' * len(lote))})",
+                    lote,
+                )
+            }
+            for rowid in lote:
+                self._quitar(rowid)
+                if rowid in leidas:
+                    self._poner(rowid, *leidas[rowid])
+        self.ultimo = maximo
+        return True
+
+    def _quitar(self, rowid: int):
+        pos = self._por_fila.pop(rowid, None)
+        if pos is None:
+            return
+        clave = self._claves[pos]
+        for p in self._palabras_de(clave, self._etiquetas[pos]):
+            i = bisect_left(self._indice, (p, pos))
+            if i < len(self._indice) and self._indice[i] == (p, pos):
+                del self._indice[i]
+        if self._por_clave.get(clave) == pos:
+            del self._por_clave[clave]
+        self._claves[pos] = self._etiquetas[pos] = None
+
+    def _poner(self, rowid: int, clave, etiqueta):
+        pos = len(self._claves)
+        self._claves.append(clave)
+        self._etiquetas.append(etiqueta)
+        self._por_fila[rowid] = pos
+        self._por_clave[clave] = pos
+        for p in self._palabras_de(clave, etiqueta):
+            insort(self._indice, (p, pos))
+
+    def etiqueta_de(self, clave) -> str | None:
+        pos = self._por_clave.get(clave)
+        return None if pos is None else self._etiquetas[pos]
+
+    def buscar(self, texto: str, limite: int = MAX_SUGERENCIAS) -> list[tuple]:
+        """
+        (clave, etiqueta) de las filas cuya clave es `texto` o que tienen,
+        por cada palabra buscada, alguna palabra que empieza con ella.
+        """
+        resultado, vistos = [], set()
+        texto = texto.strip()
+        exacta = self._por_clave.get(int(texto) if texto.isdigit() else texto)
+        if exacta is None:
+            exacta = self._por_clave.get(texto)
+        if exacta is not None:
+            resultado.append((self._claves[exacta], self._etiquetas[exacta]))
+            vistos.add(exacta)
+        buscadas = palabras(texto)
+        if not buscadas:
+            return resultado
+        # Se recorre el índice con la palabra más larga (la más selectiva)
+        primera = max(buscadas, key=len)
+        resto = [p for p in buscadas if p != primera]
+        indice = self._indice
+        i = bisect_left(indice, (primera,))
+        while i < len(indice) and len(resultado) < limite:
+            palabra, pos = indice[i]
+            i += 1
+            if not palabra.startswith(primera):
+                break
+            if pos in vistos:
+                continue
+            vistos.add(pos)
+            if resto:
+                tiene = self._palabras_de(self._claves[pos], self._etiquetas[pos])
+                if not all(any(t.startswith(p) for t in tiene) for p in resto):
+                    continue
+            resultado.append((self._claves[pos], self._etiquetas[pos]))
+        return resultado
+
+    def __len__(self) -> int:
+        return len(self._por_fila)
+
+
+class Referencias:
+    """
+    Listas de referencias compartidas por todos los diálogos. Cada lista se
+    arma en un hilo aparte con su propia conexión, sin tomar el candado, y
+    entra con una sola asignación; mientras tanto se sigue usando la anterior
+    (o ninguna). Como database.CatalogoCache, revisa PRAGMA data_version en
+    su propia conexión, pero a lo más cada REVISAR_CADA segundos; solo si
+    cambió lee Cambios_Referencias. Segura entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._db_file = None
+        self._data_version = None
+        self._revisado = 0.0
+        self._listas: dict[str, ListaReferencia] = {}
+        self._cargando: dict[str, threading.Event] = {}
+
+    def _vigente(self):
+        # Llamar con _lock tomado
+        if self._conn is None or self._db_file != database.DB_FILE:
+            self.close()
+            self._conn = database.open_conn(origen=None)
+            self._conn.isolation_level = None  # solo lee; BEGIN explícito
+            self._db_file = database.DB_FILE
+        elif time.monotonic() - self._revisado < REVISAR_CADA:
+            return
+        self._revisado = time.monotonic()
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            for tabla, lista in self._listas.items():
+                if not lista.ponerse_al_dia(self._conn):
+                    self._cargar_en_hilo(tabla)
+        finally:
+            self._conn.execute("COMMIT")
+        self._data_version = version
+
+    def _cargar_en_hilo(self, tabla: str) -> threading.Event:
+        # Llamar con _lock tomado y después de _vigente(). El evento se
+        # activa cuando la lista ya entró o falló la carga (evento.error).
+        evento = self._cargando.get(tabla)
+        if evento is None:
+            evento = self._cargando[tabla] = threading.Event()
+            evento.error = None
+            threading.Thread(
+                target=self._cargar, args=(tabla, evento, self._db_file),
+                name=f"referencias:{tabla}", daemon=True,
+            ).start()
+        return evento
+
+    def _cargar(self, tabla: str, evento: threading.Event, db_file):
+        try:
+            lista = ListaReferencia(tabla, *database.REFERENCIADAS[tabla])
+            conn = database.open_conn(origen=None)
+            conn.isolation_level = None
+            try:
+                conn.execute("BEGIN")
+                try:
+                    lista.cargar(conn)
+                finally:
+                    conn.execute("COMMIT")
+            finally:
+                conn.close()
+            with self._lock:
+                if self._cargando.get(tabla) is evento:
+                    del self._cargando[tabla]
+                # Si entretanto se cerró o cambió la base, la lista ya no sirve
+                if self._conn is None or self._db_file != db_file:
+                    return
+                # Lo que se escribió mientras se cargaba
+                self._conn.execute("BEGIN")
+                try:
+                    al_dia = lista.ponerse_al_dia(self._conn)
+                finally:
+                    self._conn.execute("COMMIT")
+                self._listas[tabla] = lista
+                if not al_dia:
+                    self._cargar_en_hilo(tabla)
+        except Exception as e:
+            evento.error = e  # para quien espera (ver _consultar)
+            raise
+        finally:
+            with self._lock:
+                if self._cargando.get(tabla) is evento:
+                    del self._cargando[tabla]
+            evento.set()
+
+    def _consultar(self, tabla: str, esperar: bool, consulta):
+        """
+        consulta(lista) con el candado tomado. Sin esperar devuelve None si la
+        lista no está lista todavía (y la pide) o si alguien tiene el candado.
+        """
+        if tabla not in database.REFERENCIADAS:
+            return None
+        for _ in range(2):  # la segunda, ya con la carga terminada
+            if not self._lock.acquire(blocking=esperar):
+                return None
+            try:
+                self._vigente()
+                lista = self._listas.get(tabla)
+                if lista is not None:
+                    return consulta(lista)
+                evento = self._cargar_en_hilo(tabla)
+            finally:
+                self._lock.release()
+            if not esperar:
+                return None
+            evento.wait()
+            if evento.error is not None:
+                raise evento.error
+        return None
+
+    def buscar(
+        self, tabla: str, texto: str, limite: int = MAX_SUGERENCIAS, esperar: bool = True
+    ) -> list[tuple]:
+        return self._consultar(tabla, esperar, lambda lista: lista.buscar(texto, limite)) or []
+
+    def etiqueta(self, tabla: str, clave, esperar: bool = True) -> str | None:
+        return self._consultar(tabla, esperar, lambda lista: lista.etiqueta_de(clave))
+
+    def existe(self, tabla: str, clave) -> bool:
+        """
+        ¿Hay una fila de `tabla` con esa clave? Nunca espera a la carga: si la
+        lista no la tiene (o no está lista) pregunta a la base por esa sola
+        clave.
+        """
+        if self.etiqueta(tabla, clave, esperar=False) is not None:
+            return True
+        columna = database.REFERENCIADAS[tabla][0]
+        with database.sqlite_conn() as conn:
+            fila = conn.execute(
+                f'SELECT 1 FROM "{tabla}" WHERE "{columna}" = ?', (clave,)
+            ).fetchone()
+        return fila is not None
+
+    def precargar(self, tabla: str):
+        """Pide la lista en un hilo aparte para que el primer uso no espere."""
+        if tabla not in database.REFERENCIADAS:
+            return
+        with self._lock:
+            self._vigente()
+            if tabla not in self._listas:
+                self._cargar_en_hilo(tabla)
+
+    def close(self):
+        # Las cargas en curso ven la conexión cerrada y descartan su lista
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._data_version = None
+        self._revisado = 0.0
+        self._listas = {}
+
+
+referencias = Referencias()
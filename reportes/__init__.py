@@ -0,0 +1,23 @@
+# reportes
+# Reportes de ventas sin interfaz gráfica: carga columnar + NumPy.
+# Requisitos: pip install numpy
+# Ejecuta: python -m reportes <reporte> [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD]
+from reportes.datos import cargar_columnas, costos_compra, renglones_venta
+from reportes.analisis import (
+    clasificacion_abc,
+    heatmap,
+    margen_por_articulo,
+    por_articulo,
+    top_vendidos,
+)
+
+__all__ = [
+    "cargar_columnas",
+    "clasificacion_abc",
+    "costos_compra",
+    "heatmap",
+    "margen_por_articulo",
+    "por_articulo",
+    "renglones_venta",
+    "top_vendidos",
+]
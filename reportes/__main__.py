@@ -0,0 +1,82 @@
+# python -m reportes: reportes de ventas en consola o JSON, sin importar Qt.
+from __future__ import annotations
+import argparse
+import json
+import sys
+import time
+import database
+from reportes import (
+    clasificacion_abc,
+    costos_compra,
+    heatmap,
+    margen_por_articulo,
+    por_articulo,
+    renglones_venta,
+    top_vendidos,
+)
+
+REPORTES = ("top", "margen", "abc", "heatmap")
+
+
+def _tabla(filas: list[dict]):
+    if not filas:
+        print("(sin datos)")
+        return
+    cols = list(filas[0])
+    anchos = [max(len(c), *(len(str(f[c])) for f in filas)) for c in cols]
+    print("  ".join(c.rjust(a) for c, a in zip(cols, anchos)))
+    for f in filas:
+        print("  ".join(str(f[c]).rjust(a) for c, a in zip(cols, anchos)))
+
+
+def _imprimir_heatmap(h: dict):
+    print("      " + " ".join(f"{hr:>7d}" for hr in range(24)))
+    for dia, fila in zip(h["dias"], h["importe"]):
+        print(f"{dia:>5} " + " ".join(f"{v:>7.0f}" for v in fila))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m reportes", description="Reportes de ventas")
+    parser.add_argument("reporte", choices=REPORTES)
+    parser.add_argument("--desde", help="fecha inicial incluida (YYYY-MM-DD)")
+    parser.add_argument("--hasta", help="fecha final excluida (YYYY-MM-DD)")
+    parser.add_argument("-n", type=int, default=20, help="renglones a mostrar")
+    parser.add_argument("--por", choices=("importe", "unidades"), default="importe")
+    parser.add_argument("--utc-offset", type=int, default=0, help="horas para pasar a hora local")
+    parser.add_argument("--json", action="store_true", help="salida JSON")
+    parser.add_argument("--db", help=f"archivo SQLite (por omisión {database.DB_FILE})")
+    args = parser.parse_args(argv)
+
+    if args.db:
+        database.DB_FILE = args.db
+    t0 = time.perf_counter()
+    conn = database.open_conn()
+    try:
+        renglones = renglones_venta(conn, args.desde, args.hasta)
+        if args.reporte == "heatmap":
+            resultado = heatmap(renglones, args.utc_offset)
+        else:
+            agg = por_articulo(renglones)
+            if args.reporte == "top":
+                resultado = top_vendidos(agg, args.n, args.por)
+            elif args.reporte == "margen":
+                resultado = margen_por_articulo(agg, costos_compra(conn))[: args.n]
+            else:
+                resultado = clasificacion_abc(agg)
+    finally:
+        conn.close()
+    dt = time.perf_counter() - t0
+
+    if args.json:
+        json.dump(resultado, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.reporte == "heatmap":
+        _imprimir_heatmap(resultado)
+    else:
+        _tabla(resultado if args.reporte != "abc" else resultado[: args.n])
+    print(f"{len(renglones['ts'])} renglones en {dt:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# reportes/analisis.py
+# Cálculos vectorizados sobre las columnas de reportes.datos: nada de ciclos por renglón.
+from __future__ import annotations
+import numpy as np
+
+DIAS_SEMANA = ("Lun", "Mar", "Mié", "Jue", "Vie", "Sáb", "Dom")
+
+
+def _distintos_por_grupo(grupo: np.ndarray, folio: np.ndarray, n: int) -> np.ndarray:
+    """Cuántos folios distintos hay en cada uno de los `n` grupos."""
+    if len(grupo) == 0:
+        return np.zeros(n, dtype=np.int64)
+    clave = folio.astype(np.int64) * n + grupo
+    return np.bincount(np.unique(clave) % n, minlength=n)
+
+
+def por_articulo(renglones: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Agrega por artículo: codigo, unidades, importe y tickets (folios
+    distintos que lo incluyen).
+    """
+    idx = renglones["codigo"]
+    n = len(renglones["codigo_cat"])
+    cantidad = renglones["cantidad"]
+    unidades = np.bincount(idx, weights=cantidad, minlength=n).astype(np.int64)
+    importe = np.bincount(idx, weights=cantidad * renglones["precio"], minlength=n)
+    tickets = _distintos_por_grupo(idx, renglones["folio"], n)
+    codigos = renglones["codigo_cat"].astype(str)
+    return {"codigo": codigos, "unidades": unidades, "importe": importe, "tickets": tickets}
+
+
+def top_vendidos(agg: dict[str, np.ndarray], n: int = 10, por: str = "importe") -> list[dict]:
+    """Los `n` artículos con más `por` ("importe" o "unidades")."""
+    valores = agg[por]
+    k = min(n, len(valores))
+    if k == 0:
+        return []
+    top = np.argpartition(-valores, k - 1)[:k]
+    top = top[np.argsort(-valores[top], kind="stable")]
+    return [
+        {
+            "codigo": str(agg["codigo"][i]),
+            "unidades": int(agg["unidades"][i]),
+            "importe": round(float(agg["importe"][i]), 2),
+            "tickets": int(agg["tickets"][i]),
+        }
+        for i in top
+    ]
+
+
+def margen_por_articulo(
+    agg: dict[str, np.ndarray], costos: dict[str, np.ndarray]
+) -> list[dict]:
+    """
+    Margen por artículo: importe vendido contra unidades vendidas por su
+    costo promedio de compra. Sin compras registradas el costo queda en NaN.
+    """
+    costo = np.full(len(agg["codigo"]), np.nan)
+    if len(costos["codigo"]):
+        orden = np.argsort(costos["codigo"])
+        pos = np.searchsorted(costos["codigo"], agg["codigo"], sorter=orden)
+        pos = np.clip(pos, 0, len(orden) - 1)
+        encontrado = costos["codigo"][orden[pos]] == agg["codigo"]
+        costo[encontrado] = costos["costo"][orden[pos[encontrado]]]
+    costo_total = agg["unidades"] * costo
+    margen = agg["importe"] - costo_total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(agg["importe"] > 0, margen / agg["importe"] * 100, np.nan)
+    orden = np.argsort(-np.nan_to_num(margen, nan=-np.inf), kind="stable")
+    return [
+        {
+            "codigo": str(agg["codigo"][i]),
+            "importe": round(float(agg["importe"][i]), 2),
+            "costo": None if np.isnan(costo_total[i]) else round(float(costo_total[i]), 2),
+            "margen": None if np.isnan(margen[i]) else round(float(margen[i]), 2),
+            "margen_pct": None if np.isnan(pct[i]) else round(float(pct[i]), 1),
+        }
+        for i in orden
+    ]
+
+
+def clasificacion_abc(
+    agg: dict[str, np.ndarray], corte_a: float = 0.80, corte_b: float = 0.95
+) -> list[dict]:
+    """
+    Clasificación ABC por importe: A hasta el `corte_a` acumulado de las
+    ventas, B hasta `corte_b`, C el resto.
+    """
+    importe = agg["importe"]
+    total = importe.sum()
+    if total <= 0:
+        return []
+    orden = np.argsort(-importe, kind="stable")
+    acumulado = np.cumsum(importe[orden]) / total
+    # El artículo que cruza el corte pertenece a la clase de abajo del corte
+    previo = acumulado - importe[orden] / total
+    clase = np.where(previo < corte_a, "A", np.where(previo < corte_b, "B", "C"))
+    return [
+        {
+            "codigo": str(agg["codigo"][i]),
+            "importe": round(float(importe[i]), 2),
+            "acumulado_pct": round(float(acumulado[k]) * 100, 2),
+            "clase": str(clase[k]),
+        }
+        for k, i in enumerate(orden)
+    ]
+
+
+def heatmap(renglones: dict[str, np.ndarray], utc_offset_horas: int = 0) -> dict:
+    """
+    Importe por día de la semana (filas, lunes primero) y hora (24 columnas).
+    Las fechas se guardan en UTC; `utc_offset_horas` las pasa a hora local.
+    """
+    ts = renglones["ts"] + utc_offset_horas * 3600
+    hora = (ts // 3600) % 24
+    # 1970-01-01 fue jueves: +3 deja lunes = 0
+    dia = (ts // 86400 + 3) % 7
+    importe = renglones["cantidad"] * renglones["precio"]
+    celda = dia * 24 + hora
+    importes = np.bincount(celda, weights=importe, minlength=7 * 24)
+    tickets = _distintos_por_grupo(celda, renglones["folio"], 7 * 24)
+    return {
+        "dias": list(DIAS_SEMANA),
+        "importe": np.round(importes.reshape(7, 24), 2).tolist(),
+        "tickets": tickets.reshape(7, 24).tolist(),
+    }
@@ -0,0 +1,101 @@
+# reportes/datos.py
+# Carga columnar desde SQLite: un arreglo NumPy por columna, sin tuplas por fila.
+from __future__ import annotations
+import sqlite3
+import numpy as np
+
+# Filas por viaje a SQLite; cada bloque se convierte a arreglos y se descarta
+CHUNK_ROWS = 100_000
+
+
+def cargar_columnas(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: tuple | dict = (),
+    dtypes: dict[str, str] | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Ejecuta `sql` y devuelve {columna: arreglo}. `dtypes` fija el tipo NumPy
+    por nombre de columna ("i8", "f8"...); las demás quedan object. Con
+    "cat" la columna se codifica como enteros y sus valores distintos quedan
+    en "<columna>_cat" (más rápido y compacto que arreglos de texto).
+    """
+    dtypes = dtypes or {}
+    cur = conn.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    partes: dict[str, list[np.ndarray]] = {n: [] for n in names}
+    categorias: dict[str, dict] = {n: {} for n in names if dtypes.get(n) == "cat"}
+    while True:
+        rows = cur.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        for name, col in zip(names, zip(*rows)):
+            if name in categorias:
+                cats = categorias[name]
+                codes = [cats.setdefault(v, len(cats)) for v in col]
+                partes[name].append(np.array(codes, dtype=np.int32))
+            else:
+                partes[name].append(np.array(col, dtype=dtypes.get(name, object)))
+
+    result = {}
+    for name, chunks in partes.items():
+        dtype = np.int32 if name in categorias else dtypes.get(name, object)
+        result[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        if name in categorias:
+            result[f"{name}_cat"] = np.array(list(categorias[name]), dtype=object)
+    return result
+
+
+def renglones_venta(
+    conn: sqlite3.Connection, desde: str | None = None, hasta: str | None = None
+) -> dict[str, np.ndarray]:
+    """
+    Renglones de venta con fecha del ticket en [desde, hasta):
+    ts (segundos Unix), folio, codigo (categoría, ver cargar_columnas),
+    cantidad, precio. La fecha se convierte una vez por ticket, no por renglón.
+    """
+    where, params = [], []
+    if desde:
+        where.append("v.fecha >= ?")
+        params.append(desde)
+    if hasta:
+        where.append("v.fecha < ?")
+        params.append(hasta)
+    filtro = (" WHERE " + " AND ".join(where)) if where else ""
+
+    ventas = cargar_columnas(
+        conn,
+        "SELECT v.folio AS folio, CAST(strftime('%s', v.fecha) AS INTEGER) AS ts "
+        f"FROM Ventas v{filtro} ORDER BY v.folio",
+        tuple(params),
+        {"folio": "i8", "ts": "i8"},
+    )
+    renglones = cargar_columnas(
+        conn,
+        """
+        SELECT d.folio_venta AS folio, d.codigo_articulo AS codigo,
+               d.cantidad AS cantidad, d.precio_unitario AS precio
+        FROM Ventas v JOIN Detalle_Venta d ON d.folio_venta = v.folio
+        """
+        + filtro,
+        tuple(params),
+        {"folio": "i8", "codigo": "cat", "cantidad": "i8", "precio": "f8"},
+    )
+    pos = np.searchsorted(ventas["folio"], renglones["folio"])
+    renglones["ts"] = ventas["ts"][pos] if len(pos) else np.empty(0, dtype=np.int64)
+    return renglones
+
+
+def costos_compra(conn: sqlite3.Connection) -> dict[str, np.ndarray]:
+    """Costo promedio ponderado de compra por artículo: codigo, costo."""
+    return cargar_columnas(
+        conn,
+        """
+        SELECT codigo_articulo AS codigo,
+               SUM(cantidad * costo_unitario) / SUM(cantidad) AS costo
+        FROM Detalle_Compra
+        WHERE cantidad > 0
+        GROUP BY codigo_articulo
+        """,
+        dtypes={"codigo": "U20", "costo": "f8"},
+    )
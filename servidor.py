@@ -0,0 +1,419 @@
+# servidor.py
+# Servicio HTTP local (JSON) para que varias cajas compartan una sola BD. Un
+# solo proceso es dueño de farmacia.db: las escrituras van a la cola de
+# escritura.py (un solo escritor, commit agrupado: sin "database is locked"
+# entre cajas) y las lecturas a un grupo de hilos con conexión propia (WAL:
+# no esperan al escritor). Solo biblioteca estándar: asyncio + un HTTP/1.1 mínimo con
+# keep-alive.
+# Ejecuta: python servidor.py [--db ruta] [--host 127.0.0.1] [--puerto 8765]
+#
+#   POST   /sesion                      {"correo", "password"} -> {"token", ...}
+#   DELETE /sesion
+#   GET    /articulos?q=texto&limite=50 búsqueda (FTS) con precio y existencia
+#   GET    /articulos/<codigo>
+#   GET    /existencias/<codigo>[?fecha=YYYY-MM-DD]
+#   POST   /ventas                      {"cliente_id", "lineas": [[codigo, cantidad], ...]}
+#   POST   /compras                     {"lineas": [[codigo, cantidad, costo], ...], "fecha"?}
+#   GET    /reportes/ventas-diarias?desde=&hasta=
+#   GET    /reportes/top-articulos?desde=&hasta=&n=10
+#
+# Todo salvo POST /sesion pide "Authorization: Bearer <token>".
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import secrets
+import sqlite3
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+import database
+from auth import Sesion, auth
+from database import (
+    catalogo,
+    existencia_al,
+    open_conn,
+    search_query,
+    top_articulos,
+    ventas_diarias,
+)
+from escritura import ColaEscritura
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+LECTORES = 4
+# Topes de una petición
+MAX_ENCABEZADOS = 16 * 1024
+MAX_CUERPO = 1024 * 1024
+LIMITE_BUSQUEDA = 50
+
+_RAZONES = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, status: int, mensaje: str):
+        super().__init__(mensaje)
+        self.status = status
+
+
+# ---------- Acceso a la BD ----------
+class Lectores:
+    """Hilos de solo lectura, cada uno con su conexión (se abre al primer uso)."""
+
+    def __init__(self, n: int = LECTORES):
+        self._hilos = ThreadPoolExecutor(max_workers=n, thread_name_prefix="lector")
+        self._local = threading.local()
+        self._conexiones: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    async def ejecutar(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._hilos, self._correr, fn, args
+        )
+
+    def _correr(self, fn: Callable, args: tuple):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = open_conn("servidor")
+            with self._lock:
+                self._conexiones.append(conn)
+        try:
+            return fn(conn, *args)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+
+    async def cerrar(self):
+        self._hilos.shutdown()
+        with self._lock:
+            for conn in self._conexiones:
+                conn.close()
+            self._conexiones.clear()
+
+
+# ---------- Operaciones ----------
+def _buscar_articulos(conn: sqlite3.Connection, texto: str, limite: int) -> list[dict]:
+    query = search_query("Articulos", texto, ["codigo", "descripcion"], limit=limite)
+    if query is None:
+        return []
+    sql, params = query
+    rows = conn.execute(
+        f"""
+        SELECT a.codigo, a.descripcion, a.precio, a.en_promocion, COALESCE(s.existencia, 0)
+        FROM ({sql}) f
+        JOIN Articulos a ON a.rowid = f.rowid
+        LEFT JOIN Almacen s ON s.codigo_articulo = a.codigo
+        """,
+        params,
+    ).fetchall()
+    return [
+        {"codigo": c, "descripcion": d, "precio": p, "en_promocion": bool(e), "existencia": x}
+        for c, d, p, e, x in rows
+    ]
+
+
+def _articulo(codigo: str) -> dict:
+    datos = catalogo.articulo(codigo)
+    if datos is None:
+        raise ErrorHTTP(404, f"No existe el artículo {codigo}.")
+    descripcion, precio, promocion, existencia = datos
+    return {
+        "codigo": codigo,
+        "descripcion": descripcion,
+        "precio": precio,
+        "en_promocion": promocion,
+        "existencia": existencia,
+    }
+
+
+def _lineas(cuerpo: dict, campos: int = 2) -> list[tuple]:
+    # [codigo, cantidad] (ventas) o [codigo, cantidad, costo] (compras)
+    lineas = cuerpo.get("lineas")
+    if not isinstance(lineas, list) or not lineas:
+        raise ValueError("lineas debe ser una lista de renglones.")
+    resultado = []
+    for linea in lineas:
+        if isinstance(linea, dict):
+            linea = tuple(linea.get(k) for k in ("codigo", "cantidad", "costo")[:campos])
+        if not isinstance(linea, (list, tuple)) or len(linea) != campos:
+            raise ValueError(f"Renglón inválido: {linea!r}.")
+        codigo, cantidad, *resto = linea
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool):
+            raise ValueError(f"Cantidad inválida para {codigo}: {cantidad!r}.")
+        resultado.append((str(codigo), cantidad, *resto))
+    return resultado
+
+
+def _entero(valor, campo: str) -> int:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"{campo} debe ser entero.") from None
+
+
+# ---------- Servidor ----------
+class Servidor:
+    def __init__(self, lectores: int = LECTORES):
+        self.escritor = ColaEscritura()
+        self.lectores = Lectores(lectores)
+        self.sesiones: dict[str, Sesion] = {}
+        self._server: asyncio.AbstractServer | None = None
+        self._rutas = {
+            ("POST", "sesion"): self.iniciar_sesion,
+            ("DELETE", "sesion"): self.cerrar_sesion,
+            ("GET", "articulos"): self.articulos,
+            ("GET", "existencias"): self.existencia,
+            ("POST", "ventas"): self.venta,
+            ("POST", "compras"): self.compra,
+            ("GET", "reportes"): self.reporte,
+        }
+
+    async def iniciar(self, host: str = HOST, puerto: int = PUERTO) -> int:
+        """Abre el puerto (0 = uno libre) y devuelve el que quedó."""
+        # Esquema al día (y datos de ejemplo si el archivo es nuevo)
+        await asyncio.get_running_loop().run_in_executor(None, database.init_sqlite_file)
+        self._server = await asyncio.start_server(
+            self._atender, host, puerto, limit=MAX_ENCABEZADOS
+        )
+        return self._server.sockets[0].getsockname()[1]
+
+    async def cerrar(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        # Lo que ya estaba en cola se confirma antes de salir
+        await asyncio.get_running_loop().run_in_executor(None, self.escritor.close)
+        await self.lectores.cerrar()
+
+    # -------- HTTP --------
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    cabeza = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    return  # el cliente cerró entre peticiones
+                except asyncio.LimitOverrunError:
+                    await self._responder(
+                        writer, 413, {"error": "Encabezados demasiado grandes."}, False
+                    )
+                    return
+                linea, *encabezados = cabeza.decode("latin-1").split("\r\n")
+                try:
+                    metodo, destino, version = linea.split(" ", 2)
+                except ValueError:
+                    await self._responder(writer, 400, {"error": "Petición inválida."}, False)
+                    return
+                campos = {}
+                for e in encabezados:
+                    nombre, _, valor = e.partition(":")
+                    if nombre:
+                        campos[nombre.strip().lower()] = valor.strip()
+                seguir = (
+                    version == "HTTP/1.1" and campos.get("connection", "").lower() != "close"
+                )
+                # Solo dígitos: int() aceptaría "-1", "+5" o "1_000"
+                largo = campos.get("content-length") or "0"
+                if not (largo.isascii() and largo.isdigit()):
+                    await self._responder(
+                        writer, 400, {"error": "Content-Length inválido."}, False
+                    )
+                    return
+                largo = int(largo)
+                if largo > MAX_CUERPO:
+                    await self._responder(writer, 413, {"error": "Cuerpo demasiado grande."}, False)
+                    return
+                cuerpo = await reader.readexactly(largo) if largo else b""
+                status, datos = await self._despachar(metodo, destino, campos, cuerpo)
+                await self._responder(writer, status, datos, seguir)
+                if not seguir:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, writer, status: int, datos, seguir: bool):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {_RAZONES.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(cuerpo)}\r\n"
+                f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + cuerpo
+        )
+        await writer.drain()
+
+    async def _despachar(self, metodo: str, destino: str, campos: dict, cuerpo: bytes):
+        url = urlsplit(destino)
+        partes = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        recurso = partes[0] if partes else ""
+        manejador = self._rutas.get((metodo, recurso))
+        if manejador is None:
+            if any(r == recurso for _m, r in self._rutas):
+                return 405, {"error": "Método no permitido."}
+            return 404, {"error": "Ruta desconocida."}
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+            if not isinstance(datos, dict):
+                raise ValueError("El cuerpo debe ser un objeto JSON.")
+            sesion = None
+            if manejador != self.iniciar_sesion:
+                sesion = self._sesion(campos)
+            return 200, await manejador(partes[1:], query, datos, sesion)
+        except ErrorHTTP as e:
+            return e.status, {"error": str(e)}
+        except ValueError as e:  # incluye JSON inválido
+            return 400, {"error": str(e)}
+        except sqlite3.IntegrityError as e:
+            return 409, {"error": str(e)}
+        except Exception as e:
+            print(f"[servidor] {metodo} {destino}: {e!r}", file=sys.stderr)
+            return 500, {"error": "Error interno."}
+
+    def _sesion(self, campos: dict) -> Sesion:
+        tipo, _, token = campos.get("authorization", "").partition(" ")
+        sesion = self.sesiones.get(token) if tipo.lower() == "bearer" else None
+        if sesion is None:
+            raise ErrorHTTP(401, "Inicia sesión (POST /sesion).")
+        return sesion
+
+    # -------- Rutas --------
+    async def iniciar_sesion(self, _partes, _query, datos, _sesion):
+        correo, password = datos.get("correo"), datos.get("password")
+        if not isinstance(correo, str) or not isinstance(password, str):
+            raise ValueError("Se requieren correo y password.")
+        # PBKDF2 suelta el GIL: en un lector no detiene al bucle
+        usuario_id = await self.lectores.ejecutar(
+            lambda _conn: auth.autenticar(correo, password)
+        )
+        sesion = None
+        if usuario_id is not None:
+            sesion = await self.lectores.ejecutar(lambda _conn: auth.sesion(usuario_id))
+        if sesion is None:
+            raise ErrorHTTP(401, "Correo o contraseña incorrectos.")
+        token = secrets.token_urlsafe(24)
+        self.sesiones[token] = sesion
+        return {
+            "token": token,
+            "usuario_id": sesion.usuario_id,
+            "nombre": sesion.nombre,
+            "rol": sesion.rol,
+        }
+
+    async def cerrar_sesion(self, _partes, _query, _datos, sesion):
+        for token, s in list(self.sesiones.items()):
+            if s is sesion:
+                del self.sesiones[token]
+        return {}
+
+    async def articulos(self, partes, query, _datos, _sesion):
+        if partes:
+            # La caché del catálogo es segura entre hilos y casi nunca lee la BD
+            return await self.lectores.ejecutar(lambda _conn: _articulo(partes[0]))
+        limite = _entero(query.get("limite", LIMITE_BUSQUEDA), "limite")
+        limite = max(1, min(limite, database.SEARCH_LIMIT))
+        texto = query.get("q", "")
+        return {"articulos": await self.lectores.ejecutar(_buscar_articulos, texto, limite)}
+
+    async def existencia(self, partes, query, _datos, _sesion):
+        if len(partes) != 1:
+            raise ErrorHTTP(404, "Uso: /existencias/<codigo>.")
+        codigo, fecha = partes[0], query.get("fecha")
+        if fecha:
+            valor = await self.lectores.ejecutar(existencia_al, codigo, fecha)
+        else:
+            valor = await self.lectores.ejecutar(lambda _conn: catalogo.existencia(codigo))
+            if valor is None:
+                raise ErrorHTTP(404, f"No existe el artículo {codigo}.")
+        return {"codigo": codigo, "existencia": valor, "fecha": fecha}
+
+    async def venta(self, _partes, _query, datos, sesion):
+        cliente_id = _entero(datos.get("cliente_id"), "cliente_id")
+        lineas = _lineas(datos)
+        folio = await self._escribir(
+            database._insertar_venta, cliente_id, sesion.usuario_id, lineas
+        )
+        return {"folio": folio}
+
+    async def compra(self, _partes, _query, datos, _sesion):
+        lineas = _lineas(datos, 3)
+        for codigo, cantidad, costo in lineas:
+            if not isinstance(costo, (int, float)) or isinstance(costo, bool):
+                raise ValueError(f"Costo inválido para {codigo}: {costo!r}.")
+        fecha = datos.get("fecha")
+        if fecha is not None and not isinstance(fecha, str):
+            raise ValueError("fecha debe ser texto (YYYY-MM-DD HH:MM:SS).")
+        lineas = [(c, q, round(float(k), 2)) for c, q, k in lineas]
+        compra_id = await self._escribir(database._insertar_compra, lineas, fecha)
+        return {"compra_id": compra_id}
+
+    async def _escribir(self, fn, *args):
+        return await asyncio.wrap_future(self.escritor.enviar(fn, *args))
+
+    async def reporte(self, partes, query, _datos, _sesion):
+        desde, hasta = query.get("desde", "0000-01-01"), query.get("hasta", "9999-12-31")
+        if partes == ["ventas-diarias"]:
+            filas = await self.lectores.ejecutar(ventas_diarias, desde, hasta)
+            return {
+                "dias": [{"dia": d, "unidades": u, "importe": i} for d, u, i in filas]
+            }
+        if partes == ["top-articulos"]:
+            n = min(_entero(query.get("n", 10), "n"), 1000)
+            filas = await self.lectores.ejecutar(top_articulos, desde, hasta, n)
+            return {
+                "articulos": [
+                    {"codigo": c, "unidades": u, "importe": i, "tickets": t}
+                    for c, u, i, t in filas
+                ]
+            }
+        raise ErrorHTTP(404, "Reportes: ventas-diarias, top-articulos.")
+
+
+async def servir(host: str = HOST, puerto: int = PUERTO, lectores: int = LECTORES):
+    servidor = Servidor(lectores)
+    puerto = await servidor.iniciar(host, puerto)
+    # La primera línea la lee benchmarks.carga para saber el puerto
+    print(f"Escuchando en http://{host}:{puerto}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.cerrar()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de la farmacia")
+    parser.add_argument("--db", help=f"archivo SQLite (por omisión {database.DB_FILE})")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO, help="0 = uno libre")
+    parser.add_argument("--lectores", type=int, default=LECTORES, help="hilos de lectura")
+    args = parser.parse_args(argv)
+    if args.db:
+        database.DB_FILE = args.db
+    try:
+        asyncio.run(servir(args.host, args.puerto, args.lectores))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        auth.close()
+        catalogo.close()
+        database.pool.close_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,23 +1,44 @@
 from __future__ import annotations
-from PySide6.QtCore import Qt, QDate, Signal, QRegularExpression, QRect, QEvent
+import sqlite3
+import time
+from PySide6.QtCore import (
+    Qt, QDate, QDateTime, QTime, QLocale, Signal, QRegularExpression, QRect, QEvent, QTimer,
+    QStringListModel,
+)
 from PySide6.QtGui import QRegularExpressionValidator, QIntValidator, QDoubleValidator
-from PySide6.QtSql import QSqlTableModel
 from PySide6.QtWidgets import (
+    QCheckBox,
+    QCompleter,
     QDialog,
+    QDialogButtonBox,
+    QFileDialog,
+    QFormLayout,
     QHBoxLayout,
     QLabel,
     QLineEdit,
     QMessageBox,
+    QProgressDialog,
     QPushButton,
     QTableView,
     QVBoxLayout,
     QStyledItemDelegate,
     QDateEdit,
+    QDateTimeEdit,
     QStyleOptionButton,
     QApplication,
     QStyle,
 )
-from database import _hash_password
+from diagnostico import ediciones
+from database import (
+    Columna, esquema, hash_password, FTS_TABLES, REFERENCIADAS, search_query, sqlite_conn,
+)
+from exportacion import FILTRO_FECHAS, exportar_tabla
+from referencias import referencias
+from views.KeysetTableModel import KeysetTableModel
+from views.SearchPipeline import SearchPipeline
+
+# Espera tras la última tecla antes de lanzar la búsqueda
+FILTER_DEBOUNCE_MS = 200
 
 # ---------------- Delegates ----------------
 
@@ -80,7 +101,7 @@ class BoolDelegate(QStyledItemDelegate):
 
 
 class PasswordDelegate(QStyledItemDelegate):
-    """Muestra **** y, al editar, toma texto plano y guarda sha256 en el modelo."""
+    """Muestra **** y, al editar, toma texto plano y guarda su hash PBKDF2 en el modelo."""
 
     def createEditor(self, parent, option, index):
         edit = QLineEdit(parent)
@@ -96,7 +117,7 @@ class PasswordDelegate(QStyledItemDelegate):
         if not pwd:
             # Si el usuario no escribió nada, no tocamos el hash existente
             return
-        model.setData(index, _hash_password(pwd))
+        model.setData(index, hash_password(pwd))
 
     def displayText(self, value, locale):
         # En modo display siempre se ve **** si hay algo, o vacío si no hay hash
@@ -107,7 +128,8 @@ class SmartDelegate(QStyledItemDelegate):
     """
     Delegate genérico:
     - Emite señales al iniciar/terminar edición.
-    - Crea editores específicos por tipo de columna (fechas, enteros, reales, texto).
+    - Crea el editor según los metadatos del esquema (database.esquema):
+      fechas, enteros, decimales y texto con sus límites, largos y NOT NULL.
     - Valida antes de escribir en el modelo.
     """
 
@@ -119,90 +141,86 @@ class SmartDelegate(QStyledItemDelegate):
         self.table_name = table_name
         # función para mapear índice->nombre de columna
         self.header_lookup = header_lookup or (lambda col: "")
+        # Metadatos leídos una vez; cada edición solo consulta el dict
+        self.meta = esquema.tabla(table_name) if table_name else None
 
     # -------- helpers de tipo/validación --------
     def _colname(self, index) -> str:
         return self.header_lookup(index.column())
 
-    def _is_date_col(self, colname: str) -> bool:
-        return "fecha" in colname.lower()
-
-    def _is_fk_or_id(self, colname: str) -> bool:
-        # id, cliente_id, idUsuario, idVehiculo, etc.
-        cn = colname.lower()
-        return cn == "id" or cn.startswith("id")
-
-    def _is_int_nonneg(self, colname: str) -> bool:
-        return colname in {"stock", "numero_piezas", "cantidad"} or self._is_fk_or_id(
-            colname
-        )
-
-    def _is_real_nonneg(self, colname: str) -> bool:
-        return colname == "precio"
+    def _columna(self, index) -> Columna | None:
+        return self.meta.columna(self._colname(index)) if self.meta else None
 
     def _needs_email_validator(self, colname: str) -> bool:
         return colname.lower() in {"email", "correo"}
 
-    def _needs_name_validator(self, colname: str) -> bool:
-        return colname.lower() in {"nombre", "marca", "modelo"}
-
     # -------- fábrica de editores --------
     def createEditor(self, parent, option, index):
         self.editingStarted.emit(index)
-        colname = self._colname(index)
+        col = self._columna(index)
+        clase = col.clase if col else "texto"
 
-        if self._is_date_col(colname):
+        if clase == "fecha":
             d = QDateEdit(parent)
             d.setCalendarPopup(True)
             d.setDisplayFormat("yyyy-MM-dd")
             return d
 
-        # Numéricos
-        if self._is_int_nonneg(colname):
-            edit = QLineEdit(parent)
-            v = QIntValidator(0, 2_147_483_647, edit)
-            edit.setValidator(v)
-            return edit
+        if clase == "fechahora":
+            d = QDateTimeEdit(parent)
+            d.setCalendarPopup(True)
+            d.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+            return d
 
-        if self._is_real_nonneg(colname):
-            edit = QLineEdit(parent)
-            v = QDoubleValidator(0.0, 1e12, 4, edit)
+        edit = QLineEdit(parent)
+        # Numéricos: el validador solo deja teclear dígitos; los límites del
+        # CHECK se revisan en setModelData con Columna.convertir
+        if clase == "entero":
+            signo = "" if col.minimo is not None and col.minimo >= 0 else "-?"
+            rx = QRegularExpression(rf"^{signo}\d*$")
+            edit.setValidator(QRegularExpressionValidator(rx, edit))
+        elif clase == "decimal":
+            v = QDoubleValidator(edit)
             v.setNotation(QDoubleValidator.StandardNotation)
+            v.setLocale(QLocale.c())
+            if col.decimales is not None:
+                v.setDecimals(col.decimales)
+            if col.minimo is not None and col.minimo >= 0:
+                v.setBottom(0.0)
             edit.setValidator(v)
-            return edit
-
         # Texto con validadores suaves
-        edit = QLineEdit(parent)
-        if self._needs_email_validator(colname):
+        elif self._needs_email_validator(col.nombre if col else ""):
             rx = QRegularExpression(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
             edit.setValidator(QRegularExpressionValidator(rx, edit))
-        elif self._needs_name_validator(colname):
+        elif col is not None and col.not_null:
             rx = QRegularExpression(r"^\S.*$")
             edit.setValidator(QRegularExpressionValidator(rx, edit))
+        if col is not None and col.largo:
+            edit.setMaxLength(col.largo)
         return edit
 
     def setEditorData(self, editor, index):
-        # colname = self._colname(index)
-
-        if isinstance(editor, QDateEdit):
-            raw = index.data(Qt.EditRole) or index.data(Qt.DisplayRole)
-            # raw puede ser "YYYY-MM-DD" o vacío
-            qd = QDate.fromString(str(raw) if raw else "", "yyyy-MM-dd")
-            if not qd.isValid():
-                qd = QDate.currentDate()
-            editor.setDate(qd)
+        raw = index.data(Qt.EditRole)
+
+        if isinstance(editor, QDateTimeEdit):
+            # QDateEdit también es QDateTimeEdit; acepta "YYYY-MM-DD[ HH:MM:SS]"
+            text = str(raw) if raw else ""
+            dt = QDateTime.fromString(text[:19], "yyyy-MM-dd HH:mm:ss")
+            if not dt.isValid():
+                dt = QDateTime(QDate.fromString(text[:10], "yyyy-MM-dd"), QTime(0, 0))
+            if not dt.isValid():
+                dt = QDateTime.currentDateTime()
+            editor.setDateTime(dt)
             return
 
         # Para QLineEdit: carga texto sin None
-        editor.setText(
-            "" if index.data(Qt.EditRole) is None else str(index.data(Qt.EditRole))
-        )
+        editor.setText("" if raw is None else str(raw))
 
     def setModelData(self, editor, model, index):
         colname = self._colname(index)
 
         # Fecha: no futura y coherencia en reparaciones (entrada <= salida)
-        if isinstance(editor, QDateEdit):
+        if isinstance(editor, QDateTimeEdit):
             date = editor.date()
             if not date.isValid() or date > QDate.currentDate().addDays(1):
                 QMessageBox.warning(
@@ -217,10 +235,9 @@ class SmartDelegate(QStyledItemDelegate):
             if self.table_name == "reparaciones":
                 # revisa la otra fecha si existe
                 row = index.row()
-                model_rec = model.record(row)
 
                 def get_date_str(fname: str):
-                    fidx = model_rec.indexOf(fname)
+                    fidx = model.column_index(fname)
                     if fidx == -1:
                         return ""
                     return str(model.data(model.index(row, fidx), Qt.EditRole) or "")
@@ -248,7 +265,11 @@ class SmartDelegate(QStyledItemDelegate):
                         self.editingFinished.emit(index, False)
                         return
 
-            model.setData(index, date.toString("yyyy-MM-dd"), Qt.EditRole)
+            if isinstance(editor, QDateEdit):
+                value = date.toString("yyyy-MM-dd")
+            else:
+                value = editor.dateTime().toString("yyyy-MM-dd HH:mm:ss")
+            model.setData(index, value, Qt.EditRole)
             self.editingFinished.emit(index, True)
             return
 
@@ -267,17 +288,18 @@ class SmartDelegate(QStyledItemDelegate):
                     )
                     self.editingFinished.emit(index, False)
                     return
-            # Para int/real, si está vacío y es requerido, bloquea
-            if self._is_int_nonneg(colname) or self._is_real_nonneg(colname):
-                txt = editor.text().strip()
-                if txt == "":
-                    QMessageBox.warning(
-                        editor, "Campo requerido", f"{colname} no puede estar vacío."
-                    )
+            # Tipo, NOT NULL, largo y límites del CHECK según el esquema
+            col = self._columna(index)
+            value = editor.text()
+            if col is not None:
+                try:
+                    value = col.convertir(value)
+                except ValueError as e:
+                    QMessageBox.warning(editor, "Valor inválido", str(e))
                     self.editingFinished.emit(index, False)
                     return
 
-            model.setData(index, editor.text(), Qt.EditRole)
+            model.setData(index, value, Qt.EditRole)
             self.editingFinished.emit(index, True)
             return
 
@@ -286,6 +308,64 @@ class SmartDelegate(QStyledItemDelegate):
     #     editor.setGeometry(option.rect)
 
 
+class ReferenciaDelegate(SmartDelegate):
+    """
+    Columna con llave foránea a una tabla de REFERENCIADAS: muestra
+    "clave — etiqueta" (nombre del cliente, descripción del artículo) y
+    edita con un completador que busca en referencias por prefijos de
+    palabras o por la clave. Rechaza claves que no existen.
+    """
+
+    SEPARADOR = " — "
+
+    def __init__(self, parent=None, table_name: str = "", header_lookup=None, destino: str = ""):
+        super().__init__(parent, table_name, header_lookup)
+        self.destino = destino
+
+    def displayText(self, value, locale):
+        if value is None or value == "":
+            return ""
+        # Se pinta por cada celda: sin esperar, mientras carga se ve la clave
+        etiqueta = referencias.etiqueta(self.destino, value, esperar=False)
+        return f"{value}{self.SEPARADOR}{etiqueta}" if etiqueta else str(value)
+
+    def createEditor(self, parent, option, index):
+        self.editingStarted.emit(index)
+        edit = QLineEdit(parent)
+        sugerencias = QStringListModel(edit)
+        completer = QCompleter(sugerencias, edit)
+        # Las sugerencias ya vienen filtradas (y sin acentos de por medio)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        completer.setMaxVisibleItems(12)
+        edit.setCompleter(completer)
+
+        def buscar(texto: str):
+            # Sin esperar: si la lista aún se carga, todavía no hay sugerencias
+            encontradas = referencias.buscar(self.destino, texto, esperar=False)
+            sugerencias.setStringList([f"{c}{self.SEPARADOR}{e}" for c, e in encontradas])
+            if sugerencias.rowCount():
+                completer.complete()
+
+        edit.textEdited.connect(buscar)
+        return edit
+
+    def setModelData(self, editor, model, index):
+        col = self._columna(index)
+        try:
+            value = editor.text().split(self.SEPARADOR, 1)[0]
+            if col is not None:
+                value = col.convertir(value)
+            # Sin esperar a que cargue la lista (estamos en el hilo de la UI)
+            if value is not None and not referencias.existe(self.destino, value):
+                raise ValueError(f"No existe en {self.destino}: {value}.")
+        except (ValueError, sqlite3.Error) as e:
+            QMessageBox.warning(editor, "Valor inválido", str(e))
+            self.editingFinished.emit(index, False)
+            return
+        model.setData(index, value, Qt.EditRole)
+        self.editingFinished.emit(index, True)
+
+
 # ---------------- Dialog ----------------
 
 
@@ -301,9 +381,7 @@ class CrudDialog(QDialog):
         self.setWindowTitle(title)
         self.resize(800, 480)
         self.table = table
-        self.model = QSqlTableModel(self)
-        self.model.setTable(table)
-        self.model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+        self.model = KeysetTableModel(table, self)
         self.model.select()
 
         self.view = QTableView()
@@ -319,13 +397,29 @@ class CrudDialog(QDialog):
         self.view.setItemDelegate(smart)
 
         # Tap para saber cuándo inicia/termina edición
+        self._edit_started: dict[tuple[int, int], float] = {}
         smart.editingStarted.connect(self._on_edit_start)
         smart.editingFinished.connect(self._on_edit_finish)
 
-        if table == "Articulos":
-            col = self._column_index("en_promocion")
-            if col != -1:
-                self.view.setItemDelegateForColumn(col, BoolDelegate(self.view))
+        # Casilla para toda columna BOOLEAN; lista de referencias para las FK
+        if smart.meta is not None:
+            for col in smart.meta.columnas.values():
+                idx = self._column_index(col.nombre)
+                if idx == -1:
+                    continue
+                if col.clase == "booleano":
+                    self.view.setItemDelegateForColumn(idx, BoolDelegate(self.view))
+                elif col.referencia and col.referencia[0] in REFERENCIADAS:
+                    ref = ReferenciaDelegate(
+                        self.view,
+                        table_name=self.table,
+                        header_lookup=self._column_name_by_index,
+                        destino=col.referencia[0],
+                    )
+                    ref.editingStarted.connect(self._on_edit_start)
+                    ref.editingFinished.connect(self._on_edit_finish)
+                    self.view.setItemDelegateForColumn(idx, ref)
+                    referencias.precargar(col.referencia[0])
 
         # Delegate específico para password_hash si aplica
         if table == "Usuarios":
@@ -339,21 +433,38 @@ class CrudDialog(QDialog):
 
         # Filtro rápido
         self.filter_edit = QLineEdit()
-        self.filter_edit.setPlaceholderText(
-            "Filtrar (SQL LIKE sobre todas las columnas visibles)..."
+        if table in FTS_TABLES:
+            self.filter_edit.setPlaceholderText(
+                f"Buscar por {', '.join(FTS_TABLES[table])} (prefijos)..."
+            )
+        else:
+            self.filter_edit.setPlaceholderText(
+                "Filtrar (SQL LIKE sobre todas las columnas visibles)..."
+            )
+        # Búsqueda en segundo plano con espera tras la última tecla
+        self.search = SearchPipeline(self)
+        self.search.results.connect(self._on_search_results)
+        self.finished.connect(self._on_finished)
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(
+            lambda: self.apply_filter(self.filter_edit.text())
         )
-        self.filter_edit.textChanged.connect(self.apply_filter)
+        self.filter_edit.textChanged.connect(self._on_filter_text)
 
         # Botones
         self.btn_add = QPushButton("Nuevo")
         self.btn_del = QPushButton("Eliminar")
         self.btn_save = QPushButton("Guardar")
         self.btn_revert = QPushButton("Revertir")
+        self.btn_export = QPushButton("Exportar...")
 
         self.btn_add.clicked.connect(self.add_row)
         self.btn_del.clicked.connect(self.del_row)
         self.btn_save.clicked.connect(self.save_changes)
         self.btn_revert.clicked.connect(self.model.revertAll)
+        self.btn_export.clicked.connect(self.export_rows)
 
         # Layout
         top = QHBoxLayout()
@@ -364,6 +475,7 @@ class CrudDialog(QDialog):
         for b in (self.btn_add, self.btn_del, self.btn_save, self.btn_revert):
             btns.addWidget(b)
         btns.addStretch()
+        btns.addWidget(self.btn_export)
 
         layout = QVBoxLayout(self)
         layout.addLayout(top)
@@ -372,14 +484,10 @@ class CrudDialog(QDialog):
 
     # -------- utilidades de columnas --------
     def _column_index(self, name: str) -> int:
-        rec = self.model.record()
-        for i in range(rec.count()):
-            if rec.fieldName(i) == name:
-                return i
-        return -1
+        return self.model.column_index(name)
 
     def _column_name_by_index(self, i: int) -> str:
-        return self.model.record().fieldName(i)
+        return self.model.column_name(i)
 
     def hide_column_by_name(self, name: str):
         idx = self._column_index(name)
@@ -403,39 +511,179 @@ class CrudDialog(QDialog):
 
     def save_changes(self):
         # Nota: las restricciones de tu esquema (FK, CHECK, UNIQUE) también pueden fallar aquí.
-        # Si explota, mostramos el error de Qt.
-        if not self.model.submitAll():
-            err = self.model.lastError()
-            msg = getattr(err, "text", lambda: str(err))()
-            QMessageBox.critical(self, "Error", f"No se pudo guardar:\n{msg}")
-        else:
-            self.model.select()
+        # Lo válido se guarda; las filas que fallan quedan pendientes, marcadas
+        # con "E" y con el error de SQLite en el tooltip. Tras guardar, el
+        # modelo relee solo las filas tocadas.
+        if self.model.submitAll():
+            return
+        failed = self.model.failed_rows()
+        if not failed:
+            QMessageBox.critical(
+                self, "Error", f"No se pudo guardar:\n{self.model.last_error}"
+            )
+            return
+        lines = [f"Fila {row + 1}: {msg}" for row, msg in failed[:10]]
+        if len(failed) > 10:
+            lines.append(f"... y {len(failed) - 10} más")
+        QMessageBox.warning(
+            self,
+            "Guardado parcial",
+            f"{len(failed)} fila(s) no se guardaron y siguen pendientes:\n"
+            + "\n".join(lines),
+        )
+        self.view.scrollTo(self.model.index(failed[0][0], 0))
+
+    def export_rows(self):
+        # Exporta directo de SQLite con el filtro actual (sin tope de
+        # coincidencias); no pasa por el modelo, así que no importa el tamaño.
+        rango = (None, None)
+        if self.table in FILTRO_FECHAS:
+            rango = self._ask_date_range()
+            if rango is None:
+                return
+        path, selected = QFileDialog.getSaveFileName(
+            self,
+            "Exportar",
+            f"{self.table}.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl)",
+        )
+        if not path:
+            return
+        formato = "jsonl" if selected.startswith("JSON") else "csv"
+        columns = [
+            c for i, c in enumerate(self.model.columns) if not self.view.isColumnHidden(i)
+        ]
+
+        progress = QProgressDialog("Exportando...", "Cancelar", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(300)
+
+        def on_progress(n: int) -> bool:
+            progress.setLabelText(f"Exportando... {n:,} filas")
+            QApplication.processEvents()
+            return progress.wasCanceled()
+
+        try:
+            with sqlite_conn() as conn:
+                n = exportar_tabla(
+                    conn,
+                    self.table,
+                    path,
+                    formato=formato,
+                    filtro=self.filter_edit.text(),
+                    columnas=columns,
+                    desde=rango[0],
+                    hasta=rango[1],
+                    progreso=on_progress,
+                )
+        except InterruptedError:
+            return
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"No se pudo exportar:\n{e}")
+            return
+        finally:
+            progress.close()
+        QMessageBox.information(self, "Exportar", f"{n:,} filas exportadas.")
+
+    def _ask_date_range(self) -> tuple[str | None, str | None] | None:
+        # (desde, hasta) en YYYY-MM-DD, (None, None) para todo, None si cancela
+        dlg = QDialog(self)
+        dlg.setWindowTitle("Rango de fechas")
+        all_dates = QCheckBox("Todas las fechas")
+        since, until = QDateEdit(dlg), QDateEdit(dlg)
+        for d in (since, until):
+            d.setCalendarPopup(True)
+            d.setDisplayFormat("yyyy-MM-dd")
+            all_dates.toggled.connect(d.setDisabled)
+        today = QDate.currentDate()
+        since.setDate(QDate(today.year(), today.month(), 1))
+        until.setDate(today)
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dlg.accept)
+        buttons.rejected.connect(dlg.reject)
+        form = QFormLayout(dlg)
+        form.addRow(all_dates)
+        form.addRow("Desde:", since)
+        form.addRow("Hasta:", until)
+        form.addRow(buttons)
+        if dlg.exec() != QDialog.Accepted:
+            return None
+        if all_dates.isChecked():
+            return None, None
+        return since.date().toString("yyyy-MM-dd"), until.date().toString("yyyy-MM-dd")
+
+    def _on_filter_text(self, _text: str):
+        # Lo que estuviera en curso ya no sirve; se relanza al dejar de teclear
+        self.search.cancel()
+        self._filter_timer.start()
 
     def apply_filter(self, text: str):
-        text = text.strip()
-        if not text:
-            self.model.setFilter("")
+        columns = [
+            c for i, c in enumerate(self.model.columns) if not self.view.isColumnHidden(i)
+        ]
+        query = search_query(self.table, text, columns)
+        if query is None:
+            self.search.cancel()
+            self.model.set_rowids(None)
             self.model.select()
             return
+        self.search.search(*query)
+
+    def _on_finished(self, _result: int):
+        # El diálogo se reutiliza (ver MainWindow): solo se detiene lo que esté
+        # en curso. Lo no guardado se descarta, igual que al cerrar siempre.
+        self._filter_timer.stop()
+        self.search.cancel()
+        self._edit_started.clear()  # editores cancelados con Esc
+        self.model.revertAll()
+
+    def refresh_if_stale(self):
+        """Antes de volver a mostrarlo: relee solo si alguien más escribió."""
+        if not self.model.is_stale():
+            return
+        if self.filter_edit.text().strip():
+            self.apply_filter(self.filter_edit.text())
+        else:
+            self.model.select()
 
-        esc = text.replace("'", "''")
-        rec = self.model.record()
-        likes = []
-        for i in range(rec.count()):
-            if self.view.isColumnHidden(i):
-                continue
-            col = rec.fieldName(i)
-            likes.append(f"CAST(\"{col}\" AS TEXT) LIKE '%{esc}%'")
-        self.model.setFilter(" OR ".join(likes))
-        self.model.select()
+    def reset_user_state(self):
+        """Al cerrar sesión: quita filtro, selección y cambios del usuario."""
+        self._on_finished(0)
+        if self.filter_edit.text():
+            self.filter_edit.blockSignals(True)
+            self.filter_edit.clear()
+            self.filter_edit.blockSignals(False)
+            self.model.set_rowids(None)
+            self.model.select()
+        self.view.clearSelection()
+        self.view.scrollToTop()
+
+    def shutdown(self):
+        self.search.shutdown()
+        self.model.close()
 
-    # -------- hooks de edición (debug/log/lo que quieras) --------
+    def _on_search_results(self, rowids: list, primero: bool):
+        # Solo el primer bloque reinicia la vista; los demás se agregan al final
+        if primero:
+            self.model.set_rowids(rowids)
+            self.model.select()
+        else:
+            self.model.append_rowids(rowids)
+
+    # -------- hooks de edición --------
+    # Cada edición queda en diagnostico.ediciones (no en el de consultas) como
+    # "editar tabla.col": cuánto tuvo el usuario abierto el editor; filas = 1
+    # si se aceptó el valor.
     def _on_edit_start(self, index):
-        # Aquí sabes que se abrió un editor; útil para marcar "fila en edición"
-        # print(f"[edit] start row={index.row()} col={index.column()} {self._column_name_by_index(index.column())}")
-        pass
+        self._edit_started[(index.row(), index.column())] = time.perf_counter()
 
     def _on_edit_finish(self, index, accepted: bool):
-        # Se cerró editor; accepted indica si pasó validación y se escribió en el modelo.
-        # print(f"[edit] done  row={index.row()} col={index.column()} ok={accepted}")
-        pass
+        t0 = self._edit_started.pop((index.row(), index.column()), None)
+        if t0 is None:
+            return
+        ediciones.evento(
+            "edicion",
+            f"editar {self.table}.{self._column_name_by_index(index.column())}",
+            time.perf_counter() - t0,
+            int(accepted),
+        )
@@ -0,0 +1,104 @@
+from __future__ import annotations
+from PySide6.QtCore import Qt
+from PySide6.QtWidgets import (
+    QDialog,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+import diagnostico
+
+COLUMNAS = (
+    "Origen", "Sentencia", "Parámetros", "N",
+    "p50 ms", "p95 ms", "p99 ms", "máx ms", "total ms", "filas", "lentas",
+)
+_CLAVES = (
+    "origen", "sql", "parametros", "n",
+    "p50", "p95", "p99", "max", "total", "filas", "lentas",
+)
+
+
+class _Numero(QTableWidgetItem):
+    # Ordena por valor, no por texto
+    def __init__(self, valor):
+        super().__init__(f"{valor:,.2f}" if isinstance(valor, float) else f"{valor:,}")
+        self.valor = valor
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        return self.valor < getattr(other, "valor", 0)
+
+
+class DiagnosticoDialog(QDialog):
+    """Percentiles por sentencia del búfer de diagnostico.registro (bajo demanda)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnóstico - consultas")
+        self.resize(1000, 500)
+
+        self.info = QLabel()
+        self.table = QTableWidget(0, len(COLUMNAS))
+        self.table.setHorizontalHeaderLabels(COLUMNAS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setSortingEnabled(True)
+        self.table.setWordWrap(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(1, QHeaderView.Stretch)
+
+        btn_refresh = QPushButton("Actualizar")
+        btn_clear = QPushButton("Limpiar")
+        btn_close = QPushButton("Cerrar")
+        btn_refresh.clicked.connect(self.refresh)
+        btn_clear.clicked.connect(self.clear)
+        btn_close.clicked.connect(self.close)
+
+        btns = QHBoxLayout()
+        btns.addWidget(btn_refresh)
+        btns.addWidget(btn_clear)
+        btns.addStretch()
+        btns.addWidget(btn_close)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.info)
+        layout.addWidget(self.table)
+        layout.addLayout(btns)
+
+    def refresh(self):
+        registro = diagnostico.registro
+        if not diagnostico.ACTIVO:
+            self.info.setText("Instrumentación apagada (FARMACIA_SQL_DIAG=0).")
+        else:
+            self.info.setText(
+                f"{len(registro.mediciones):,} mediciones (máx. {registro.mediciones.maxlen:,}). "
+                f"Lentas: más de {registro.umbral * 1000:g} ms, en {diagnostico.LOG_LENTAS}."
+            )
+        # Las ediciones (tiempo de personas) van aparte: solo el conteo y la mediana
+        tiempos = sorted(m[diagnostico.SEGUNDOS] for m in list(diagnostico.ediciones.mediciones))
+        if tiempos:
+            self.info.setText(
+                f"{self.info.text()} Ediciones: {len(tiempos):,}, "
+                f"mediana {tiempos[len(tiempos) // 2]:.1f} s."
+            )
+        filas = registro.resumen()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(filas))
+        for r, fila in enumerate(filas):
+            for c, clave in enumerate(_CLAVES):
+                valor = fila[clave]
+                item = QTableWidgetItem(valor) if isinstance(valor, str) else _Numero(valor)
+                if clave in ("sql", "parametros"):
+                    item.setToolTip(valor)
+                self.table.setItem(r, c, item)
+        self.table.setSortingEnabled(True)
+
+    def clear(self):
+        diagnostico.registro.limpiar()
+        diagnostico.ediciones.limpiar()
+        self.refresh()
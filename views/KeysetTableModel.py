@@ -0,0 +1,544 @@
+from __future__ import annotations
+import sqlite3
+from array import array
+from collections import OrderedDict
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from database import open_conn
+
+# Filas por bloque: unidad de lectura y de caché
+BLOCK_SIZE = 256
+# Bloques de filas que se mantienen en memoria (LRU)
+MAX_BLOCKS = 64
+# Bloques extra que se leen detrás del que pidió la vista
+PREFETCH_BLOCKS = 1
+
+
+class KeysetTableModel(QAbstractTableModel):
+    """
+    Modelo editable de una tabla SQLite con paginación por llave.
+
+    Las filas se descubren por bloques con `WHERE rowid > ? ORDER BY rowid
+    LIMIT n` a medida que la vista hace scroll (canFetchMore/fetchMore), así
+    que abrir una tabla enorme cuesta lo mismo que abrir una chica. De cada
+    fila solo se guarda su rowid en un array compacto; los valores viven en
+    una caché LRU de bloques que se vuelven a leer por rowid si se desalojan.
+
+    Los cambios (OnManualSubmit, como QSqlTableModel) se guardan aparte por
+    rowid y se aplican en submitAll(); después solo se releen las filas
+    tocadas. Con set_rowids() el modelo muestra exactamente esas filas y en
+    ese orden (resultados de búsqueda).
+
+    El rowid solo sirve mientras dura la vista: en tablas sin INTEGER
+    PRIMARY KEY un VACUUM puede renumerarlo. Por eso UPDATE y DELETE buscan
+    la fila por su llave primaria declarada, tomada al editarla o marcarla.
+    """
+
+    def __init__(self, table: str, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self._conn = open_conn(f"modelo:{table}")
+        info = self._conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        self.columns: list[str] = [r[1] for r in info]
+        self._col_index = {name: i for i, name in enumerate(self.columns)}
+        # Llave primaria declarada, en orden; sin ella se usa el rowid
+        self._pk = [i for _n, i in sorted((r[5], r[0]) for r in info if r[5])]
+        self._where_pk = (
+            " AND ".join(f'"{self.columns[i]}" IS ?' for i in self._pk)
+            if self._pk
+            else "rowid = ?"
+        )
+        self._headers: dict[int, str] = {}
+        self._select_cols = ", ".join(f'"{c}"' for c in self.columns)
+
+        self._keys = array("q")  # rowids visibles, en orden de despliegue
+        self._cursor: int | None = None  # último rowid leído por llave
+        self._appended: set[int] = set()  # rowids agregados por inserciones propias
+        self._exhausted = False
+        self._rowids: list[int] | None = None
+        self._blocks: OrderedDict[int, list[tuple]] = OrderedDict()
+        self._data_version: int | None = None  # al último select()
+
+        # Cambios pendientes
+        self._edits: dict[int, dict[int, object]] = {}  # rowid -> {col: valor}
+        self._pk_of: dict[int, tuple] = {}  # rowid -> llave de las filas tocadas
+        self._new_rows: list[list] = []
+        self._deleted: set[int] = set()
+        # Motivo del último submitAll fallido, por fila: rowid o id() de la fila nueva
+        self._errors: dict[int, str] = {}
+        self._new_errors: dict[int, str] = {}
+        self.last_error = ""
+
+    # -------- columnas --------
+    def column_index(self, name: str) -> int:
+        return self._col_index.get(name, -1)
+
+    def column_name(self, i: int) -> str:
+        return self.columns[i] if 0 <= i < len(self.columns) else ""
+
+    # -------- lectura --------
+    def select(self):
+        """Vuelve a leer desde el principio (o los rowids fijados por set_rowids)."""
+        self.beginResetModel()
+        self._data_version = self._current_data_version()
+        self._blocks.clear()
+        self._cursor = None
+        self._appended = set()
+        if self._rowids is None:
+            self._keys = array("q")
+            self._exhausted = False
+        else:
+            self._keys = array("q", self._rowids)
+            self._exhausted = True
+        self.endResetModel()
+        if not self._exhausted:
+            self.fetchMore(QModelIndex())
+
+    def _current_data_version(self) -> int:
+        # Cambia cuando OTRA conexión confirma algo; los submitAll propios no cuentan
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def is_stale(self) -> bool:
+        """True si alguien más escribió en la BD desde el último select()."""
+        return self._current_data_version() != self._data_version
+
+    def set_rowids(self, rowids: list[int] | None):
+        """Limita el modelo a `rowids` en ese orden; None vuelve a la tabla completa."""
+        self._rowids = None if rowids is None else list(rowids)
+
+    def append_rowids(self, rowids: list[int]):
+        """Agrega `rowids` al final de los fijados por set_rowids(), sin reiniciar la vista."""
+        if self._rowids is None or not rowids:
+            return
+        self._rowids.extend(rowids)
+        first = len(self._keys)
+        self.beginInsertRows(QModelIndex(), first, first + len(rowids) - 1)
+        self._keys.extend(rowids)
+        self.endInsertRows()
+        # El último bloque en caché quedó corto
+        self._blocks.pop(first // BLOCK_SIZE, None)
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        sql = f'SELECT rowid, {self._select_cols} FROM "{self.table}"'
+        if self._cursor is None:
+            rows = self._conn.execute(
+                sql + " ORDER BY rowid LIMIT ?", (BLOCK_SIZE,)
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                sql + " WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (self._cursor, BLOCK_SIZE),
+            ).fetchall()
+        if len(rows) < BLOCK_SIZE:
+            self._exhausted = True
+        if not rows:
+            return
+        self._cursor = rows[-1][0]
+        if self._appended:
+            # Ya se muestran al final desde que se insertaron
+            rows = [r for r in rows if r[0] not in self._appended]
+            if not rows:
+                return
+
+        first = len(self._keys)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._keys.extend(r[0] for r in rows)
+        self.endInsertRows()
+        # El bloque recién leído ya trae los valores: se guarda si cae alineado;
+        # si no, el bloque parcial que hubiera en caché ya quedó corto
+        if first % BLOCK_SIZE == 0:
+            self._store_block(first // BLOCK_SIZE, [r[1:] for r in rows])
+        else:
+            self._blocks.pop(first // BLOCK_SIZE, None)
+
+    def _store_block(self, block: int, rows: list[tuple]):
+        self._blocks[block] = rows
+        self._blocks.move_to_end(block)
+        while len(self._blocks) > MAX_BLOCKS:
+            self._blocks.popitem(last=False)
+
+    def _read_rows(self, rowids) -> dict[int, tuple]:
+        rowids = list(rowids)
+        found = {}
+        # En tramos: SQLite viejos solo aceptan 999 parámetros por sentencia
+        for i in range(0, len(rowids), 900):
+            part = rowids[i : i + 900]
+            marks = ", ".join("?" * len(part))
+            cur = self._conn.execute(
+                f'SELECT rowid, {self._select_cols} FROM "{self.table}" '
+                f"WHERE rowid IN ({marks})",
+                part,
+            )
+            found.update((r[0], r[1:]) for r in cur)
+        return found
+
+    def _load_block(self, block: int):
+        start = block * BLOCK_SIZE
+        keys = self._keys[start : start + BLOCK_SIZE]
+        found = self._read_rows(keys)
+        # Una fila borrada por otro proceso se muestra vacía hasta el próximo select()
+        empty = (None,) * len(self.columns)
+        self._store_block(block, [found.get(k, empty) for k in keys])
+
+    def _row_values(self, row: int) -> tuple:
+        block = row // BLOCK_SIZE
+        cached = self._blocks.get(block)
+        if cached is None:
+            last_block = (len(self._keys) - 1) // BLOCK_SIZE
+            for b in range(block, min(block + PREFETCH_BLOCKS, last_block) + 1):
+                if b not in self._blocks:
+                    self._load_block(b)
+            cached = self._blocks[block]
+        else:
+            self._blocks.move_to_end(block)
+        return cached[row - block * BLOCK_SIZE]
+
+    # -------- QAbstractTableModel --------
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._keys) + len(self._new_rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def _row_error(self, row: int) -> str | None:
+        n = len(self._keys)
+        if row >= n:
+            return self._new_errors.get(id(self._new_rows[row - n]))
+        return self._errors.get(self._keys[row])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.ToolTipRole:
+            return self._row_error(index.row())
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        row, col = index.row(), index.column()
+        n = len(self._keys)
+        if row >= n:
+            return self._new_rows[row - n][col]
+        edits = self._edits.get(self._keys[row])
+        if edits is not None and col in edits:
+            return edits[col]
+        return self._row_values(row)[col]
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Vertical and role == Qt.ToolTipRole:
+            return self._row_error(section)
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._headers.get(section, self.column_name(section))
+        # Como QSqlTableModel: * fila nueva, ! fila marcada para borrar;
+        # E: no se pudo guardar (el motivo va en el tooltip)
+        if self._row_error(section):
+            return "E"
+        if section >= len(self._keys):
+            return "*"
+        if self._keys[section] in self._deleted:
+            return "!"
+        return str(section + 1)
+
+    def setHeaderData(self, section, orientation, value, role=Qt.EditRole):
+        if orientation != Qt.Horizontal or role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+        self._headers[section] = str(value)
+        self.headerDataChanged.emit(orientation, section, section)
+        return True
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row, col = index.row(), index.column()
+        n = len(self._keys)
+        if row >= n:
+            self._new_rows[row - n][col] = value
+        else:
+            self._touch(row)
+            self._edits.setdefault(self._keys[row], {})[col] = value
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+        return True
+
+    def insertRows(self, row, count, parent=QModelIndex()):
+        # Las filas nuevas siempre van al final, como en QSqlTableModel tras select()
+        first = self.rowCount()
+        self.beginInsertRows(QModelIndex(), first, first + count - 1)
+        for _ in range(count):
+            self._new_rows.append([None] * len(self.columns))
+        self.endInsertRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        n = len(self._keys)
+        for r in range(row + count - 1, row - 1, -1):
+            if r >= n:
+                self.beginRemoveRows(QModelIndex(), r, r)
+                del self._new_rows[r - n]
+                self.endRemoveRows()
+            else:
+                self._touch(r)
+                self._deleted.add(self._keys[r])
+                self.headerDataChanged.emit(Qt.Vertical, r, r)
+        return True
+
+    def _touch(self, row: int):
+        # La llave como se leyó, antes de cualquier edición (puede editarse)
+        rowid = self._keys[row]
+        if rowid not in self._pk_of:
+            values = self._row_values(row)
+            self._pk_of[rowid] = tuple(values[i] for i in self._pk) if self._pk else (rowid,)
+
+    # -------- cambios pendientes --------
+    def isDirty(self) -> bool:
+        return bool(self._edits or self._new_rows or self._deleted)
+
+    def revertAll(self):
+        if not self.isDirty():
+            return
+        if self._new_rows:
+            n = len(self._keys)
+            self.beginRemoveRows(QModelIndex(), n, n + len(self._new_rows) - 1)
+            self._new_rows.clear()
+            self.endRemoveRows()
+        self._edits.clear()
+        self._deleted.clear()
+        self._pk_of.clear()
+        self._errors.clear()
+        self._new_errors.clear()
+        if self._keys:
+            last = len(self._keys) - 1
+            self.dataChanged.emit(
+                self.index(0, 0), self.index(last, len(self.columns) - 1)
+            )
+            self.headerDataChanged.emit(Qt.Vertical, 0, last)
+
+    def submitAll(self) -> bool:
+        """
+        Guarda los cambios pendientes en una sola transacción, agrupados:
+        un executemany para todos los borrados y uno por cada combinación de
+        columnas editadas (p. ej. cien precios cambiados = una sentencia).
+        Las inserciones van una por una porque cada una necesita su rowid.
+
+        Si un lote choca con una restricción, se repite fila por fila con
+        SAVEPOINT: lo válido se guarda y solo las filas que fallan quedan
+        pendientes, con su motivo (failed_rows(), tooltip y "E" en el
+        encabezado). Devuelve True si no quedó nada pendiente. Un error que no
+        es de restricción (BD bloqueada, disco) no guarda nada y queda en
+        last_error. Después solo se releen las filas tocadas.
+        """
+        self.last_error = ""
+        self._errors = {}
+        self._new_errors = {}
+        if not self.isDirty():
+            return True
+        table = self.table
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            deleted = list(self._deleted)
+            deleted_ok = self._apply_batch(
+                f'DELETE FROM "{table}" WHERE {self._where_pk}',
+                deleted,
+                [self._pk_of[rowid] for rowid in deleted],
+                self._errors,
+            )
+
+            groups: dict[tuple[int, ...], list[int]] = {}
+            for rowid, changes in self._edits.items():
+                if rowid not in self._deleted:
+                    groups.setdefault(tuple(sorted(changes)), []).append(rowid)
+            updated_ok: list[int] = []
+            for cols, rowids in groups.items():
+                sets = ", ".join(f'"{self.columns[c]}" = ?' for c in cols)
+                updated_ok += self._apply_batch(
+                    f'UPDATE "{table}" SET {sets} WHERE {self._where_pk}',
+                    rowids,
+                    [(*(self._edits[r][c] for c in cols), *self._pk_of[r]) for r in rowids],
+                    self._errors,
+                )
+            moved = self._moved_rowids(updated_ok)
+
+            inserted: dict[int, int] = {}  # id(fila nueva) -> rowid
+            for values in self._new_rows:
+                # Columnas sin valor: que SQLite ponga su DEFAULT / autoincremento
+                cols = [i for i, v in enumerate(values) if v is not None]
+                if cols:
+                    names = ", ".join(f'"{self.columns[i]}"' for i in cols)
+                    sql = (
+                        f'INSERT INTO "{table}" ({names}) '
+                        f"VALUES ({', '.join('?' * len(cols))})"
+                    )
+                else:
+                    sql = f'INSERT INTO "{table}" DEFAULT VALUES'
+                self._conn.execute("SAVEPOINT fila")
+                try:
+                    cur = self._conn.execute(sql, [values[i] for i in cols])
+                    inserted[id(values)] = cur.lastrowid
+                except sqlite3.IntegrityError as e:
+                    self._conn.execute("ROLLBACK TO fila")
+                    self._new_errors[id(values)] = str(e)
+                self._conn.execute("RELEASE fila")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            self._errors = {}
+            self._new_errors = {}
+            self.last_error = str(e)
+            return False
+
+        self._refresh_after_submit(set(deleted_ok), updated_ok, inserted, moved)
+        failed = len(self._errors) + len(self._new_errors)
+        if failed:
+            self.last_error = f"{failed} fila(s) no se pudieron guardar."
+        return not failed
+
+    def _apply_batch(
+        self, sql: str, keys: list[int], params: list[tuple], errors: dict[int, str]
+    ) -> list[int]:
+        """
+        executemany de `params` dentro de un SAVEPOINT. Si alguna fila viola
+        una restricción se deshace el lote y se reintenta fila por fila;
+        los motivos quedan en `errors` por llave. Devuelve las llaves que sí
+        se aplicaron.
+        """
+        if not params:
+            return []
+        self._conn.execute("SAVEPOINT lote")
+        try:
+            self._conn.executemany(sql, params)
+            self._conn.execute("RELEASE lote")
+            return list(keys)
+        except sqlite3.IntegrityError:
+            self._conn.execute("ROLLBACK TO lote")
+            self._conn.execute("RELEASE lote")
+        ok = []
+        for key, p in zip(keys, params):
+            self._conn.execute("SAVEPOINT fila")
+            try:
+                self._conn.execute(sql, p)
+                ok.append(key)
+            except sqlite3.IntegrityError as e:
+                self._conn.execute("ROLLBACK TO fila")
+                errors[key] = str(e)
+            self._conn.execute("RELEASE fila")
+        return ok
+
+    def _moved_rowids(self, updated: list[int]) -> dict[int, int]:
+        """
+        rowid viejo -> nuevo de las filas a las que se les editó la llave:
+        en un INTEGER PRIMARY KEY la llave es el rowid. Llamar dentro de la
+        transacción de submitAll(), antes de limpiar las ediciones.
+        """
+        moved = {}
+        for rowid in updated:
+            changes = self._edits[rowid]
+            if not any(i in changes for i in self._pk):
+                continue
+            key = tuple(changes.get(i, old) for i, old in zip(self._pk, self._pk_of[rowid]))
+            row = self._conn.execute(
+                f'SELECT rowid FROM "{self.table}" WHERE {self._where_pk}', key
+            ).fetchone()
+            if row is not None and row[0] != rowid:
+                moved[rowid] = row[0]
+        return moved
+
+    def failed_rows(self) -> list[tuple[int, str]]:
+        """(fila en la vista, motivo) de lo que no se guardó en el último submitAll()."""
+        if not self._errors and not self._new_errors:
+            return []
+        failed = [(r, self._errors[k]) for r, k in enumerate(self._keys) if k in self._errors]
+        n = len(self._keys)
+        failed += [
+            (n + i, self._new_errors[id(v)])
+            for i, v in enumerate(self._new_rows)
+            if id(v) in self._new_errors
+        ]
+        return failed
+
+    def _refresh_after_submit(
+        self,
+        deleted: set[int],
+        updated: list[int],
+        inserted: dict[int, int],
+        moved: dict[int, int],
+    ):
+        for rowid in deleted:
+            self._deleted.discard(rowid)
+            self._edits.pop(rowid, None)
+            self._pk_of.pop(rowid, None)
+        for rowid in updated:
+            self._edits.pop(rowid, None)
+            self._pk_of.pop(rowid, None)
+
+        # Filas borradas: salen del modelo; los bloques desde la primera se releen
+        if deleted:
+            rows = [r for r, k in enumerate(self._keys) if k in deleted]
+            for r in reversed(rows):
+                self.beginRemoveRows(QModelIndex(), r, r)
+                del self._keys[r]
+                self.endRemoveRows()
+            first_block = rows[0] // BLOCK_SIZE if rows else 0
+            for b in [b for b in self._blocks if b >= first_block]:
+                del self._blocks[b]
+
+        # Filas nuevas guardadas: pasan a ser filas normales con su rowid
+        # real; las que fallaron siguen al final como nuevas
+        if inserted:
+            n = len(self._keys)
+            self.beginRemoveRows(QModelIndex(), n, n + len(self._new_rows) - 1)
+            pending = [v for v in self._new_rows if id(v) not in inserted]
+            rowids = [inserted[id(v)] for v in self._new_rows if id(v) in inserted]
+            self._new_rows = []
+            self.endRemoveRows()
+            self.beginInsertRows(QModelIndex(), n, n + len(rowids) - 1)
+            self._keys.extend(rowids)
+            self.endInsertRows()
+            if pending:
+                first = len(self._keys)
+                self.beginInsertRows(QModelIndex(), first, first + len(pending) - 1)
+                self._new_rows = pending
+                self.endInsertRows()
+            if not self._exhausted:
+                self._appended.update(rowids)
+            for b in range(n // BLOCK_SIZE, (len(self._keys) - 1) // BLOCK_SIZE + 1):
+                self._blocks.pop(b, None)
+
+        # Filas con la llave editada: siguen en su lugar con su rowid nuevo
+        if moved:
+            for r, k in enumerate(self._keys):
+                if k in moved:
+                    self._keys[r] = moved[k]
+            if self._rowids is not None:
+                self._rowids = [moved.get(k, k) for k in self._rowids]
+            if not self._exhausted:
+                # Que fetchMore no la vuelva a agregar si el rowid nuevo va adelante
+                self._appended.update(moved.values())
+            updated = [moved.get(k, k) for k in updated]
+
+        # Filas modificadas: se releen (defaults, triggers) y se parchan en
+        # caché; en una sola consulta aunque sean cientos
+        if updated:
+            fresh = self._read_rows(updated)
+            positions = {k: r for r, k in enumerate(self._keys) if k in fresh}
+            for rowid, r in positions.items():
+                cached = self._blocks.get(r // BLOCK_SIZE)
+                if cached is not None:
+                    cached[r % BLOCK_SIZE] = fresh[rowid]
+            if positions:
+                self.dataChanged.emit(
+                    self.index(min(positions.values()), 0),
+                    self.index(max(positions.values()), len(self.columns) - 1),
+                )
+        if self.rowCount():
+            self.headerDataChanged.emit(Qt.Vertical, 0, self.rowCount() - 1)
+
+    def close(self):
+        self._conn.close()
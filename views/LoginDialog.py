@@ -2,8 +2,9 @@
 # Requisitos: pip install PySide6
 # Ejecuta: python main.py
 from __future__ import annotations
-import sqlite3
-from database import _hash_password, DB_FILE
+from auth import auth
+from database import esperar_bd
+from PySide6.QtCore import QObject, QThread, Signal, Slot
 from PySide6.QtWidgets import (
     QDialog,
     QFormLayout,
@@ -14,12 +15,31 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
 )
 
+
+class _LoginWorker(QObject):
+    """Verifica credenciales en su propio hilo: PBKDF2 tarda a propósito."""
+
+    done = Signal(object, str)  # usuario_id o None, mensaje de error
+
+    @Slot(str, str)
+    def verify(self, correo: str, password: str):
+        try:
+            # El esquema se prepara en segundo plano mientras aparece el login
+            esperar_bd()
+            self.done.emit(auth.autenticar(correo, password), "")
+        except Exception as e:
+            self.done.emit(None, str(e))
+
+
 # ---------- Diálogo de Login ----------
 class LoginDialog(QDialog):
+    _verify = Signal(str, str)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Acceso - Farmacia")
         self.setModal(True)
+        self.usuario_id: int | None = None
         self.user = QLineEdit()
         self.passw = QLineEdit()
         self.passw.setEchoMode(QLineEdit.Password)
@@ -41,6 +61,14 @@ class LoginDialog(QDialog):
         self.btn_ok.clicked.connect(self.try_login)
         self.btn_cancel.clicked.connect(self.reject)
 
+        # Verificación fuera del hilo de UI
+        self._thread = QThread(self)
+        self._worker = _LoginWorker()
+        self._worker.moveToThread(self._thread)
+        self._verify.connect(self._worker.verify)
+        self._worker.done.connect(self._on_verified)
+        self._thread.start()
+
     def try_login(self):
         u = self.user.text().strip()
         p = self.passw.text()
@@ -48,19 +76,35 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "Faltan datos", "Escribe correo y contraseña.")
             return
 
-        # Validación directa a SQLite para no depender de QSql*
-        conn = sqlite3.connect(DB_FILE)
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT usuario_id FROM usuarios WHERE correo=? AND password_hash=?",
-            (u, _hash_password(p)),
-        )
-        row = cur.fetchone()
-        conn.close()
-
-        if row:
+        self._set_busy(True)
+        self._verify.emit(u, p)
+
+    def _on_verified(self, usuario_id, error: str):
+        self._set_busy(False)
+        if error:
+            QMessageBox.critical(self, "Error BD", f"No se pudo validar el acceso:\n{error}")
+        elif usuario_id is not None:
+            self.usuario_id = usuario_id
             self.accept()
         else:
             QMessageBox.critical(
                 self, "Acceso denegado", "correo o contraseña incorrectos."
-        )
\ No newline at end of file
+            )
+
+    def _set_busy(self, busy: bool):
+        self.btn_ok.setEnabled(not busy)
+        self.btn_ok.setText("Verificando..." if busy else "Ingresar")
+        self.user.setEnabled(not busy)
+        self.passw.setEnabled(not busy)
+
+    def reset(self):
+        """Deja el diálogo listo para el siguiente cajero (se reutiliza)."""
+        self.usuario_id = None
+        self.user.clear()
+        self.passw.clear()
+        self._set_busy(False)
+        self.user.setFocus()
+
+    def shutdown(self):
+        self._thread.quit()
+        self._thread.wait()
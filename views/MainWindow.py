@@ -1,8 +1,8 @@
 from __future__ import annotations
-from views.CrudDialog import CrudDialog
 from PySide6.QtCore import Signal, Qt
 from PySide6.QtGui import QAction
 from PySide6.QtWidgets import (
+    QApplication,
     QLabel,
     QMainWindow,
     QMessageBox,
@@ -11,12 +11,20 @@ from PySide6.QtWidgets import (
 
 class MainWindow(QMainWindow):
     logout_requested = Signal()
+    # Future de integridad.en_segundo_plano; se emite desde su hilo
+    integrity_done = Signal(object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Farmacia - Mini POS")
         self.resize(400, 300)
+        # Se crea una vez y sobrevive a los cambios de cajero: los CRUD abiertos
+        # se guardan por tabla y se reutilizan con su modelo ya cargado
+        self.session = None
+        self._dialogs = {}
+        self._diagnostics = None
         self._build_menus()
+        self.integrity_done.connect(self._on_integrity_done)
 
         tb = QToolBar("Acciones", self)
         self.addToolBar(tb)
@@ -41,10 +49,24 @@ class MainWindow(QMainWindow):
         m_seg = self.menuBar().addMenu("&Seguridad")
         self.add_catalog_action(m_seg, "Usuarios", "Usuarios")
 
+        m_ses = self.menuBar().addMenu("Se&sión")
+        logout = QAction("Cerrar sesión", self)
+        logout.triggered.connect(self.request_logout)
+        m_ses.addAction(logout)
+        leave = QAction("Salir", self)
+        leave.triggered.connect(self.close)
+        m_ses.addAction(leave)
+
         m_help = self.menuBar().addMenu("Ay&uda")
         about = QAction("Acerca de…", self)
         about.triggered.connect(lambda: QMessageBox.information(self, "Farmacia", "Mini farmacia con puntos y promos."))
         m_help.addAction(about)
+        diag = QAction("Diagnóstico…", self)
+        diag.triggered.connect(self.open_diagnostics)
+        m_help.addAction(diag)
+        self._integrity = QAction("Revisar integridad…", self)
+        self._integrity.triggered.connect(lambda: self.check_integrity(False))
+        m_help.addAction(self._integrity)
 
     def add_catalog_action(self, menu, text, table):
         act = QAction(text, self)
@@ -52,10 +74,78 @@ class MainWindow(QMainWindow):
         menu.addAction(act)
 
     def open_crud(self, table: str, label: str):
-        dlg = CrudDialog(table, f"{label} - CRUD", parent=self)
+        dlg = self._dialogs.get(table)
+        if dlg is None:
+            # Se importa al primer uso: no hace falta para mostrar la ventana
+            from views.CrudDialog import CrudDialog
+
+            dlg = CrudDialog(table, f"{label} - CRUD", parent=self)
+            self._dialogs[table] = dlg
+        else:
+            dlg.refresh_if_stale()
         dlg.exec()
 
+    def open_diagnostics(self):
+        # No modal: se puede dejar abierta mientras se usan los CRUD
+        if self._diagnostics is None:
+            from views.DiagnosticoDialog import DiagnosticoDialog
+
+            self._diagnostics = DiagnosticoDialog(self)
+        self._diagnostics.show()
+        self._diagnostics.raise_()
+        self._diagnostics.refresh()
+
+    def check_integrity(self, repair: bool):
+        # En otro hilo: con millones de renglones tarda; la ventana sigue viva
+        from integridad import en_segundo_plano
+
+        self._integrity.setEnabled(False)
+        self.statusBar().showMessage("Revisando existencias y puntos…")
+        en_segundo_plano(repair).add_done_callback(self.integrity_done.emit)
+
+    def _on_integrity_done(self, future):
+        self._integrity.setEnabled(True)
+        self.statusBar().clearMessage()
+        try:
+            informe = future.result()
+        except Exception as e:
+            QMessageBox.critical(self, "Integridad", f"No se pudo revisar:\n{e}")
+            return
+        texto = "\n".join(informe.lineas())
+        if informe.reparado or not informe.diferencias:
+            QMessageBox.information(self, "Integridad", texto)
+            return
+        if QMessageBox.question(
+            self, "Integridad", f"{texto}\n\n¿Corregir las diferencias?"
+        ) == QMessageBox.Yes:
+            self.check_integrity(True)
+
+    # -------- sesión --------
+    def start_session(self, session):
+        self.session = session
+        self.setWindowTitle(f"Farmacia - Mini POS - {session.nombre}")
+        self.statusBar().showMessage(f"{session.nombre} ({session.rol})")
+
+    def end_session(self):
+        # Solo lo que es del usuario; diálogos y modelos se quedan cargados
+        for dlg in self._dialogs.values():
+            if dlg.isVisible():
+                dlg.reject()
+            dlg.reset_user_state()
+        self.session = None
+        self.setWindowTitle("Farmacia - Mini POS")
+        self.statusBar().clearMessage()
+
     def request_logout(self):
         if QMessageBox.question(self, "Cerrar sesión", "¿Volver a la pantalla de login?") == QMessageBox.Yes:
             self.logout_requested.emit()
-            self.close()
+
+    def shutdown(self):
+        for dlg in self._dialogs.values():
+            dlg.shutdown()
+        self._dialogs.clear()
+
+    def closeEvent(self, event):
+        # Cerrar la ventana principal termina la aplicación (no es cerrar sesión)
+        super().closeEvent(event)
+        QApplication.quit()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import sqlite3
+from PySide6.QtCore import QObject, QThread, Signal, Slot
+from database import open_conn
+
+# Filas por entrega: la vista se actualiza con cada bloque sin esperar al total
+CHUNK_SIZE = 100
+
+
+class _SearchWorker(QObject):
+    """Vive en un QThread con su propia conexión SQLite; ejecuta una búsqueda a la vez."""
+
+    chunk = Signal(int, object, bool)  # generación, rowids nuevos, ¿es el primero?
+    done = Signal(int)  # generación
+
+    def __init__(self, pipeline: "SearchPipeline"):
+        super().__init__()
+        self._pipeline = pipeline
+        self._conn: sqlite3.Connection | None = None
+
+    def interrupt(self):
+        # sqlite3 permite interrumpir desde otro hilo; sin consulta activa no hace nada
+        if self._conn is not None:
+            self._conn.interrupt()
+
+    @Slot(int, str, object)
+    def run(self, gen: int, sql: str, params: tuple):
+        # Ya llegó un texto más nuevo: ni siquiera empezamos
+        if gen != self._pipeline.generation:
+            return
+        if self._conn is None:
+            self._conn = open_conn("busqueda")
+
+        primero = True
+        try:
+            cur = self._conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(CHUNK_SIZE)
+                if gen != self._pipeline.generation:
+                    cur.close()
+                    return
+                if not rows:
+                    break
+                self.chunk.emit(gen, [r[0] for r in rows], primero)
+                primero = False
+        except sqlite3.OperationalError:
+            # Interrumpida por una búsqueda más nueva (o texto que FTS no acepta)
+            return
+        if primero:
+            self.chunk.emit(gen, [], True)
+        self.done.emit(gen)
+
+    @Slot()
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SearchPipeline(QObject):
+    """
+    Ejecuta las búsquedas del filtro rápido fuera del hilo de UI.
+    Cada search() invalida e interrumpe la anterior; solo se entregan
+    resultados de la búsqueda vigente, en bloques de CHUNK_SIZE rowids:
+    el primero reemplaza los resultados anteriores y los demás se agregan.
+    """
+
+    results = Signal(object, bool)  # rowids nuevos (orden de relevancia), ¿es el primero?
+    finished = Signal()
+    _request = Signal(int, str, object)
+    _close = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self._thread = QThread(self)
+        self._worker = _SearchWorker(self)
+        self._worker.moveToThread(self._thread)
+        self._request.connect(self._worker.run)
+        self._close.connect(self._worker.close)
+        self._worker.chunk.connect(self._on_chunk)
+        self._worker.done.connect(self._on_done)
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._thread.start()
+
+    def search(self, sql: str, params: tuple):
+        self.cancel()
+        self._request.emit(self.generation, sql, params)
+
+    def cancel(self):
+        self.generation += 1
+        self._worker.interrupt()
+
+    def shutdown(self):
+        self.cancel()
+        self._close.emit()
+        self._thread.quit()
+        self._thread.wait()
+
+    def _on_chunk(self, gen: int, rowids: list, primero: bool):
+        if gen == self.generation:
+            self.results.emit(rowids, primero)
+
+    def _on_done(self, gen: int):
+        if gen == self.generation:
+            self.finished.emit()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+from PySide6.QtCore import QObject
+from PySide6.QtWidgets import QApplication, QDialog
+from auth import auth
+from views.LoginDialog import LoginDialog
+
+
+class SessionManager(QObject):
+    """
+    Ciclo login -> ventana principal -> cerrar sesión -> login, con un solo
+    LoginDialog y un solo MainWindow durante toda la vida de la app. Al
+    cambiar de cajero solo se limpia el estado del usuario; los CRUD y sus
+    modelos siguen cargados.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.login = LoginDialog()
+        self.main = None  # se crea con el primer login
+        self.session = None
+
+    def start(self) -> bool:
+        """Muestra el login; False si el usuario canceló."""
+        self.login.reset()
+        if self.login.exec() != QDialog.Accepted:
+            return False
+        self.session = auth.sesion(self.login.usuario_id)
+        if self.main is None:
+            from views.MainWindow import MainWindow
+
+            self.main = MainWindow()
+            self.main.logout_requested.connect(self._on_logout)
+        self.main.start_session(self.session)
+        self.main.show()
+        return True
+
+    def _on_logout(self):
+        self.main.end_session()
+        self.main.hide()
+        self.session = None
+        if not self.start():
+            QApplication.quit()
+
+    def shutdown(self):
+        if self.main is not None:
+            self.main.shutdown()
+        self.login.shutdown()